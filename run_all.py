@@ -1,47 +1,243 @@
 import subprocess
 import time
 import datetime
+import json
+import os
+import sys
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "scripts"))
+
+from atomic_file import atomic_write
+from heartbeat import read_heartbeat, stale_reason
+
+try:
+    import psutil
+except ImportError:  # Ohne psutil werden CPU/RSS direkt aus /proc gelesen (Linux)
+    psutil = None
+
+# nextbike_feed.py ruft den Feed einmal pro Takt ab und startet
+# station_reservation, total_bookedbikesn_weather und nextbike_trip_analysis als Abonnenten
 SCRIPTS = [
-    "scripts/station_reservation.py",
+    "scripts/nextbike_feed.py",
     "scripts/create_save_copies.py",
-    "scripts/total_bookedbikesn_weather.py",
-    "scripts/nextbike_trip_analysis.py",
 ]
 
+# Weitere Städte zusätzlich zum Berliner Betrieb oben: Liste von Nextbike city-IDs (leer = nur Berlin).
+# multi_city.py startet dann einen Worker-Prozess pro Stadt mit Ausgaben unter results_cities/<city_id>/
+CITIES = []
+if CITIES:
+    SCRIPTS.append(["scripts/multi_city.py"] + [str(city) for city in CITIES])
+
+CHECK_INTERVAL = 5        # Sekunden zwischen zwei Prüfungen
+RESTART_DELAY = 2         # Erste Pause vor einem Neustart, verdoppelt sich bei jedem weiteren Absturz
+RESTART_DELAY_MAX = 300   # Obergrenze der Pause
+STABLE_AFTER = 300        # Läuft ein Prozess so lange, gilt der nächste Absturz wieder als erster
+TERMINATE_TIMEOUT = 10    # Sekunden zwischen terminate und kill bei hängenden Prozessen
+METRICS_FILE = os.path.join(BASE_DIR, "supervisor_metrics.json")
+
 PROCESSES = []
 
 def log(msg):
     print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}")
 
 def start_script(script):
+    # Eintrag ist entweder ein Skriptpfad oder eine Liste [Skriptpfad, Argumente...]
+    command = script if isinstance(script, list) else [script]
     try:
-        proc = subprocess.Popen(["python3", script])
+        proc = subprocess.Popen(["python3"] + command)
         log(f"Gestartet: {script} (PID: {proc.pid})")
         return proc
     except Exception as e:
         log(f"Fehler beim Starten von {script}: {e}")
         return None
 
+def script_name(script):
+    # Name für Heartbeat und Metriken: Dateiname ohne .py
+    path = script[0] if isinstance(script, list) else script
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+class Child:
+    """
+    Ein überwachtes Skript mit Neustart-Backoff und Ressourcenverbrauch.
+    """
+
+    def __init__(self, script):
+        self.script = script
+        self.name = script_name(script)
+        self.proc = None
+        self.started = None
+        self.restarts = 0
+        self.failures = 0        # Abstürze in Folge (für das Backoff)
+        self.next_start = 0      # Frühester Zeitpunkt für den nächsten Start
+        self.last_cpu = None     # (CPU-Sekunden, Zeitpunkt) der letzten Messung
+
+    def start(self):
+        self.proc = start_script(self.script)
+        self.started = time.monotonic()
+        self.last_cpu = None
+        if self.proc is None:
+            self.schedule_restart("Start fehlgeschlagen")
+
+    def schedule_restart(self, reason):
+        now = time.monotonic()
+        if self.started is not None and now - self.started >= STABLE_AFTER:
+            self.failures = 0
+        delay = min(RESTART_DELAY * 2 ** self.failures, RESTART_DELAY_MAX)
+        self.failures += 1
+        self.restarts += 1
+        self.next_start = now + delay
+        self.proc = None
+        log(f"{self.script}: {reason}. Neustart in {delay} s ...")
+
+    def stop(self):
+        if self.proc is None or self.proc.poll() is not None:
+            return
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=TERMINATE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+
+    def check(self):
+        if self.proc is None:
+            if time.monotonic() >= self.next_start:
+                self.start()
+            return
+        code = self.proc.poll()
+        if code is not None:
+            self.schedule_restart(f"beendet mit Exit-Code {code}")
+            return
+        # Prozess lebt, aber kommt er noch voran?
+        reason = stale_reason(self.name, self.proc.pid)
+        if reason:
+            log(f"{self.script} hängt ({reason}), wird beendet")
+            self.stop()
+            self.schedule_restart("hing")
+
+    def metrics(self):
+        now = time.monotonic()
+        entry = {
+            "script": self.script,
+            "running": self.proc is not None and self.proc.poll() is None,
+            "restarts": self.restarts,
+        }
+        if not entry["running"]:
+            entry["next_start_in"] = round(max(0, self.next_start - now), 1)
+            return entry
+
+        entry["pid"] = self.proc.pid
+        entry["uptime_s"] = round(now - self.started)
+        usage = process_usage(self.proc.pid)
+        if usage:
+            cpu_seconds, rss, threads, processes = usage
+            if self.last_cpu is not None and now > self.last_cpu[1]:
+                entry["cpu_percent"] = round(100 * (cpu_seconds - self.last_cpu[0]) / (now - self.last_cpu[1]), 1)
+            self.last_cpu = (cpu_seconds, now)
+            entry["rss_mb"] = round(rss / 1024 / 1024, 1)
+            entry["threads"] = threads
+            entry["processes"] = processes
+
+        heartbeat = read_heartbeat(self.name)
+        if heartbeat and heartbeat.get("pid") == self.proc.pid:
+            entry["heartbeat_age_s"] = round(time.time() - heartbeat["time"], 1)
+            for key in ("interval", "poll_seconds", "consumers_idle"):
+                if key in heartbeat:
+                    entry[key] = heartbeat[key]
+            # Abruf dauert länger als der Takt: der Sammler kommt nicht mehr hinterher
+            if "interval" in heartbeat and "poll_seconds" in heartbeat:
+                entry["behind"] = heartbeat["poll_seconds"] > heartbeat["interval"]
+        return entry
+
+
+# --- Ressourcenverbrauch (Prozess inkl. aller Kindprozesse) ---
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def read_proc_stat(pid):
+    # Felder nach dem Prozessnamen: state, ppid, ..., utime (11), stime (12), num_threads (17), rss (21)
+    with open(f"/proc/{pid}/stat", "r") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return {
+        "ppid": int(fields[1]),
+        "cpu": (int(fields[11]) + int(fields[12])) / CLOCK_TICKS,
+        "threads": int(fields[17]),
+        "rss": int(fields[21]) * PAGE_SIZE,
+    }
+
+def process_usage(pid):
+    """
+    CPU-Sekunden, RSS in Bytes, Threads und Anzahl Prozesse für pid und alle Nachfahren
+    (z.B. die Stadt-Worker von multi_city.py). None, wenn nicht ermittelbar.
+    """
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            procs = [root] + root.children(recursive=True)
+            cpu = rss = threads = 0
+            for proc in procs:
+                try:
+                    times = proc.cpu_times()
+                    cpu += times.user + times.system
+                    rss += proc.memory_info().rss
+                    threads += proc.num_threads()
+                except psutil.Error:
+                    pass
+            return cpu, rss, threads, len(procs)
+        except psutil.Error:
+            return None
+
+    try:
+        stats = {}
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    stats[int(entry)] = read_proc_stat(entry)
+                except (OSError, ValueError, IndexError):
+                    pass
+    except OSError:
+        return None
+    if pid not in stats:
+        return None
+
+    tree = [pid]
+    for current in tree:
+        tree.extend(child for child, stat in stats.items() if stat["ppid"] == current)
+    return (sum(stats[p]["cpu"] for p in tree), sum(stats[p]["rss"] for p in tree),
+            sum(stats[p]["threads"] for p in tree), len(tree))
+
+def write_metrics(children):
+    metrics = {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "children": {child.name: child.metrics() for child in children},
+    }
+    try:
+        with atomic_write(METRICS_FILE) as f:
+            json.dump(metrics, f, indent=2)
+    except Exception as e:
+        log(f"Fehler beim Schreiben der Metriken: {e}")
+
+
 def main():
     for script in SCRIPTS:
-        proc = start_script(script)
-        PROCESSES.append((script, proc))
+        child = Child(script)
+        child.start()
+        PROCESSES.append(child)
 
     try:
         while True:
-            for i, (script, proc) in enumerate(PROCESSES):
-                if proc is None or proc.poll() is not None:
-                    log(f"{script} ist abgestürzt oder konnte nicht gestartet werden. Starte neu ...")
-                    time.sleep(2)  # Kurze Pause vor Neustart
-                    new_proc = start_script(script)
-                    PROCESSES[i] = (script, new_proc)
-            time.sleep(10)
+            time.sleep(CHECK_INTERVAL)
+            for child in PROCESSES:
+                child.check()
+            write_metrics(PROCESSES)
     except KeyboardInterrupt:
         log("Beende alle Prozesse ...")
-        for _, proc in PROCESSES:
-            if proc and proc.poll() is None:
-                proc.terminate()
+        for child in PROCESSES:
+            if child.proc and child.proc.poll() is None:
+                child.proc.terminate()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,25 @@
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path, mode="w", fsync=False, **kwargs):
+    """
+    Schreibt zuerst nach <path>.tmp und ersetzt path erst nach vollständigem Schreiben (os.replace).
+    Leser und Sicherungen sehen so immer eine vollständige Fassung der Datei, nie eine halb
+    geschriebene. Bei einem Fehler bleibt die bisherige Datei unverändert.
+    """
+    temp = path + ".tmp"
+    try:
+        with open(temp, mode, **kwargs) as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
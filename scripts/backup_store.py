@@ -0,0 +1,319 @@
+"""
+Inkrementelle Sicherungen mit inhaltsadressierten Blöcken.
+
+Jede Datei wird in Blöcke fester Größe zerlegt, die unter ihrem SHA-256 genau einmal
+abgelegt werden (optional zstd-komprimiert). Eine Sicherung ist nur ein Manifest mit der
+Blockliste pro Datei. Unveränderte Dateien (gleiche Größe und mtime) übernehmen die
+Blockliste der vorigen Sicherung ohne Lesen; bei angehängten Dateien (CSV, JSON Lines)
+werden nur die neuen Blöcke gelesen. Platz und Zeit wachsen so mit den Änderungen,
+nicht mit dem Gesamtbestand.
+
+Gelesen wird jede Datei über einen einmal geöffneten Deskriptor: Dateien, die die Schreiber
+atomar ersetzen (temp + rename), werden so genau in der geöffneten Fassung gesichert. Bei
+Dateien, an die direkt angehängt wird, endet die Sicherung an der letzten vollständigen Zeile.
+
+Layout unter root:
+    snapshots/<name>.json   Manifest einer Sicherung
+    chunks/ab/abcdef...     Blöcke (Endung .zst bei zstd)
+"""
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+from datetime import datetime, timedelta
+
+from atomic_file import atomic_write
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 4 * 1024 * 1024  # Bytes pro Block
+# Werden an Ort und Stelle angehängt (.gz: stündliche Aufzeichnungen, ein gzip-Member pro Snapshot)
+APPEND_ONLY_SUFFIXES = (".csv", ".jsonl", ".txt", ".log", ".gz")
+# Werden nur über temp + os.replace geschrieben (atomic_write, Checkpoints, Aggregate, Parquet-Teile);
+# nur diese dürfen per Hardlink gesichert werden
+ATOMIC_SUFFIXES = (".json", ".pkl", ".parquet", ".geojson")
+# Zeilenbasiert: Sicherung endet an der letzten vollständigen Zeile
+LINE_SUFFIXES = (".csv", ".jsonl", ".txt")
+SNAPSHOT_FORMAT = "%Y-%m-%d_%H-%M-%S"
+LEGACY_SNAPSHOT_FORMAT = "%Y-%m-%d_%H-%M"  # Ältere Sicherungen (minutengenau)
+# Zeitstempel plus optionales Kollisionssuffix (_01, _02, ...)
+SNAPSHOT_NAME = re.compile(r"^(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}(?:-\d{2})?)(?:_\d+)?$")
+
+
+class BackupStore:
+    def __init__(self, root, compression="zstd"):
+        self.root = root
+        if compression == "zstd" and zstandard is None:
+            print("⚠️ zstandard nicht installiert - Blöcke werden unkomprimiert gespeichert")
+            compression = None
+        self.compression = compression
+        self.snapshot_dir = os.path.join(root, "snapshots")
+        self.chunk_dir = os.path.join(root, "chunks")
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        os.makedirs(self.chunk_dir, exist_ok=True)
+
+    # --- Blöcke ---
+
+    def _chunk_path(self, digest):
+        suffix = ".zst" if self.compression == "zstd" else ""
+        return os.path.join(self.chunk_dir, digest[:2], digest + suffix)
+
+    def _find_chunk(self, digest):
+        # Blöcke können aus Läufen mit anderer Kompression stammen
+        for path in (os.path.join(self.chunk_dir, digest[:2], digest + ".zst"),
+                     os.path.join(self.chunk_dir, digest[:2], digest)):
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put_chunk(self, data):
+        # Rückgabe: (Digest, neu geschriebene Bytes)
+        digest = hashlib.sha256(data).hexdigest()
+        if self._find_chunk(digest):
+            return digest, 0
+        path = self._chunk_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self.compression == "zstd":
+            data = zstandard.ZstdCompressor(level=3).compress(data)
+        with atomic_write(path, "wb") as f:
+            f.write(data)
+        return digest, len(data)
+
+    def read_chunk(self, digest):
+        path = self._find_chunk(digest)
+        if path is None:
+            raise FileNotFoundError(f"Block {digest} fehlt")
+        with open(path, "rb") as f:
+            data = f.read()
+        if path.endswith(".zst"):
+            data = zstandard.ZstdDecompressor().decompress(data)
+        return data
+
+    # --- Dateien ---
+
+    def store_file(self, path, previous=None):
+        """
+        Legt eine Datei ab und liefert (Manifest-Eintrag, gelesene Bytes, geschriebene Bytes).
+        previous: Eintrag derselben Datei aus der vorigen Sicherung.
+        """
+        read = written = 0
+        offset = 0
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if previous and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+                return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "chunks": list(previous["chunks"])}, 0, 0
+
+            size = consistent_size(f, path, stat.st_size)
+            entry = {"size": size, "mtime_ns": stat.st_mtime_ns, "chunks": []}
+            if previous and path.endswith(APPEND_ONLY_SUFFIXES) and size >= previous["size"]:
+                # Volle alte Blöcke übernehmen, sofern der letzte davon noch identisch ist (Stichprobe)
+                full = previous["size"] // CHUNK_SIZE
+                if full:
+                    f.seek((full - 1) * CHUNK_SIZE)
+                    sample = f.read(CHUNK_SIZE)
+                    read += len(sample)
+                    if hashlib.sha256(sample).hexdigest() == previous["chunks"][full - 1]:
+                        entry["chunks"] = previous["chunks"][:full]
+                        offset = full * CHUNK_SIZE
+            f.seek(offset)
+            while offset < size:
+                data = f.read(min(CHUNK_SIZE, size - offset))
+                if not data:
+                    break
+                offset += len(data)
+                read += len(data)
+                digest, new_bytes = self.put_chunk(data)
+                entry["chunks"].append(digest)
+                written += new_bytes
+        return entry, read, written
+
+    def restore_file(self, entry, target):
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        with atomic_write(target, "wb") as f:
+            for digest in entry["chunks"]:
+                f.write(self.read_chunk(digest))
+        os.utime(target, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+
+    # --- Sicherungen ---
+
+    def snapshots(self):
+        # Namen aller Sicherungen, älteste zuerst
+        return sorted(os.path.splitext(os.path.basename(p))[0] for p in glob.glob(os.path.join(self.snapshot_dir, "*.json")))
+
+    def load_manifest(self, name):
+        with open(os.path.join(self.snapshot_dir, name + ".json"), "r") as f:
+            return json.load(f)
+
+    def backup(self, sources, name=None):
+        """
+        Sichert Dateien und Ordner (rekursiv) als neue Sicherung.
+        Rückgabe: (Name, Statistik)
+        """
+        existing = self.snapshots()
+        name = unique_name(name or datetime.now().strftime(SNAPSHOT_FORMAT), existing)
+        previous = self.load_manifest(existing[-1])["files"] if existing else {}
+
+        files = {}
+        stats = {"files": 0, "unchanged": 0, "read_bytes": 0, "written_bytes": 0, "total_bytes": 0}
+        for source in sources:
+            if not os.path.exists(source):
+                print(f"Ordner/Datei nicht gefunden: {source}")
+                continue
+            base = os.path.dirname(source)
+            for path in _walk(source):
+                relative = os.path.relpath(path, base)
+                try:
+                    entry, read, written = self.store_file(path, previous.get(relative))
+                except OSError as e:
+                    print(f"Fehler beim Sichern von {path}: {e}")
+                    continue
+                files[relative] = entry
+                stats["files"] += 1
+                stats["unchanged"] += 1 if read == 0 else 0
+                stats["read_bytes"] += read
+                stats["written_bytes"] += written
+                stats["total_bytes"] += entry["size"]
+
+        manifest = {"created": datetime.now().isoformat(timespec="seconds"), "files": files, "stats": stats}
+        path = os.path.join(self.snapshot_dir, name + ".json")
+        with atomic_write(path) as f:
+            json.dump(manifest, f)
+        return name, stats
+
+    def restore(self, name, target):
+        manifest = self.load_manifest(name)
+        for relative, entry in manifest["files"].items():
+            self.restore_file(entry, os.path.join(target, relative))
+        return len(manifest["files"])
+
+    def prune(self, keep_last, keep_daily, now=None):
+        """
+        Aufbewahrung: die letzten keep_last Sicherungen plus die jeweils letzte Sicherung
+        jedes Tages der letzten keep_daily Tage. Danach nicht mehr referenzierte Blöcke löschen.
+        Rückgabe: (gelöschte Sicherungen, gelöschte Blöcke)
+        """
+        now = now or datetime.now()
+        names = self.snapshots()
+        dated = [name for name in names if snapshot_created(name) is not None]
+        keep = set(dated[-keep_last:]) if keep_last else set()
+        daily = {}
+        for name in names:
+            created = snapshot_created(name)
+            if created is None:
+                keep.add(name)  # Fremd benannte Sicherungen nie automatisch löschen
+                continue
+            if now - created <= timedelta(days=keep_daily):
+                daily[created.date()] = name  # sortiert: die letzte des Tages gewinnt
+        keep.update(daily.values())
+
+        removed = [name for name in names if name not in keep]
+        for name in removed:
+            os.remove(os.path.join(self.snapshot_dir, name + ".json"))
+        if not removed:
+            return [], 0
+
+        referenced = set()
+        for name in self.snapshots():
+            for entry in self.load_manifest(name)["files"].values():
+                referenced.update(entry["chunks"])
+        deleted = 0
+        for path in glob.glob(os.path.join(self.chunk_dir, "*", "*")):
+            digest = os.path.basename(path).split(".")[0]
+            if digest not in referenced:
+                os.remove(path)
+                deleted += 1
+        return removed, deleted
+
+
+def unique_name(name, existing):
+    # Zwei Sicherungen in derselben Sekunde (z.B. --once während der Schleife) überschreiben sich nicht
+    taken = set(existing)
+    candidate = name
+    counter = 0
+    while candidate in taken:
+        counter += 1
+        candidate = f"{name}_{counter:02d}"
+    return candidate
+
+
+def snapshot_created(name):
+    # Zeitpunkt einer Sicherung aus ihrem Namen; None bei fremd benannten Sicherungen
+    match = SNAPSHOT_NAME.match(name)
+    if match is None:
+        return None
+    for fmt in (SNAPSHOT_FORMAT, LEGACY_SNAPSHOT_FORMAT):
+        try:
+            return datetime.strptime(match.group(1), fmt)
+        except ValueError:
+            pass
+    return None
+
+
+def consistent_size(f, path, size):
+    """
+    Länge des gesicherten Teils: bei zeilenbasierten Dateien bis einschließlich des letzten
+    Zeilenumbruchs (eine gerade angehängte, unvollständige Zeile kommt in die nächste Sicherung).
+    """
+    if not path.endswith(LINE_SUFFIXES):
+        return size
+    end = size
+    while end > 0:
+        start = max(0, end - 64 * 1024)
+        f.seek(start)
+        block = f.read(end - start)
+        position = block.rfind(b"\n")
+        if position >= 0:
+            return start + position + 1
+        end = start
+    return 0
+
+
+def snapshot_file(path, dest):
+    """
+    Vollständige Sicherung einer einzelnen Datei ohne Blockspeicher: bekannt atomar ersetzte
+    Dateien (ATOMIC_SUFFIXES) per Hardlink (die Schreiber ändern die verlinkte Fassung nie mehr),
+    alle anderen als Kopie bis zum konsistenten Ende.
+    """
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    if path.endswith(ATOMIC_SUFFIXES):
+        try:
+            os.link(path, dest)
+            return
+        except OSError:
+            pass  # z.B. anderes Dateisystem: kopieren
+    with open(path, "rb") as f:
+        remaining = consistent_size(f, path, os.fstat(f.fileno()).st_size)
+        f.seek(0)
+        with open(dest, "wb") as out:
+            while remaining > 0:
+                data = f.read(min(1024 * 1024, remaining))
+                if not data:
+                    break
+                out.write(data)
+                remaining -= len(data)
+    shutil.copystat(path, dest)
+
+
+def snapshot_tree(source, dest):
+    # Ordner (oder Datei) source als dest sichern, siehe snapshot_file
+    for path in _walk(source):
+        target = dest if path == source else os.path.join(dest, os.path.relpath(path, source))
+        try:
+            snapshot_file(path, target)
+        except OSError as e:
+            print(f"Fehler beim Sichern von {path}: {e}")
+
+
+def _walk(source):
+    if os.path.isfile(source):
+        yield source
+        return
+    for directory, _, filenames in os.walk(source):
+        for filename in sorted(filenames):
+            if not filename.endswith(".tmp"):
+                yield os.path.join(directory, filename)
@@ -0,0 +1,90 @@
+"""
+Benchmark: Dekodierung eines nextbike-live-Snapshots mit allen verfügbaren JSON-Decodern,
+jeweils vollständig und auf die benötigten Felder reduziert (partial, mit ijson gestreamt).
+
+Aufruf (aus dem Projekt-Root):
+    python3 scripts/bench_feed_decoder.py [snapshot.json | recordings/.../HH.jsonl.gz] [--repeat 10]
+
+Ohne Snapshot werden die aktuellen Live-Daten verwendet. Gemessen werden Parse-Zeit
+(Median über --repeat Läufe), Spitzenspeicher (tracemalloc, eigener Lauf) und die Zeit für
+den Aufbau der Snapshot-Indizes auf dem Ergebnis.
+"""
+import argparse
+import gzip
+import json
+import statistics
+import time
+import tracemalloc
+
+import requests
+
+import feed_decoder
+from nextbike_feed import API_URL, CITY_ID, Snapshot
+
+
+def load_raw(source):
+    # Rohbytes des Feeds; bei Aufzeichnungen der erste vollständige Snapshot
+    if source.startswith("http"):
+        return requests.get(source, timeout=30).content
+    if source.endswith(".gz"):
+        with gzip.open(source, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if "data" in record:
+                    return json.dumps(record["data"]).encode("utf-8")
+        raise SystemExit(f"Kein vollständiger Snapshot in {source}")
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def options():
+    # (Bezeichnung, Funktion raw -> data)
+    result = []
+    for name in feed_decoder.available_decoders():
+        result.append((f"{name} (voll)", lambda raw, name=name: feed_decoder.loads(raw, name)))
+        result.append((f"{name} + ausdünnen", lambda raw, name=name: feed_decoder.slim_feed(feed_decoder.loads(raw, name), CITY_ID)))
+    if feed_decoder.ijson is not None:
+        result.append(("ijson (gestreamt)", lambda raw: feed_decoder.stream_feed(raw, CITY_ID)))
+    return result
+
+
+def parse_time(func, raw, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(raw)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def peak_memory(func, raw):
+    # Spitzenspeicher während des Parse inklusive des Ergebnisses
+    tracemalloc.start()
+    data = func(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("snapshot", nargs="?", default=API_URL)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    raw = load_raw(args.snapshot)
+    print(f"Snapshot: {len(raw) / 1024 / 1024:.1f} MB, Decoder: {', '.join(feed_decoder.available_decoders())}"
+          f"{', ijson' if feed_decoder.ijson is not None else ''}")
+    print(f"{'Variante':<22} {'Parse':>10} {'Spitze':>10} {'Indizes':>10} {'Plätze':>8}")
+
+    for label, func in options():
+        elapsed = parse_time(func, raw, args.repeat)
+        peak, data = peak_memory(func, raw)
+        start = time.perf_counter()
+        snapshot = Snapshot(data)
+        index_time = time.perf_counter() - start
+        print(f"{label:<22} {elapsed * 1000:8.1f} ms {peak / 1024 / 1024:7.1f} MB {index_time * 1000:7.1f} ms {len(snapshot.places):8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: Flexzonen-Klassifikation pro Snapshot, alte Schleife vs. FlexzoneIndex vs. FlexzoneRaster.
+
+Aufruf (aus dem Projekt-Root):
+    python3 scripts/bench_flexzones.py [snapshot.json] [--flexzones flexzone_bn.json] [--polls 20]
+
+Ohne Snapshot werden die aktuellen Live-Daten verwendet.
+"""
+import argparse
+import json
+import time
+
+import requests
+from shapely.geometry import Point, Polygon
+
+from flexzone_raster import FlexzoneRaster, polygons_from_geojson
+from flexzones import FlexzoneIndex
+from nextbike_feed import API_URL, Snapshot
+
+FLEXZONE_URL = "https://api.nextbike.net/reservation/geojson/flexzone_bn.json"
+
+
+def load_json(source):
+    if source.startswith("http"):
+        return requests.get(source, timeout=30).json()
+    with open(source, "r") as f:
+        return json.load(f)
+
+
+def load_polygons(geojson):
+    # Wie im Tracker: Polygon- und MultiPolygon-Features, jedes Teilpolygon einzeln
+    return [Polygon(rings[0], rings[1:]) for rings in polygons_from_geojson(geojson)]
+
+
+def classify_loop(polygons, coords):
+    # Bisheriges Vorgehen aus is_in_flexzone: Point bauen, alle Polygone prüfen
+    return [any(poly.contains(Point(lng, lat)) for poly in polygons) for lng, lat in coords]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("snapshot", nargs="?", default=API_URL)
+    parser.add_argument("--flexzones", default=FLEXZONE_URL)
+    parser.add_argument("--polls", type=int, default=20)
+    parser.add_argument("--cell", type=int, default=25, help="Zellgröße des Rasters in Metern")
+    args = parser.parse_args()
+
+    geojson = load_json(args.flexzones)
+    polygons = load_polygons(geojson)
+    snapshot = Snapshot(load_json(args.snapshot))
+    coords = [(p.get("lng"), p.get("lat")) for p in snapshot.places if p.get("lat") is not None]
+    print(f"{len(polygons)} Polygone, {len(coords)} Plätze pro Snapshot, {args.polls} Abfragen")
+
+    loop_total = 0.0
+    for _ in range(args.polls):
+        elapsed, expected = timed(classify_loop, polygons, coords)
+        loop_total += elapsed
+
+    index = FlexzoneIndex(polygons)
+    cold, result = timed(index.classify, coords)
+    warm_total = 0.0
+    for _ in range(args.polls - 1):
+        elapsed, result = timed(index.classify, coords)
+        warm_total += elapsed
+
+    mismatches = sum(1 for a, b in zip(expected, result) if a != b)
+    loop_avg = loop_total / args.polls
+    index_avg = (cold + warm_total) / args.polls
+    print(f"Schleife:          {loop_avg * 1000:8.1f} ms pro Snapshot")
+    print(f"Index (kalt):      {cold * 1000:8.1f} ms")
+    print(f"Index (warm):      {warm_total / max(args.polls - 1, 1) * 1000:8.1f} ms pro Snapshot")
+    print(f"Index (Mittel):    {index_avg * 1000:8.1f} ms pro Snapshot  -> Faktor {loop_avg / index_avg:.1f}x")
+    print(f"Abweichungen durch Koordinaten-Rundung: {mismatches}")
+
+    build, raster = timed(FlexzoneRaster, polygons_from_geojson(geojson), args.cell)
+    raster_total = 0.0
+    for _ in range(args.polls):
+        elapsed, raster_result = timed(raster.classify, coords)
+        raster_total += elapsed
+    raster_avg = raster_total / args.polls
+    stats = raster.stats()
+    print(f"Raster ({args.cell} m):     {raster_avg * 1000:8.1f} ms pro Snapshot  -> Faktor {loop_avg / raster_avg:.1f}x "
+          f"(Aufbau {build:.1f} s, {stats['bytes'] / 1024:.0f} KB, {raster.boundary_checks / args.polls:.0f} Randpunkte pro Snapshot)")
+    print(f"Abweichungen Raster: {sum(1 for a, b in zip(expected, raster_result) if a != b)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: Nächste-Station-Suche und Trip-Distanzen, Notebook-Schleifen vs. trip_geometry.
+
+Aufruf (aus dem Projekt-Root):
+    python3 scripts/bench_trip_geometry.py [trips.csv] [--stations snapshot.json|URL] [--sample 300]
+
+Ohne --stations werden die Stationen aus den Rückgaben an Stationen im CSV selbst abgeleitet,
+der Benchmark läuft dann komplett offline.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import trip_geometry as tg
+
+DEFAULT_TRIPS = "All_results/ThesisGraphicsRelatedWork/DATA/TripAnalysis_Data/modified_csv/modified_trip_data_no_station.csv"
+
+
+def stations_from_trips(df):
+    # Jede Station einmal, Position der ersten Rückgabe dort
+    stations = df[df['Return-Type'].str.startswith('Station', na=False)]
+    stations = stations.drop_duplicates('Return-Location')
+    return list(stations['Return-Location']), stations[['Return-Lat', 'Return-Lng']].to_numpy(dtype=np.float64)
+
+
+def haversine_np(lon1, lat1, lon2, lat2):
+    # Wörtlich aus Trip_analysis_2.ipynb
+    R = 6371000
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = np.radians(lat2 - lat1)
+    dlambda = np.radians(lon2 - lon1)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return R * c
+
+
+def kdtree_loop(df, coords):
+    # Trip_analysis_2.ipynb: KDTree neu bauen, dann iterrows mit Einzelabfrage pro Trip
+    from scipy.spatial import KDTree
+
+    tree = KDTree(coords[:, [1, 0]])
+    distances = []
+    for _, row in df.iterrows():
+        if pd.isna(row['Return-Lat']) or pd.isna(row['Return-Lng']):
+            distances.append(np.nan)
+            continue
+        _, idxs = tree.query([row['Return-Lng'], row['Return-Lat']], k=5)
+        nearest = coords[idxs]
+        distances.append(haversine_np(row['Return-Lng'], row['Return-Lat'], nearest[:, 1], nearest[:, 0]).min())
+    return np.array(distances)
+
+
+def geodesic_loop(df, coords):
+    # OperatingZones.ipynb: geodesic gegen jede Station, Zeile für Zeile
+    from geopy.distance import geodesic
+
+    station_positions = [tuple(c) for c in coords]
+    distances = []
+    for _, row in df.iterrows():
+        lat, lng = row['Return-Lat'], row['Return-Lng']
+        distances.append(min(geodesic((lat, lng), s).meters for s in station_positions))
+    return np.array(distances)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trips", nargs="?", default=DEFAULT_TRIPS)
+    parser.add_argument("--stations", help="Gespeicherter Snapshot oder URL (sonst aus dem CSV abgeleitet)")
+    parser.add_argument("--sample", type=int, default=300, help="Zeilen für die geodesic-Schleife (wird hochgerechnet)")
+    args = parser.parse_args()
+
+    load_time, trips = timed(tg.load_trips, args.trips)
+    names, coords = tg.load_stations(args.stations) if args.stations else stations_from_trips(trips)
+    print(f"{len(trips)} Trips, {len(names)} Stationen (Laden + Bereinigen: {load_time * 1000:.0f} ms)")
+
+    results = {}
+    try:
+        elapsed, results["kdtree"] = timed(kdtree_loop, trips, coords)
+        print(f"KDTree + iterrows (Rückgabe):        {elapsed * 1000:10.1f} ms")
+        loop_time = elapsed
+    except ImportError:
+        print("scipy nicht installiert - Notebook-Schleife mit KDTree übersprungen")
+        loop_time = None
+
+    try:
+        sample = trips.head(args.sample)
+        elapsed, results["geodesic"] = timed(geodesic_loop, sample, coords)
+        projected = elapsed / max(len(sample), 1) * len(trips)
+        print(f"geodesic + iterrows (Rückgabe):      {projected * 1000:10.1f} ms (hochgerechnet aus {len(sample)} Zeilen)")
+        loop_time = loop_time or projected
+    except ImportError:
+        print("geopy nicht installiert - geodesic-Schleife übersprungen")
+
+    tg._index_cache.clear()
+    cold, snapped = timed(tg.snap_trips, trips.copy(), (names, coords))
+    warm, snapped = timed(tg.snap_trips, trips.copy(), (names, coords), ("Return",))
+    distance_time, _ = timed(tg.add_trip_distance, trips.copy())
+    print(f"trip_geometry (Ausleihe + Rückgabe): {cold * 1000:10.1f} ms inkl. Indexaufbau")
+    print(f"trip_geometry (Rückgabe, Index warm): {warm * 1000:9.1f} ms")
+    print(f"Trip-Distanz (vektorisiert):         {distance_time * 1000:10.1f} ms")
+    if loop_time:
+        print(f"Faktor gegenüber der Notebook-Schleife: {loop_time / warm:.0f}x")
+
+    vectorized = snapped['Return-Station-Distance-m'].to_numpy()
+    for name, expected in results.items():
+        diff = np.nanmax(np.abs(expected - vectorized[:len(expected)]))
+        print(f"Max. Abweichung zu {name}: {diff:.2f} m")
+
+
+if __name__ == "__main__":
+    main()
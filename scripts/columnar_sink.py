@@ -0,0 +1,115 @@
+import atexit
+import os
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet-Ausgabe ist optional
+    pa = None
+    pq = None
+
+# Micro-Batches: Schreiben nach so vielen Zeilen oder spätestens nach so vielen Sekunden
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 60
+
+
+def available():
+    return pa is not None
+
+
+def category():
+    # Wiederkehrende Strings (Typen, Stationsnamen) als Dictionary-Spalte speichern
+    return pa.dictionary(pa.int32(), pa.string())
+
+
+class ParquetSink:
+    """
+    Puffert Zeilen und schreibt sie als Parquet-Dateien, partitioniert nach Tag:
+        root/date=YYYY-MM-DD/part-<zeitstempel>.parquet
+    Parquet-Dateien lassen sich nicht anhängen, daher erzeugt jeder Flush pro Tag eine neue Teildatei.
+
+    columns: Liste von (spaltenname, pyarrow-typ); Zeilen werden als Listen in dieser Reihenfolge übergeben.
+    time_column: Name der Zeitspalte, nach der partitioniert wird.
+    """
+
+    def __init__(self, root, columns, time_column, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        if pa is None:
+            raise RuntimeError("pyarrow ist nicht installiert")
+        self.root = root
+        self.names = [name for name, _ in columns]
+        self.schema = pa.schema(columns)
+        self.time_index = self.names.index(time_column)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._rows = []
+        self._last_flush = time.monotonic()
+        self._part = 0
+        atexit.register(self.flush)
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        # Vom Konsumenten bei jedem Snapshot aufgerufen: auch ohne neue Zeilen spätestens nach flush_interval schreiben
+        if self._rows and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(row[self.time_index].strftime("%Y-%m-%d"), []).append(row)
+
+        for day, day_rows in by_day.items():
+            columns = list(zip(*day_rows))
+            arrays = []
+            for values, field in zip(columns, self.schema):
+                if pa.types.is_dictionary(field.type):
+                    arrays.append(pa.array(list(values), type=pa.string()).dictionary_encode())
+                else:
+                    arrays.append(pa.array(list(values), type=field.type))
+            table = pa.Table.from_arrays(arrays, schema=self.schema)
+            directory = os.path.join(self.root, f"date={day}")
+            os.makedirs(directory, exist_ok=True)
+            self._part += 1
+            name = f"part-{int(time.time())}-{os.getpid()}-{self._part}.parquet"
+            # Versteckte Temp-Datei: Leser überspringen Dateien mit führendem Punkt
+            temp = os.path.join(directory, f".{name}.tmp")
+            pq.write_table(table, temp)
+            os.replace(temp, os.path.join(directory, name))
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def load_partitioned(root, start_date=None, end_date=None, columns=None):
+    """
+    Liest einen nach Tag partitionierten Parquet-Ordner als DataFrame.
+    start_date/end_date ("YYYY-MM-DD") werden als Partitionsfilter übergeben,
+    nicht betroffene Tage werden also gar nicht gelesen.
+    """
+    import pandas as pd
+    import pyarrow.dataset as ds
+
+    # Partitionsspalte "date" als String, damit die Filter lexikographisch auf YYYY-MM-DD greifen
+    partitioning = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+    filters = []
+    if start_date:
+        filters.append(("date", ">=", start_date))
+    if end_date:
+        filters.append(("date", "<=", end_date))
+    return pd.read_parquet(root, engine="pyarrow", columns=columns, filters=filters or None,
+                           partitioning=partitioning)
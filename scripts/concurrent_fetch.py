@@ -0,0 +1,82 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def pooled_session(pool_size=4):
+    """
+    requests.Session mit Keep-Alive-Verbindungspool, damit nicht jeder Abruf
+    einen neuen TCP/TLS-Handshake bezahlt.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class ConcurrentFetcher:
+    """
+    Ruft mehrere JSON-Quellen gleichzeitig über eine gemeinsame Session ab.
+    Jede Quelle hat ihre eigene Frist und ihren eigenen Worker; eine langsame Quelle
+    verzögert die anderen nicht. Läuft der vorige Abruf einer Quelle noch, wird sie
+    in diesem Takt übersprungen statt Abrufe aufzustauen.
+
+    sources: Dict name -> (url, timeout_in_sekunden)
+    """
+
+    def __init__(self, sources):
+        self.sources = dict(sources)
+        self.session = pooled_session(len(self.sources))
+        self.executors = {
+            name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"fetch-{name}")
+            for name in self.sources
+        }
+        self._inflight = {}
+
+    def _get_json(self, url, timeout):
+        response = self.session.get(url, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def start(self):
+        # Alle Abrufe starten; Rückgabe: Dict name -> (future oder None, absolute Frist)
+        started = time.monotonic()
+        pending = {}
+        for name, (url, timeout) in self.sources.items():
+            previous = self._inflight.get(name)
+            if previous is not None and not previous.done():
+                pending[name] = (None, started)
+                continue
+            future = self.executors[name].submit(self._get_json, url, timeout)
+            self._inflight[name] = future
+            pending[name] = (future, started + timeout)
+        return pending
+
+    def collect(self, pending):
+        """
+        Wartet auf jede Quelle höchstens bis zu ihrer Frist.
+        Rückgabe: Dict name -> Daten ({} bei Fehler oder Zeitüberschreitung)
+        """
+        results = {}
+        for name, (future, deadline) in pending.items():
+            if future is None:
+                print(f"⏳ {name}: vorheriger Abruf läuft noch, übersprungen")
+                results[name] = {}
+                continue
+            try:
+                results[name] = future.result(timeout=max(0, deadline - time.monotonic()))
+            except Exception as e:
+                print(f"🌐 Fehler beim Abrufen von {name}: {str(e) or type(e).__name__}")
+                results[name] = {}
+        return results
+
+    def fetch_all(self):
+        return self.collect(self.start())
+
+    def close(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=False)
+        self.session.close()
@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+# Rundung der Koordinaten für den Cache (5 Nachkommastellen ≈ 1 m)
+CACHE_PRECISION = 5
+CACHE_SIZE = 50000
+
+
+class CoordinateCache:
+    """
+    LRU-Cache für Punktabfragen auf gerundeten Koordinaten (Flexzonen, Bezirke).
+    Die meisten Punkte (geparkte Fahrräder, Stationen) wiederholen sich, daher wird
+    ein Punkt nur beim ersten Auftreten wirklich geprüft.
+    """
+
+    def __init__(self, precision=CACHE_PRECISION, cache_size=CACHE_SIZE, default=None):
+        self.precision = precision
+        self.cache_size = cache_size
+        self.default = default  # Ergebnis für fehlende Koordinaten (None oder NaN)
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, lng, lat):
+        if lng is None or lat is None or lng != lng or lat != lat:  # None oder NaN
+            return None
+        return (round(lng, self.precision), round(lat, self.precision))
+
+    def _remember(self, key, value):
+        self._cache[key] = value
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def resolve(self, coords, lookup_many):
+        """
+        coords: Liste von (lng, lat)-Paaren
+        lookup_many(keys): exakte Prüfung der noch unbekannten gerundeten Punkte in einem Aufruf
+        Rückgabe: Liste der Ergebnisse in derselben Reihenfolge.
+        """
+        keys = [self.key(lng, lat) for lng, lat in coords]
+        results = {}
+        missing = []
+        for key in keys:
+            if key is None or key in results:
+                continue
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                results[key] = self._cache[key]
+                self.hits += 1
+            else:
+                results[key] = None
+                missing.append(key)
+
+        if missing:
+            self.misses += len(missing)
+            for key, value in zip(missing, lookup_many(missing)):
+                results[key] = value
+                self._remember(key, value)
+
+        return [results[key] if key is not None else self.default for key in keys]
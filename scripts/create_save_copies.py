@@ -1,8 +1,12 @@
+import argparse
 import os
 import shutil
-import time
 from datetime import datetime
 
+from backup_store import BackupStore, snapshot_tree
+from heartbeat import write_heartbeat
+from ticker import Ticker
+
 # Projekt-Root (eine Ebene über dem scripts-Ordner)
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
@@ -10,6 +14,7 @@ FOLDERS_TO_COPY = [
     os.path.join(BASE_DIR, "results_station_reservation"),
     os.path.join(BASE_DIR, "results_total_bikes"),
     os.path.join(BASE_DIR, "results_trips"),
+    os.path.join(BASE_DIR, "results_cities"),  # Nur im Mehrstädte-Betrieb (multi_city.py)
 ]
 # Sicherungsordner-Basis im Projekt-Root
 BACKUP_BASE = os.path.join(BASE_DIR, "safety_copies")
@@ -17,6 +22,24 @@ BACKUP_BASE = os.path.join(BASE_DIR, "safety_copies")
 # Alle 4 Stunden (in Sekunden)
 INTERVAL = 4 * 60 * 60  # 4 Stunden
 
+# "incremental": nur geänderte Blöcke speichern (backup_store.py), "copy": vollständige Kopie pro Sicherung
+BACKUP_MODE = "incremental"
+INCREMENTAL_DIR = os.path.join(BACKUP_BASE, "incremental")
+COMPRESSION = "zstd"  # Blöcke mit zstd komprimieren (falls installiert), None = unkomprimiert
+KEEP_LAST = 12        # Aufbewahrung: die letzten 12 Sicherungen (2 Tage) ...
+KEEP_DAILY = 30       # ... plus die letzte Sicherung jedes Tages der letzten 30 Tage
+NICE = 10             # Niedrigere CPU-Priorität, damit die Sammler nicht ausgebremst werden
+
+def make_incremental_backup():
+    store = BackupStore(INCREMENTAL_DIR, COMPRESSION)
+    name, stats = store.backup(FOLDERS_TO_COPY)
+    print(f"Sicherung {name}: {stats['files']} Dateien ({stats['unchanged']} unverändert), "
+          f"{stats['total_bytes'] / 1024 / 1024:.1f} MB gesamt, {stats['read_bytes'] / 1024 / 1024:.1f} MB gelesen, "
+          f"{stats['written_bytes'] / 1024 / 1024:.1f} MB neu geschrieben")
+    removed, chunks = store.prune(KEEP_LAST, KEEP_DAILY)
+    if removed:
+        print(f"Aufbewahrung: {len(removed)} alte Sicherung(en) und {chunks} Blöcke gelöscht")
+
 def make_backup():
     now = datetime.now()
     folder_name = now.strftime("%Y-%m-%d_%H-%M")
@@ -26,25 +49,55 @@ def make_backup():
         if os.path.exists(folder):
             try:
                 dest = os.path.join(backup_dir, os.path.basename(folder))
-                if os.path.isdir(folder):
-                    if os.path.exists(dest):
-                        shutil.rmtree(dest)
-                    shutil.copytree(folder, dest)
-                else:
-                    shutil.copy2(folder, dest)
+                if os.path.isdir(dest):
+                    shutil.rmtree(dest)
+                # Atomar ersetzte Dateien per Hardlink, angehängte bis zur letzten vollständigen Zeile
+                snapshot_tree(folder, dest)
             except Exception as e:
                 print(f"Fehler beim Kopieren von {folder}: {e}")
         else:
             print(f"Ordner/Datei nicht gefunden: {folder}")
 
 def main():
+    if NICE and hasattr(os, "nice"):
+        os.nice(NICE)
+    # Backups im festen Abstand von INTERVAL, unabhängig von der Dauer des Kopierens
+    ticker = Ticker(INTERVAL)
     while True:
+        ticker.wait()
         try:
-            make_backup()
+            if BACKUP_MODE == "incremental":
+                make_incremental_backup()
+            else:
+                make_backup()
             print(f"Sicherheitskopie erstellt um {datetime.now().isoformat(timespec='seconds')}")
         except Exception as e:
             print(f"Backup-Fehler: {e}")
-        time.sleep(INTERVAL)
+        # Nächster Heartbeat erst nach dem nächsten Backup (plus Spielraum für dessen Dauer)
+        write_heartbeat("create_save_copies", timeout=INTERVAL + 3600)
+
+def cli():
+    parser = argparse.ArgumentParser(description="Sicherheitskopien der Ergebnisordner")
+    parser.add_argument("--once", action="store_true", help="Eine Sicherung erstellen und beenden")
+    parser.add_argument("--list", action="store_true", help="Inkrementelle Sicherungen auflisten")
+    parser.add_argument("--restore", nargs=2, metavar=("NAME", "ZIEL"), help="Inkrementelle Sicherung wiederherstellen")
+    args = parser.parse_args()
+
+    if args.list:
+        store = BackupStore(INCREMENTAL_DIR, COMPRESSION)
+        for name in store.snapshots():
+            stats = store.load_manifest(name)["stats"]
+            print(f"{name}: {stats['files']} Dateien, {stats['total_bytes'] / 1024 / 1024:.1f} MB, "
+                  f"{stats['written_bytes'] / 1024 / 1024:.1f} MB neu")
+    elif args.restore:
+        count = BackupStore(INCREMENTAL_DIR, COMPRESSION).restore(*args.restore)
+        print(f"{count} Dateien nach {args.restore[1]} wiederhergestellt")
+    elif args.once and BACKUP_MODE == "incremental":
+        make_incremental_backup()
+    elif args.once:
+        make_backup()
+    else:
+        main()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
\ No newline at end of file
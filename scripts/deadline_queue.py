@@ -0,0 +1,48 @@
+import heapq
+import itertools
+
+
+class DeadlineQueue:
+    """
+    Min-Heap von Aufgaben mit Fälligkeitszeitpunkt.
+    Ersetzt schlafende Threads: fällige Einträge werden im Hauptloop abgeholt.
+    Abgesagte Einträge bleiben im Heap und werden verworfen, sobald sie an der Spitze stehen.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()  # Stabile Reihenfolge bei gleichen Deadlines
+        self._pending = set()               # Handles der noch nicht abgeholten, nicht abgesagten Einträge
+
+    def __len__(self):
+        return len(self._pending)
+
+    def push(self, deadline, item):
+        # Rückgabe: Handle für cancel
+        handle = next(self._counter)
+        heapq.heappush(self._heap, (deadline, handle, item))
+        self._pending.add(handle)
+        return handle
+
+    def cancel(self, handle):
+        # Eintrag absagen; bereits abgeholte oder abgesagte Handles werden ignoriert
+        self._pending.discard(handle)
+
+    def _drop_cancelled(self):
+        while self._heap and self._heap[0][1] not in self._pending:
+            heapq.heappop(self._heap)
+
+    def pop_due(self, now):
+        # Alle Einträge mit deadline <= now in Fälligkeitsreihenfolge liefern
+        due = []
+        self._drop_cancelled()
+        while self._heap and self._heap[0][0] <= now:
+            _, handle, item = heapq.heappop(self._heap)
+            self._pending.discard(handle)
+            due.append(item)
+            self._drop_cancelled()
+        return due
+
+    def next_deadline(self):
+        self._drop_cancelled()
+        return self._heap[0][0] if self._heap else None
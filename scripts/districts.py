@@ -0,0 +1,139 @@
+"""
+Bezirkszuordnung für Trips über einen vorbereiteten räumlichen Index auf bezirksgrenzen.geojson.
+
+Statt bei jedem Notebook-Lauf per geopandas.sjoin zu verschneiden, werden die Trips
+einmal in einem Durchlauf mit Rental-District/Return-District versehen; Bezirksflüsse
+sind danach ein einfaches groupby.
+
+Aufruf (aus dem Projekt-Root):
+    python3 scripts/districts.py results_trips/nextbike_trips.csv [--output trips_mit_bezirk.csv]
+
+Im Notebook:
+    import districts
+    trips = districts.tag_trips(trip_df)
+    flows = districts.district_flows(trips, min_count=10)
+"""
+import argparse
+import json
+import os
+
+import shapely
+from shapely.geometry import Point, shape
+from shapely.prepared import prep
+from shapely.strtree import STRtree
+
+from coordinate_cache import CACHE_PRECISION, CACHE_SIZE, CoordinateCache
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DISTRICT_FILE = os.path.join(BASE_DIR, "All_results/ThesisGraphicsRelatedWork/DATA/TripAnalysis_Data/bezirksgrenzen.geojson")
+DISTRICT_COLUMN = "Gemeinde_name"
+
+
+class DistrictIndex:
+    """
+    Räumlicher Index über die Bezirkspolygone mit LRU-Cache auf gerundeten Koordinaten.
+    Rückgaben an Stationen liegen immer auf denselben Koordinaten, die meisten
+    Punkte werden daher nur einmal wirklich geprüft.
+    """
+
+    def __init__(self, names, polygons, precision=CACHE_PRECISION, cache_size=CACHE_SIZE):
+        self.names = list(names)
+        self.polygons = list(polygons)
+        self.tree = STRtree(self.polygons)
+        self.prepared = [prep(poly) for poly in self.polygons]
+        self.cache = CoordinateCache(precision, cache_size)
+
+    @classmethod
+    def from_geojson(cls, path=DISTRICT_FILE, name_column=DISTRICT_COLUMN, **kwargs):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        names = []
+        polygons = []
+        for feature in data.get("features", []):
+            names.append(feature["properties"][name_column])
+            polygons.append(shape(feature["geometry"]))
+        return cls(names, polygons, **kwargs)
+
+    def _lookup_many(self, coords):
+        # Exakte Zuordnung für mehrere Punkte in einem Aufruf; None außerhalb aller Bezirke
+        found = [None] * len(coords)
+        if hasattr(shapely, "points"):
+            # Shapely 2: vektorisierte STRtree-Abfrage, liefert (Punkt, Polygon)-Paare
+            xs = [c[0] for c in coords]
+            ys = [c[1] for c in coords]
+            point_idx, poly_idx = self.tree.query(shapely.points(xs, ys), predicate="within")
+            for i, j in zip(point_idx, poly_idx):
+                found[int(i)] = self.names[int(j)]
+            return found
+        # Shapely 1.x: Kandidaten aus dem STRtree, Prüfung mit vorbereiteten Geometrien
+        lookup = {id(poly): i for i, poly in enumerate(self.polygons)}
+        for n, (lng, lat) in enumerate(coords):
+            point = Point(lng, lat)
+            for poly in self.tree.query(point):
+                i = lookup[id(poly)]
+                if self.prepared[i].contains(point):
+                    found[n] = self.names[i]
+                    break
+        return found
+
+    def district(self, lng, lat):
+        return self.lookup([(lng, lat)])[0]
+
+    def lookup(self, coords):
+        """
+        Ordnet eine Liste von (lng, lat)-Paaren in einem Aufruf zu.
+        Rückgabe: Liste von Bezirksnamen (None außerhalb) in derselben Reihenfolge.
+        """
+        return self.cache.resolve(coords, self._lookup_many)
+
+
+_default_index = None
+
+def default_index():
+    # Bezirksgrenzen nur einmal pro Prozess laden
+    global _default_index
+    if _default_index is None:
+        _default_index = DistrictIndex.from_geojson()
+    return _default_index
+
+
+def tag_trips(df, index=None, ends=("Rental", "Return")):
+    """
+    Ergänzt <End>-District für Ausleihe und Rückgabe in einem Durchlauf über alle Trips.
+    df: DataFrame mit den Spalten des Trip-CSV.
+    """
+    index = index or default_index()
+    for end in ends:
+        coords = list(zip(df[f"{end}-Lng"].astype(float), df[f"{end}-Lat"].astype(float)))
+        df[f"{end}-District"] = index.lookup(coords)
+    return df
+
+
+def district_flows(df, min_count=1):
+    # Bezirk-zu-Bezirk-Matrix als Paarliste (Start, Ziel, count)
+    from trip_geometry import flow_counts
+
+    return flow_counts(df, "Rental-District", "Return-District", min_count)
+
+
+def main():
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trips")
+    parser.add_argument("--districts", default=DISTRICT_FILE)
+    parser.add_argument("--output", help="Zieldatei (Standard: <trips>_districts.csv)")
+    args = parser.parse_args()
+
+    index = DistrictIndex.from_geojson(args.districts)
+    trips = tag_trips(pd.read_csv(args.trips), index)
+    output = args.output or args.trips.rsplit(".", 1)[0] + "_districts.csv"
+    trips.to_csv(output, index=False)
+
+    outside = trips["Return-District"].isna().sum()
+    print(f"{len(trips)} Trips mit Bezirk gespeichert in {output} "
+          f"({index.cache.misses} Punkte geprüft, {index.cache.hits} aus dem Cache, {outside} Rückgaben außerhalb)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import atexit
+import csv
+import os
+import queue
+import shutil
+import threading
+import time
+
+import instrumentation
+from atomic_file import atomic_write
+
+MAX_BATCH = 1000  # Zeilen, die der Schreib-Thread höchstens auf einmal übernimmt
+
+# Pufferung und Haltbarkeit
+BUFFER_SIZE = 64 * 1024  # Dateipuffer pro offener Datei (Bytes)
+FLUSH_ROWS = 500         # Puffer an das Betriebssystem übergeben, sobald so viele Zeilen anstehen ...
+FLUSH_INTERVAL = 1.0     # ... oder spätestens nach so vielen Sekunden
+FSYNC_INTERVAL = 30.0    # Sekunden zwischen zwei fsync (None = nie, 0 = nach jedem Flush)
+MAX_OPEN_FILES = 32      # Weitere Dateien verdrängen die am längsten ungenutzte
+
+
+def ensure_csv_header(path, header):
+    """
+    Legt die CSV mit Header an bzw. ergänzt den Header, falls die erste Zeile ihn nicht enthält.
+    Gelesen wird nur die erste Zeile; nur im Reparaturfall wird die Datei (gestreamt) neu geschrieben.
+    Rückgabe: True, wenn die Datei neu angelegt wurde.
+    """
+    if not os.path.exists(path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow(header)
+        return True
+
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        first_line = f.readline()
+    if first_line and header[0] in first_line:
+        return False
+
+    # Header fehlt: voranstellen, Rest der Datei blockweise kopieren
+    with atomic_write(path, "w", newline="", encoding="utf-8") as out, open(path, "r", newline="", encoding="utf-8") as f:
+        csv.writer(out).writerow(header)
+        shutil.copyfileobj(f, out)
+    return False
+
+
+class _OpenFile:
+    __slots__ = ("file", "writer", "pending")
+
+    def __init__(self, path, buffer_size):
+        self.file = open(path, "a", newline="", encoding="utf-8", buffering=buffer_size)
+        self.writer = csv.writer(self.file)
+        self.pending = 0  # Zeilen im Puffer seit dem letzten Flush
+
+
+class EventSink:
+    """
+    Einziger Schreiber für die Ergebnis-CSVs eines Prozesses.
+
+    Die Detektoren legen fertige Zeilen nur in eine Queue (write_row); ein eigener
+    Thread hält die Dateien offen, schreibt in deren Puffer und übergibt ihn erst nach
+    flush_rows Zeilen oder flush_interval Sekunden an das Betriebssystem (fsync alle
+    fsync_interval Sekunden). Ein write-Syscall verteilt sich so auf viele Ereignisse;
+    bei einem Absturz gehen höchstens die Zeilen der letzten flush_interval Sekunden verloren.
+    """
+
+    _STOP = object()
+    _FLUSH = object()
+
+    def __init__(self, max_batch=MAX_BATCH, flush_rows=FLUSH_ROWS, flush_interval=FLUSH_INTERVAL,
+                 fsync_interval=FSYNC_INTERVAL, buffer_size=BUFFER_SIZE, max_open_files=MAX_OPEN_FILES):
+        self.max_batch = max_batch
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.buffer_size = buffer_size
+        self.max_open_files = max_open_files
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._files = {}  # Pfad -> _OpenFile, in Reihenfolge der letzten Nutzung
+        self._last_flush = time.monotonic()
+        self._last_fsync = time.monotonic()
+        self._unsynced = False  # Geflusht, aber noch nicht per fsync auf der Platte
+        self.rows_written = 0
+        self.batches = 0
+        self.flushes = 0
+        self.fsyncs = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="event-sink", daemon=True)
+                self._thread.start()
+        return self
+
+    def write_row(self, path, row):
+        # Thread-sicher; kehrt sofort zurück, geschrieben wird im Schreib-Thread
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        self._queue.put((path, list(row)))
+
+    def flush(self):
+        # Wartet, bis alle bisher übergebenen Zeilen geschrieben und an das Betriebssystem übergeben sind
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(self._FLUSH)
+            self._queue.join()
+
+    def close(self):
+        # Restliche Zeilen schreiben, fsync und Dateien schließen
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+
+    def _take_batch(self):
+        # Auf das erste Element höchstens bis zum nächsten fälligen Flush/fsync warten, dann alles Anliegende mitnehmen
+        deadlines = []
+        if any(f.pending for f in self._files.values()):
+            deadlines.append(self._last_flush + self.flush_interval)
+        if self._unsynced:
+            deadlines.append(self._last_fsync + self.fsync_interval)
+        timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _open(self, path):
+        open_file = self._files.pop(path, None)
+        if open_file is None:
+            if len(self._files) >= self.max_open_files:
+                oldest = next(iter(self._files))
+                self._close_file(self._files.pop(oldest))
+            open_file = _OpenFile(path, self.buffer_size)
+        self._files[path] = open_file  # ans Ende: zuletzt genutzt
+        return open_file
+
+    def _close_file(self, open_file):
+        try:
+            open_file.file.flush()
+            if self.fsync_interval is not None:
+                os.fsync(open_file.file.fileno())
+            open_file.file.close()
+        except Exception as e:
+            print(f"❌ Fehler beim Schließen von {open_file.file.name}: {e}")
+
+    def _flush_files(self, force_fsync=False):
+        now = time.monotonic()
+        fsync = self.fsync_interval is not None and (force_fsync or now - self._last_fsync >= self.fsync_interval)
+        for path, open_file in self._files.items():
+            if not open_file.pending and not fsync:
+                continue
+            try:
+                open_file.file.flush()
+                if fsync:
+                    os.fsync(open_file.file.fileno())
+                open_file.pending = 0
+            except Exception as e:
+                print(f"❌ Fehler beim Schreiben nach {path}: {e}")
+        self._last_flush = now
+        self.flushes += 1
+        if fsync:
+            self._last_fsync = now
+            self._unsynced = False
+            self.fsyncs += 1
+        elif self.fsync_interval is not None:
+            self._unsynced = True
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            stop = force = False
+            by_path = {}
+            for item in batch:
+                if item is self._STOP:
+                    stop = True
+                elif item is self._FLUSH:
+                    force = True
+                else:
+                    path, row = item
+                    by_path.setdefault(path, []).append(row)
+
+            started = instrumentation.start()
+            for path, rows in by_path.items():
+                try:
+                    open_file = self._open(path)
+                    open_file.writer.writerows(rows)
+                    open_file.pending += len(rows)
+                    self.rows_written += len(rows)
+                except Exception as e:
+                    print(f"❌ Fehler beim Schreiben nach {path}: {e}")
+                    # Datei beim nächsten Mal neu öffnen
+                    broken = self._files.pop(path, None)
+                    if broken is not None:
+                        self._close_file(broken)
+            if by_path:
+                self.batches += 1
+
+            pending = sum(f.pending for f in self._files.values())
+            now = time.monotonic()
+            if force or stop or pending >= self.flush_rows or (
+                    pending and now - self._last_flush >= self.flush_interval) or (
+                    self._unsynced and now - self._last_fsync >= self.fsync_interval):
+                self._flush_files(force_fsync=stop)
+            instrumentation.stop("sink.write_batch", started)
+
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                for open_file in self._files.values():
+                    self._close_file(open_file)
+                self._files.clear()
+                return
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+def shared_sink():
+    # Ein Schreib-Thread pro Prozess, gemeinsam für alle Detektoren
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = EventSink().start()
+            atexit.register(_sink.close)
+        return _sink
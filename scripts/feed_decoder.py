@@ -0,0 +1,155 @@
+"""
+JSON-Dekodierung des nextbike-live-Feeds.
+
+Nutzt die schnellste installierte Bibliothek (orjson, dann ujson) und fällt sonst auf
+das json-Modul der Standardbibliothek zurück. Optional wird der Feed auf die Felder
+reduziert, die die Detektoren tatsächlich lesen (partial): mit ijson gestreamt, also ohne
+den vollständigen Objektbaum aufzubauen, sonst durch Ausdünnen nach dem vollen Parse.
+"""
+import io
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Konfiguration
+DECODER = "auto"  # "auto", "orjson", "ujson" oder "json"
+
+# Von den Detektoren, dem Wetter-Sammler und den Fingerprints gelesene Felder
+COUNTRY_FIELDS = ("booked_bikes", "set_point_bikes", "available_bikes")
+CITY_FIELDS = ("uid",)
+PLACE_FIELDS = (
+    "uid", "name", "lat", "lng", "spot", "bike", "terminal_type", "bike_numbers",
+    "bikes", "booked_bikes", "bikes_available_to_rent", "bike_racks", "free_racks", "special_racks",
+)
+BIKE_FIELDS = ("number", "active", "state")
+
+PLACE_PREFIX = "countries.item.cities.item.places.item"
+
+
+def _loads_orjson(raw):
+    return orjson.loads(raw)
+
+def _loads_ujson(raw):
+    return ujson.loads(raw)
+
+def _loads_json(raw):
+    return json.loads(raw)
+
+DECODERS = {"orjson": _loads_orjson, "ujson": _loads_ujson, "json": _loads_json}
+
+
+def available_decoders():
+    # In Reihenfolge der Bevorzugung
+    names = []
+    if orjson is not None:
+        names.append("orjson")
+    if ujson is not None:
+        names.append("ujson")
+    names.append("json")
+    return names
+
+
+def decoder_name(name=None):
+    name = name or DECODER
+    if name == "auto":
+        return available_decoders()[0]
+    if name not in available_decoders():
+        raise ValueError(f"JSON-Decoder {name} ist nicht installiert (verfügbar: {', '.join(available_decoders())})")
+    return name
+
+
+def loads(raw, decoder=None):
+    # raw: bytes oder str
+    return DECODERS[decoder_name(decoder)](raw)
+
+
+def slim_place(place):
+    slim = {key: place[key] for key in PLACE_FIELDS if key in place}
+    if "bike_list" in place:
+        slim["bike_list"] = [{key: bike[key] for key in BIKE_FIELDS if key in bike} for bike in place["bike_list"]]
+    return slim
+
+
+def slim_feed(data, city_id=None):
+    """
+    Reduziert einen vollständig geparsten Feed auf die benötigten Felder
+    (mit city_id nur die Plätze dieser Stadt).
+    """
+    countries = []
+    for country in data.get("countries", []):
+        slim_country = {key: country[key] for key in COUNTRY_FIELDS if key in country}
+        slim_country["cities"] = []
+        for city in country.get("cities", []):
+            if city_id is not None and city.get("uid") != city_id:
+                continue
+            slim_city = {key: city[key] for key in CITY_FIELDS if key in city}
+            slim_city["places"] = [slim_place(place) for place in city.get("places", [])]
+            slim_country["cities"].append(slim_city)
+        countries.append(slim_country)
+    return {"countries": countries}
+
+
+def stream_feed(source, city_id=None):
+    """
+    Wie slim_feed, aber mit ijson direkt aus bytes oder einem Datei-Objekt gelesen:
+    es wird immer nur ein Platz vollständig aufgebaut.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    countries = []
+    country = city = builder = None
+    for prefix, event, value in ijson.parse(source, use_float=True):
+        if builder is not None:
+            # Innerhalb eines Platzes: Ereignisse an den Builder, am Ende ausdünnen
+            if prefix == PLACE_PREFIX and event == "end_map":
+                city["places"].append(slim_place(builder.value))
+                builder = None
+            else:
+                builder.event(event, value)
+            continue
+
+        if prefix == PLACE_PREFIX and event == "start_map":
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif prefix == "countries.item":
+            if event == "start_map":
+                country = {"cities": []}
+            elif event == "end_map":
+                countries.append(country)
+        elif prefix == "countries.item.cities.item":
+            if event == "start_map":
+                city = {"places": []}
+            elif event == "end_map" and (city_id is None or city.get("uid") == city_id):
+                country["cities"].append(city)
+        elif event in ("number", "string", "boolean", "null"):
+            key = prefix.rpartition(".")[2]
+            if prefix == "countries.item." + key and key in COUNTRY_FIELDS:
+                country[key] = value
+            elif prefix == "countries.item.cities.item." + key and key in CITY_FIELDS:
+                city[key] = value
+    return {"countries": countries}
+
+
+def decode_feed(raw, city_id=None, partial=False, decoder=None):
+    """
+    Feed-Antwort (bytes) dekodieren. partial=True: nur die benötigten Felder,
+    gestreamt wenn ijson installiert ist.
+    """
+    if partial and ijson is not None:
+        return stream_feed(raw, city_id)
+    data = loads(raw, decoder)
+    return slim_feed(data, city_id) if partial else data
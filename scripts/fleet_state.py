@@ -0,0 +1,182 @@
+import sys
+
+
+def intern_text(value):
+    # Wiederkehrende Strings (Stationsnamen, Typen, Bike-Nummern) nur einmal im Speicher halten
+    return sys.intern(value) if type(value) is str else value
+
+
+class PlaceRecord:
+    """
+    Stand eines Platzes beim letzten geänderten Snapshot.
+    Wird von allen Fahrrädern an diesem Platz gemeinsam referenziert, statt Position,
+    Stationsname und Terminal-Typ pro Fahrrad zu kopieren.
+    """
+
+    __slots__ = ("uid", "lat", "lng", "spot", "name", "terminal_type", "booked_bikes", "in_flexzone", "time")
+
+    def __init__(self, place, in_flexzone, time):
+        self.uid = place.get('uid')
+        self.lat = place.get('lat')
+        self.lng = place.get('lng')
+        self.spot = place.get('spot', False)
+        self.name = intern_text(place.get('name', '')) if self.spot else None
+        self.terminal_type = intern_text(place.get('terminal_type', ''))
+        self.booked_bikes = place.get('booked_bikes', 0)
+        self.in_flexzone = in_flexzone
+        self.time = time
+
+
+class BikeRecord:
+    # present=False: Fahrrad ist aktuell an keinem Platz, place ist die letzte bekannte Position
+    __slots__ = ("place", "active", "state", "present")
+
+    def __init__(self, place, active, state):
+        self.place = place
+        self.active = active
+        self.state = state
+        self.present = True
+
+    def to_dict(self):
+        # Gleiche Form wie die früheren Einträge in all_bikes_status
+        place = self.place
+        return {
+            'lat': place.lat,
+            'lng': place.lng,
+            'active': self.active,
+            'state': self.state,
+            'spot': place.spot,
+            'spot_name': place.name,
+            'terminal_type': place.terminal_type,
+            'is_booked': not self.active,
+            'booked_bikes': place.booked_bikes,
+            'place_uid': place.uid
+        }
+
+
+class FleetState:
+    """
+    Aktueller Ort und letzte bekannte Position aller Fahrräder in einem Dict
+    Bike-Nummer -> BikeRecord mit gemeinsamem PlaceRecord pro Platz.
+    Verschwindet ein Fahrrad aus dem Feed, bleibt sein Datensatz als letzte Position erhalten.
+    """
+
+    def __init__(self):
+        self.bikes = {}
+        self.present_count = 0
+
+    def update_place(self, place, in_flexzone, time):
+        # Alle Fahrräder eines (geänderten) Platzes mit einem einzigen PlaceRecord erfassen
+        bike_list = place.get('bike_list', [])
+        if not bike_list:
+            return
+        record = PlaceRecord(place, in_flexzone, time)
+        for bike in bike_list:
+            bike_number = bike.get('number')
+            if bike_number:
+                bike_number = intern_text(bike_number)
+                previous = self.bikes.get(bike_number)
+                if previous is None or not previous.present:
+                    self.present_count += 1
+                self.bikes[bike_number] = BikeRecord(record, bike.get('active', True), intern_text(bike.get('state', 'ok')))
+
+    def remove_place(self, place):
+        # Fahrräder eines Platzes aus dem aktuellen Stand nehmen, letzte Position bleibt erhalten
+        for bike in place.get('bike_list', []):
+            record = self.bikes.get(bike.get('number'))
+            if record is not None and record.present:
+                record.present = False
+                self.present_count -= 1
+
+    def evict(self, evictor, now, keep=()):
+        # Nur Fahrräder, die aktuell an keinem Platz sind (und nicht in keep) kommen in Frage
+        return evictor.sweep(self.bikes, lambda number, record: record.present or number in keep, now)
+
+    def status(self, bike_number):
+        record = self.bikes.get(bike_number)
+        return record.to_dict() if record is not None and record.present else None
+
+    def last_location(self, bike_number):
+        # Gleiche Form wie die früheren Einträge in bike_last_locations
+        record = self.bikes.get(bike_number)
+        if record is None:
+            return None
+        place = record.place
+        return {
+            'time': place.time,
+            'lat': place.lat,
+            'lng': place.lng,
+            'spot': place.spot,
+            'spot_name': place.name,
+            'terminal_type': place.terminal_type,
+            'in_flexzone': place.in_flexzone
+        }
+
+    def __len__(self):
+        return self.present_count
+
+    def __contains__(self, bike_number):
+        record = self.bikes.get(bike_number)
+        return record is not None and record.present
+
+
+class FreeBikeStatus:
+    # Eintrag in bike_status (freistehendes Fahrrad)
+    __slots__ = ("visible", "last_seen", "lat", "lng", "in_flexzone")
+
+    def __init__(self, last_seen, lat, lng, in_flexzone, visible=True):
+        self.visible = visible
+        self.last_seen = last_seen
+        self.lat = lat
+        self.lng = lng
+        self.in_flexzone = in_flexzone
+
+    def to_dict(self):
+        return {
+            "visible": self.visible,
+            "last_seen": self.last_seen,
+            "last_position": {"lat": self.lat, "lng": self.lng},
+            "in_flexzone": self.in_flexzone
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        position = data.get("last_position", {})
+        return cls(data.get("last_seen"), position.get("lat"), position.get("lng"),
+                   data.get("in_flexzone"), data.get("visible", True))
+
+
+class FreeBikeBooking:
+    # Eintrag in freebike_booked (letzter booked_bikes-Stand eines freistehenden Platzes)
+    __slots__ = ("booked_bikes", "bike_number", "last_seen_time", "lat", "lng")
+
+    def __init__(self, booked_bikes, bike_number, last_seen_time, lat, lng):
+        self.booked_bikes = booked_bikes
+        self.bike_number = bike_number
+        self.last_seen_time = last_seen_time
+        self.lat = lat
+        self.lng = lng
+
+    def to_dict(self):
+        return {
+            "booked_bikes": self.booked_bikes,
+            "bike_number": self.bike_number,
+            "last_seen_time": self.last_seen_time,
+            "last_position": {"lat": self.lat, "lng": self.lng}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        position = data.get("last_position", {})
+        return cls(data.get("booked_bikes"), data.get("bike_number"), data.get("last_seen_time"),
+                   position.get("lat"), position.get("lng"))
+
+
+def records_from(values, record_class):
+    # Checkpoints älterer Versionen enthalten noch Dicts statt Datensätzen
+    return {key: record_class.from_dict(value) if isinstance(value, dict) else value for key, value in values.items()}
+
+
+def records_to_dicts(values):
+    # Für den JSON-Dump (bike_movements.json) in die bisherige Dict-Form bringen
+    return {key: value.to_dict() for key, value in values.items()}
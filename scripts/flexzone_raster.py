@@ -0,0 +1,313 @@
+"""
+Flexzonen als vorberechnetes Raster: jede Zelle ist "außerhalb", "innerhalb" oder "Rand".
+Klassifikation eines Punkts ist ein Array-Zugriff; nur Punkte in Randzellen werden exakt
+gegen die Polygone geprüft (Ray-Casting, ohne shapely).
+
+Das Raster wird mit dem Hash der GeoJSON-Datei als Version auf der Platte abgelegt und beim
+nächsten Start ohne Neuberechnung geladen; die GeoJSON selbst wird ebenfalls zwischengespeichert,
+der Start braucht also kein Netzwerk.
+
+Auch für Auswertungen (z.B. die Notebooks OperatingZones, Trip_analysis_2):
+    from flexzone_raster import load_raster
+    df["in_flexzone"] = load_raster().classify(zip(df["lng"], df["lat"]))
+
+Aufruf (aus dem Projekt-Root):
+    python3 scripts/flexzone_raster.py [--geojson flexzone_bn.json] [--cell 25] [--verify 20000]
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import pickle
+import random
+import time
+import zlib
+
+from atomic_file import atomic_write
+
+FLEXZONE_URL = "https://api.nextbike.net/reservation/geojson/flexzone_bn.json"
+CACHE_DIR = "results_trips/flexzone_cache"
+CELL_SIZE = 25           # Kantenlänge einer Zelle in Metern
+GEOJSON_MAX_AGE = 86400  # Zwischengespeicherte GeoJSON höchstens so lange ohne Abruf verwenden (Sekunden)
+FORMAT_VERSION = 1
+
+OUTSIDE, INSIDE, BOUNDARY = 0, 1, 2
+METERS_PER_DEGREE = 111320.0
+
+
+def geojson_version(data):
+    # Inhalts-Hash unabhängig von Formatierung und Schlüsselreihenfolge
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(canonical).hexdigest()[:16]
+
+
+def polygons_from_geojson(data):
+    # Liste von Polygonen, jedes als Liste von Ringen [(lng, lat), ...]; erster Ring = Außenring.
+    # MultiPolygon-Features werden in ihre Teilpolygone zerlegt. Grundlage für beide Wege
+    # (Raster und exakter FlexzoneIndex), damit sie dieselben Flächen klassifizieren.
+    polygons = []
+    for feature in data.get("features", []):
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "Polygon":
+            parts = [geometry["coordinates"]]
+        elif geometry.get("type") == "MultiPolygon":
+            parts = geometry["coordinates"]
+        else:
+            continue
+        for rings in parts:
+            polygons.append([[(c[0], c[1]) for c in ring] for ring in rings])
+    return polygons
+
+
+def load_geojson(url=FLEXZONE_URL, cache_dir=CACHE_DIR, max_age=GEOJSON_MAX_AGE):
+    """
+    Flexzonen-GeoJSON: aus dem lokalen Zwischenspeicher, solange jünger als max_age,
+    sonst neu abrufen. Zwischengespeichert wird nur eine gültige FeatureCollection; bei
+    Netzwerk-, HTTP- oder Formatfehlern bleibt die bisherige (veraltete) Fassung in Gebrauch.
+    """
+    path = os.path.join(cache_dir, "flexzones.geojson")
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < max_age:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    try:
+        import requests
+        response = requests.get(url, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        if not isinstance(data, dict) or not isinstance(data.get("features"), list):
+            raise ValueError("Antwort enthält keine GeoJSON-Features")
+    except Exception as e:
+        if not os.path.exists(path):
+            raise
+        print(f"⚠️ Flexzonen konnten nicht abgerufen werden ({e}), nutze zwischengespeicherte Fassung")
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    os.makedirs(cache_dir, exist_ok=True)
+    with atomic_write(path, encoding="utf-8") as f:
+        json.dump(data, f)
+    return data
+
+
+def point_in_polygon(lng, lat, rings):
+    # Even-odd-Regel über alle Ringe (Löcher heben sich auf)
+    inside = False
+    for ring in rings:
+        j = len(ring) - 1
+        for i in range(len(ring)):
+            xi, yi = ring[i]
+            xj, yj = ring[j]
+            if (yi > lat) != (yj > lat) and lng < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+                inside = not inside
+            j = i
+    return inside
+
+
+class FlexzoneRaster:
+    """
+    Zellraster über die Bounding-Box aller Flexzonen mit 2 Bit pro Zelle.
+    Gleiche Schnittstelle wie FlexzoneIndex (contains, classify).
+    """
+
+    def __init__(self, polygons, cell_size=CELL_SIZE, version=None):
+        self.polygons = polygons
+        self.cell_size = cell_size
+        self.version = version
+        self.boundary_checks = 0
+        self.lookups = 0
+        points = [point for rings in polygons for point in rings[0]]
+        if not points:
+            self.rows = self.cols = 0
+            self.bits = bytearray()
+            self.counts = [0, 0, 0]
+            return
+        self.min_lng = min(p[0] for p in points)
+        self.min_lat = min(p[1] for p in points)
+        max_lng = max(p[0] for p in points)
+        max_lat = max(p[1] for p in points)
+        mid_lat = (self.min_lat + max_lat) / 2
+        self.cell_lat = cell_size / METERS_PER_DEGREE
+        self.cell_lng = cell_size / (METERS_PER_DEGREE * math.cos(math.radians(mid_lat)))
+        self.rows = int((max_lat - self.min_lat) / self.cell_lat) + 1
+        self.cols = int((max_lng - self.min_lng) / self.cell_lng) + 1
+        # Bounding-Box je Polygon für die exakte Prüfung in Randzellen
+        self.bounds = [
+            (min(p[0] for p in rings[0]), min(p[1] for p in rings[0]),
+             max(p[0] for p in rings[0]), max(p[1] for p in rings[0]))
+            for rings in polygons
+        ]
+        self.bits = bytearray((self.rows * self.cols + 3) // 4)
+        self._build()
+        self.counts = [0, 0, 0]
+        for index in range(self.rows * self.cols):
+            self.counts[self._get(index)] += 1
+
+    # --- Aufbau ---
+
+    def _set(self, index, state):
+        shift = (index & 3) * 2
+        self.bits[index >> 2] = (self.bits[index >> 2] & ~(3 << shift)) | (state << shift)
+
+    def _get(self, index):
+        return (self.bits[index >> 2] >> ((index & 3) * 2)) & 3
+
+    def _build(self):
+        # 1. Innen/außen je Zeile per Scanline durch die Zellmitten (even-odd je Polygon, dann ODER)
+        edges_by_row = [[] for _ in range(self.rows)]
+        for polygon_id, rings in enumerate(self.polygons):
+            for ring in rings:
+                for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+                    if y1 == y2:
+                        continue
+                    low, high = min(y1, y2), max(y1, y2)
+                    first = max(0, math.ceil((low - self.min_lat) / self.cell_lat - 0.5))
+                    last = min(self.rows - 1, math.floor((high - self.min_lat) / self.cell_lat - 0.5))
+                    for row in range(first, last + 1):
+                        edges_by_row[row].append((polygon_id, x1, y1, x2, y2))
+
+        for row, edges in enumerate(edges_by_row):
+            lat = self.min_lat + (row + 0.5) * self.cell_lat
+            crossings = {}
+            for polygon_id, x1, y1, x2, y2 in edges:
+                if (y1 > lat) != (y2 > lat):
+                    crossings.setdefault(polygon_id, []).append(x1 + (lat - y1) * (x2 - x1) / (y2 - y1))
+            for xs in crossings.values():
+                xs.sort()
+                for start, end in zip(xs[0::2], xs[1::2]):
+                    first = max(0, math.ceil((start - self.min_lng) / self.cell_lng - 0.5))
+                    last = min(self.cols - 1, math.floor((end - self.min_lng) / self.cell_lng - 0.5))
+                    for col in range(first, last + 1):
+                        self._set(row * self.cols + col, INSIDE)
+
+        # 2. Randzellen: alle Zellen, die eine Kante berühren könnten (Abtastung entlang der Kante
+        #    in halber Zellgröße plus Nachbarzellen, damit auch angeschnittene Ecken erfasst werden)
+        step = min(self.cell_lat, self.cell_lng) / 2
+        for rings in self.polygons:
+            for ring in rings:
+                for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+                    samples = max(1, int(math.hypot(x2 - x1, y2 - y1) / step) + 1)
+                    for k in range(samples + 1):
+                        t = k / samples
+                        row = int((y1 + t * (y2 - y1) - self.min_lat) / self.cell_lat)
+                        col = int((x1 + t * (x2 - x1) - self.min_lng) / self.cell_lng)
+                        for r in range(max(0, row - 1), min(self.rows, row + 2)):
+                            for c in range(max(0, col - 1), min(self.cols, col + 2)):
+                                self._set(r * self.cols + c, BOUNDARY)
+
+    # --- Abfrage ---
+
+    def cell_state(self, lng, lat):
+        if not self.rows:
+            return OUTSIDE
+        row = int((lat - self.min_lat) // self.cell_lat)
+        col = int((lng - self.min_lng) // self.cell_lng)
+        if row < 0 or col < 0 or row >= self.rows or col >= self.cols:
+            return OUTSIDE
+        return self._get(row * self.cols + col)
+
+    def exact(self, lng, lat):
+        self.boundary_checks += 1
+        for rings, (x1, y1, x2, y2) in zip(self.polygons, self.bounds):
+            if x1 <= lng <= x2 and y1 <= lat <= y2 and point_in_polygon(lng, lat, rings):
+                return True
+        return False
+
+    def contains(self, lng, lat):
+        if lng is None or lat is None:
+            return False
+        self.lookups += 1
+        state = self.cell_state(lng, lat)
+        if state == BOUNDARY:
+            return self.exact(lng, lat)
+        return state == INSIDE
+
+    def classify(self, coords):
+        # Liste von (lng, lat) -> Liste von bool
+        return [self.contains(lng, lat) for lng, lat in coords]
+
+    def stats(self):
+        return {"rows": self.rows, "cols": self.cols, "bytes": len(self.bits),
+                "outside": self.counts[OUTSIDE], "inside": self.counts[INSIDE], "boundary": self.counts[BOUNDARY]}
+
+    # --- Zwischenspeicher ---
+
+    def save(self, path):
+        state = {key: value for key, value in self.__dict__.items() if key != "bits"}
+        state["bits"] = zlib.compress(bytes(self.bits))
+        state["format"] = FORMAT_VERSION
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with atomic_write(path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if state.pop("format", None) != FORMAT_VERSION:
+            raise ValueError(f"{path} hat ein veraltetes Format")
+        raster = cls.__new__(cls)
+        raster.__dict__.update(state)
+        raster.bits = bytearray(zlib.decompress(state["bits"]))
+        raster.boundary_checks = raster.lookups = 0
+        return raster
+
+
+def raster_path(version, cell_size, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"raster-{version}-{cell_size}m.pkl")
+
+
+def load_raster(geojson=None, cell_size=CELL_SIZE, cache_dir=CACHE_DIR):
+    """
+    Raster zur aktuellen Flexzonen-GeoJSON: aus dem Zwischenspeicher, falls für diese
+    Version und Zellgröße vorhanden, sonst neu berechnen und ablegen.
+    geojson: bereits geladene GeoJSON (Dict); None = load_geojson()
+    """
+    data = geojson if geojson is not None else load_geojson(cache_dir=cache_dir)
+    version = geojson_version(data)
+    path = raster_path(version, cell_size, cache_dir)
+    if os.path.exists(path):
+        try:
+            return FlexzoneRaster.load(path)
+        except Exception as e:
+            print(f"⚠️ Flexzonen-Raster {path} unbrauchbar ({e}), wird neu berechnet")
+    raster = FlexzoneRaster(polygons_from_geojson(data), cell_size, version)
+    raster.save(path)
+    return raster
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--geojson", help="Lokale GeoJSON-Datei statt Abruf/Zwischenspeicher")
+    parser.add_argument("--cell", type=int, default=CELL_SIZE, help="Zellgröße in Metern")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--verify", type=int, default=0, help="Anzahl Zufallspunkte für den Vergleich mit der exakten Prüfung")
+    args = parser.parse_args()
+
+    if args.geojson:
+        with open(args.geojson, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    else:
+        data = load_geojson(cache_dir=args.cache_dir)
+
+    start = time.perf_counter()
+    raster = load_raster(data, args.cell, args.cache_dir)
+    stats = raster.stats()
+    print(f"Raster {raster.version} ({args.cell} m): {stats['rows']} x {stats['cols']} Zellen, "
+          f"{stats['bytes'] / 1024:.0f} KB, {stats['inside']} innen / {stats['boundary']} Rand / "
+          f"{stats['outside']} außen, geladen in {time.perf_counter() - start:.2f} s")
+
+    if args.verify:
+        # Zufallspunkte in der Bounding-Box: Raster gegen exakte Prüfung
+        points = [(raster.min_lng + random.random() * raster.cols * raster.cell_lng,
+                   raster.min_lat + random.random() * raster.rows * raster.cell_lat) for _ in range(args.verify)]
+        start = time.perf_counter()
+        result = raster.classify(points)
+        elapsed = time.perf_counter() - start
+        expected = [any(point_in_polygon(lng, lat, rings) for rings in raster.polygons) for lng, lat in points]
+        mismatches = sum(1 for a, b in zip(result, expected) if a != b)
+        print(f"{args.verify} Punkte in {elapsed * 1000:.1f} ms ({raster.boundary_checks} exakt geprüft), "
+              f"Abweichungen: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
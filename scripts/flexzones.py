@@ -0,0 +1,51 @@
+import shapely
+from shapely.geometry import Point
+from shapely.prepared import prep
+from shapely.strtree import STRtree
+
+from coordinate_cache import CACHE_PRECISION, CACHE_SIZE, CoordinateCache
+
+
+class FlexzoneIndex:
+    """
+    Räumlicher Index über die Flexzonen-Polygone mit LRU-Cache auf gerundeten Koordinaten.
+    Die meisten geparkten Fahrräder bewegen sich zwischen zwei Abfragen nicht,
+    daher wird ein Punkt nur beim ersten Auftreten wirklich geprüft.
+    """
+
+    def __init__(self, polygons, precision=CACHE_PRECISION, cache_size=CACHE_SIZE):
+        self.polygons = list(polygons)
+        self.tree = STRtree(self.polygons)
+        self.prepared = [prep(poly) for poly in self.polygons]
+        self.cache = CoordinateCache(precision, cache_size, default=False)
+
+    def _contains_many(self, coords):
+        # Exakte Prüfung für mehrere Punkte in einem Aufruf
+        if not coords:
+            return []
+        if hasattr(shapely, "points"):
+            # Shapely 2: vektorisierte STRtree-Abfrage über alle Punkte
+            xs = [c[0] for c in coords]
+            ys = [c[1] for c in coords]
+            point_idx, _ = self.tree.query(shapely.points(xs, ys), predicate="within")
+            inside = [False] * len(coords)
+            for i in point_idx:
+                inside[int(i)] = True
+            return inside
+        # Shapely 1.x: Kandidaten aus dem STRtree, Prüfung mit vorbereiteten Geometrien
+        lookup = {id(poly): prepared for poly, prepared in zip(self.polygons, self.prepared)}
+        inside = []
+        for lng, lat in coords:
+            point = Point(lng, lat)
+            inside.append(any(lookup[id(poly)].contains(point) for poly in self.tree.query(point)))
+        return inside
+
+    def contains(self, lng, lat):
+        return self.classify([(lng, lat)])[0]
+
+    def classify(self, coords):
+        """
+        Klassifiziert eine Liste von (lng, lat)-Paaren in einem Aufruf.
+        Rückgabe: Liste von bool in derselben Reihenfolge.
+        """
+        return self.cache.resolve(coords, self._contains_many)
@@ -0,0 +1,63 @@
+import json
+import os
+import time
+
+from atomic_file import atomic_write
+
+# Heartbeat-Dateien im Projekt-Root, unabhängig vom Arbeitsverzeichnis des Prozesses
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+HEARTBEAT_DIR = os.path.join(BASE_DIR, "heartbeats")
+
+
+def heartbeat_path(name):
+    return os.path.join(HEARTBEAT_DIR, f"{name}.json")
+
+
+def write_heartbeat(name, timeout, **fields):
+    """
+    Meldet, dass der Prozess noch arbeitet. timeout: wie lange der Supervisor ohne
+    neuen Heartbeat warten soll, bevor er den Prozess als hängend neu startet.
+    Zusätzliche Felder (z.B. Abfragedauer, Aktivität der Konsumenten) landen mit in der Datei.
+    """
+    record = {"time": time.time(), "pid": os.getpid(), "timeout": timeout}
+    record.update(fields)
+    path = heartbeat_path(name)
+    try:
+        os.makedirs(HEARTBEAT_DIR, exist_ok=True)
+        with atomic_write(path) as f:
+            json.dump(record, f)
+    except Exception as e:
+        print(f"⚠️ Heartbeat {name} konnte nicht geschrieben werden: {e}")
+
+
+def read_heartbeat(name):
+    try:
+        with open(heartbeat_path(name), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def stale_reason(name, pid=None, now=None):
+    """
+    Prüft den Heartbeat eines Prozesses. Rückgabe: None wenn in Ordnung (oder noch keiner
+    geschrieben wurde), sonst eine kurze Begründung.
+    pid: nur Heartbeats dieses Prozesses werten (alte Dateien früherer Läufe ignorieren).
+    """
+    record = read_heartbeat(name)
+    if record is None or (pid is not None and record.get("pid") != pid):
+        return None
+    now = now if now is not None else time.time()
+    age = now - record["time"]
+    if age > record["timeout"]:
+        return f"kein Heartbeat seit {age:.0f} s"
+    # Konsumenten, die seit consumer_timeout keinen Snapshot mehr abgeholt haben, hängen
+    # (außer sie warten nach einem Absturz im Backoff auf ihren Neustart)
+    consumer_timeout = record.get("consumer_timeout")
+    if consumer_timeout:
+        backing_off = set(record.get("consumers_backing_off", []))
+        stalled = [consumer for consumer, idle in record.get("consumers_idle", {}).items()
+                   if idle > consumer_timeout and consumer not in backing_off]
+        if stalled:
+            return f"Konsumenten hängen: {', '.join(stalled)}"
+    return None
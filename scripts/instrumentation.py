@@ -0,0 +1,233 @@
+"""
+Laufzeitmessung der Abfragezyklen: benannte Timer mit Histogrammen pro Stufe
+(z.B. feed.fetch, feed.parse, trips.detect, trips.persist) und Takt-Verzug (poll_lag).
+
+Ausgeschaltet (ENABLED = False) kostet eine Messstelle nur einen Funktionsaufruf mit
+sofortiger Rückkehr. Eingeschaltet schreibt ein Hintergrund-Thread alle EXPORT_INTERVAL
+Sekunden die Perzentile nach EXPORT_FILE (JSON) und PROMETHEUS_FILE (Prometheus-Textformat,
+z.B. für den Textfile-Collector des node_exporter); mit PROMETHEUS_PORT zusätzlich über HTTP.
+
+Nutzung:
+    started = instrumentation.start()
+    ...
+    instrumentation.stop("trips.detect", started)
+
+    with instrumentation.timed("feed.parse"):
+        ...
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from atomic_file import atomic_write
+
+# Konfiguration
+ENABLED = os.environ.get("NEXTBIKE_INSTRUMENTATION") == "1"
+EXPORT_INTERVAL = 60                 # Sekunden zwischen zwei Exporten
+EXPORT_FILE = "instrumentation.json"  # Relativ zum Arbeitsverzeichnis (bei multi_city: pro Stadt)
+PROMETHEUS_FILE = "instrumentation.prom"
+PROMETHEUS_PORT = None               # z.B. 9108 für http://localhost:9108/metrics
+
+PRECISION_BITS = 6   # 2^5 Unterteilungen pro Zweierpotenz: höchstens ~3 % relativer Fehler
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    """
+    HDR-artiges Histogramm über Mikrosekunden: exakte Buckets bis 64 µs, darüber
+    logarithmisch mit fester relativer Genauigkeit. Speicher wächst nur mit der
+    Spannweite der Werte, nicht mit ihrer Anzahl.
+    """
+
+    def __init__(self):
+        self.counts = {}  # (shift, mantissa) -> Anzahl; Bucket = [mantissa << shift, (mantissa + 1) << shift)
+        self.count = 0
+        self.total = 0.0  # Sekunden
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        micros = max(0, int(seconds * 1_000_000))
+        shift = max(0, micros.bit_length() - PRECISION_BITS)
+        key = (shift, micros >> shift)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        # Bucketmitte des q-Quantils, begrenzt auf das beobachtete Minimum/Maximum (Sekunden)
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for shift, mantissa in sorted(self.counts):
+            seen += self.counts[(shift, mantissa)]
+            if seen > rank:
+                value = ((mantissa << shift) + ((1 << shift) - 1) / 2) / 1_000_000
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum_s": round(self.total, 6),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else None,
+            **{f"p{int(q * 100)}_ms": _ms(self.quantile(q)) for q in QUANTILES},
+            "max_ms": _ms(self.max),
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+_histograms = {}
+_lock = threading.Lock()
+_exporter = None
+
+
+class _NullTimer:
+    # Ausgeschaltet: gemeinsames Objekt ohne Messung
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def observe(name, seconds):
+    # Einen gemessenen Wert (Sekunden) eintragen; thread-sicher
+    if not ENABLED:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.record(seconds)
+
+
+def start():
+    # Startzeitpunkt für stop(); None, wenn ausgeschaltet
+    return time.perf_counter() if ENABLED else None
+
+
+def stop(name, started):
+    if started is not None:
+        observe(name, time.perf_counter() - started)
+
+
+def timed(name):
+    return _Timer(name) if ENABLED else _NULL_TIMER
+
+
+def summaries():
+    with _lock:
+        return {name: histogram.summary() for name, histogram in sorted(_histograms.items())}
+
+
+def prometheus_text():
+    # Summary-Metrik im Prometheus-Textformat, eine Stufe pro Label
+    with _lock:
+        items = sorted(_histograms.items())
+        lines = [
+            "# HELP nextbike_stage_seconds Dauer der Stufen eines Abfragezyklus",
+            "# TYPE nextbike_stage_seconds summary",
+        ]
+        for name, histogram in items:
+            for q in QUANTILES:
+                value = histogram.quantile(q)
+                if value is not None:
+                    lines.append(f'nextbike_stage_seconds{{stage="{name}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'nextbike_stage_seconds_sum{{stage="{name}"}} {histogram.total:.6f}')
+            lines.append(f'nextbike_stage_seconds_count{{stage="{name}"}} {histogram.count}')
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with atomic_write(path) as f:
+        f.write(text)
+
+
+def export():
+    # Aktuelle Perzentile (kumuliert seit Prozessstart) in die Exportdateien schreiben
+    try:
+        if EXPORT_FILE:
+            _write_atomic(EXPORT_FILE, json.dumps({
+                "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "pid": os.getpid(),
+                "stages": summaries()
+            }, indent=2))
+        if PROMETHEUS_FILE:
+            _write_atomic(PROMETHEUS_FILE, prometheus_text())
+    except Exception as e:
+        print(f"⚠️ Instrumentierung konnte nicht exportiert werden: {e}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keine Zeile pro Scrape im Log
+
+
+def _export_loop():
+    while True:
+        time.sleep(EXPORT_INTERVAL)
+        export()
+
+
+def start_exporter():
+    """
+    Startet den periodischen Export (einmal pro Prozess, weitere Aufrufe tun nichts).
+    Ausgeschaltet wird nichts gestartet.
+    """
+    global _exporter
+    if not ENABLED:
+        return
+    with _lock:
+        if _exporter is not None:
+            return
+        _exporter = threading.Thread(target=_export_loop, name="instrumentation-export", daemon=True)
+        _exporter.start()
+    if PROMETHEUS_PORT:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", PROMETHEUS_PORT), _MetricsHandler)
+            threading.Thread(target=server.serve_forever, name="instrumentation-http", daemon=True).start()
+        except OSError as e:
+            print(f"⚠️ Prometheus-Endpunkt auf Port {PROMETHEUS_PORT} nicht verfügbar: {e}")
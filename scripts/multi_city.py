@@ -0,0 +1,191 @@
+"""
+Mehrere Nextbike-Städte gleichzeitig tracken: ein Worker-Prozess pro Stadt.
+
+Aufruf (aus dem Projekt-Root, oder über run_all.py mit CITIES):
+    python3 scripts/multi_city.py 362 210 14 [--output results_cities] [--detectors trips,reservations]
+
+Jeder Worker hat seinen eigenen Snapshot-Bus und schreibt nach <output>/<city_id>/ in dieselben
+Unterordner wie der Einzelbetrieb. Der Supervisor startet abgestürzte Worker mit exponentiellem
+Backoff neu und meldet regelmäßig den Durchsatz (verteilte Snapshots pro Sekunde) über alle Worker.
+"""
+import argparse
+import atexit
+import datetime
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import nextbike_feed
+from heartbeat import stale_reason, write_heartbeat
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+OUTPUT_DIR = os.path.join(BASE_DIR, "results_cities")
+METRICS_INTERVAL = 60  # Sekunden zwischen zwei Durchsatz-Meldungen
+# Neustart abgestürzter Worker: dieselben Wartezeiten wie nextbike_feed.run_forever
+RESTART_DELAY = nextbike_feed.RESTART_DELAY
+RESTART_DELAY_MAX = nextbike_feed.RESTART_DELAY_MAX
+STABLE_AFTER = nextbike_feed.STABLE_AFTER
+
+
+def log(msg):
+    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}")
+
+
+class CountingBus(nextbike_feed.SnapshotBus):
+    # Zählt jeden verteilten Snapshot einmal (unabhängig von der Zahl der Detektoren) in einem prozessübergreifenden Zähler
+    def __init__(self, counter, **kwargs):
+        super().__init__(**kwargs)
+        self.counter = counter
+
+    def publish(self, snapshot):
+        super().publish(snapshot)
+        with self.counter.get_lock():
+            self.counter.value += 1
+
+
+def run_city(city_id, counter, output_dir, detectors):
+    """
+    Worker-Prozess für eine Stadt. Die Detektoren halten ihren Zustand in Modul-Globalen
+    und schreiben relativ zum Arbeitsverzeichnis, daher genau eine Stadt pro Prozess.
+    """
+    nextbike_feed.exit_on_sigterm()
+    directory = os.path.join(output_dir, str(city_id))
+    os.makedirs(directory, exist_ok=True)
+    os.chdir(directory)
+    nextbike_feed.CITY_ID = city_id
+
+    # Detektoren erst im Stadt-Verzeichnis importieren (legen ihre Ordner beim Import an)
+    consumers = []
+    if "trips" in detectors:
+        import nextbike_trip_analysis
+        nextbike_trip_analysis.city_id = city_id
+        consumers.append(("nextbike_trip_analysis", nextbike_trip_analysis.track_bike_movements))
+    if "reservations" in detectors:
+        import station_reservation
+        consumers.append(("station_reservation", station_reservation.main))
+    if nextbike_feed.RECORD_SNAPSHOTS:
+        import snapshot_recorder
+        consumers.append(("snapshot_recorder", snapshot_recorder.record))
+
+    bus = CountingBus(counter, city_id=city_id, heartbeat=f"city-{city_id}")
+    for name, target in consumers:
+        thread = threading.Thread(target=nextbike_feed.run_forever, args=(name, target, bus.subscribe(name)),
+                                  name=f"{name}-{city_id}", daemon=True)
+        thread.start()
+    try:
+        bus.run()
+    except (KeyboardInterrupt, SystemExit):
+        pass  # Beenden übernimmt der Supervisor
+    finally:
+        # multiprocessing beendet Worker mit os._exit, ohne atexit: Flushes hier selbst ausführen
+        atexit._run_exitfuncs()
+
+
+class CitySupervisor:
+    def __init__(self, cities, output_dir=OUTPUT_DIR, detectors=("trips", "reservations")):
+        self.cities = list(cities)
+        self.output_dir = output_dir
+        self.detectors = tuple(detectors)
+        self.counters = {city: multiprocessing.Value("Q", 0) for city in self.cities}
+        self.workers = {}
+        self.started = {}     # Stadt -> Startzeitpunkt des laufenden Workers (monotonic)
+        self.failures = {city: 0 for city in self.cities}  # Abstürze in Folge, bestimmen das Backoff
+        self.next_start = {}  # Stadt -> geplanter Neustart (monotonic)
+
+    def start_worker(self, city):
+        process = multiprocessing.Process(target=run_city, name=f"city-{city}",
+                                          args=(city, self.counters[city], self.output_dir, self.detectors))
+        process.start()
+        self.workers[city] = process
+        self.started[city] = time.monotonic()
+        log(f"Worker für Stadt {city} gestartet (PID: {process.pid})")
+
+    def schedule_restart(self, city, process):
+        # Exponentielles Backoff wie in run_all.py; nach STABLE_AFTER Sekunden Laufzeit zählt ein Absturz wieder als erster
+        now = time.monotonic()
+        if now - self.started.get(city, now) >= STABLE_AFTER:
+            self.failures[city] = 0
+        delay = min(RESTART_DELAY * 2 ** self.failures[city], RESTART_DELAY_MAX)
+        self.failures[city] += 1
+        del self.workers[city]
+        self.next_start[city] = now + delay
+        log(f"Worker für Stadt {city} beendet (Exit-Code {process.exitcode}). Neustart in {delay} s ...")
+
+    def check_workers(self):
+        for city, process in list(self.workers.items()):
+            if process.is_alive():
+                # Läuft, aber hängt? (Bus oder Detektor ohne Fortschritt)
+                reason = stale_reason(f"city-{city}", process.pid)
+                if reason is None:
+                    continue
+                log(f"Worker für Stadt {city} hängt ({reason}), wird beendet")
+                process.terminate()
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+            self.schedule_restart(city, process)
+
+        # Fällige Neustarts ausführen, ohne die Überwachung der übrigen Worker zu blockieren
+        now = time.monotonic()
+        for city, due in list(self.next_start.items()):
+            if due <= now:
+                del self.next_start[city]
+                self.start_worker(city)
+
+    def snapshot_counts(self):
+        return {city: counter.value for city, counter in self.counters.items()}
+
+    def report(self, previous, elapsed):
+        # Durchsatz seit der letzten Meldung, gesamt und je Stadt
+        current = self.snapshot_counts()
+        total = sum(current[city] - previous[city] for city in self.cities)
+        per_city = ", ".join(f"{city}: {(current[city] - previous[city]) / elapsed:.2f}" for city in self.cities)
+        log(f"Durchsatz: {total / elapsed:.2f} Snapshots/s über {len(self.cities)} Städte ({per_city})")
+        return current
+
+    def run(self, metrics_interval=METRICS_INTERVAL):
+        for city in self.cities:
+            self.start_worker(city)
+
+        previous = self.snapshot_counts()
+        last_report = time.monotonic()
+        try:
+            while True:
+                time.sleep(min(10, metrics_interval))
+                self.check_workers()
+                write_heartbeat("multi_city", timeout=120, cities=self.cities)
+                now = time.monotonic()
+                if now - last_report >= metrics_interval:
+                    previous = self.report(previous, now - last_report)
+                    last_report = now
+        except KeyboardInterrupt:
+            log("Beende alle Worker ...")
+        finally:
+            for process in self.workers.values():
+                if process.is_alive():
+                    process.terminate()
+            for process in self.workers.values():
+                process.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cities", nargs="+", type=int, help="Nextbike city-IDs (z.B. 362 für Berlin)")
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    parser.add_argument("--detectors", default="trips,reservations")
+    parser.add_argument("--metrics-interval", type=int, default=METRICS_INTERVAL)
+    args = parser.parse_args()
+
+    # Beim Beenden durch run_all.py die Worker über den finally-Block geordnet stoppen
+    nextbike_feed.exit_on_sigterm()
+    supervisor = CitySupervisor(args.cities, os.path.abspath(args.output), args.detectors.split(","))
+    supervisor.run(args.metrics_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+import copy
+import queue
+import signal
+import sys
+import threading
+import time
+
+import feed_decoder
+import instrumentation
+from concurrent_fetch import pooled_session
+from heartbeat import write_heartbeat
+from ticker import Ticker
+
+# Konfiguration
+CITY_ID = 362  # Berlin
+
+
+def api_url(city_id):
+    return f"https://api.nextbike.net/maps/nextbike-live.json?city={city_id}"
+
+
+API_URL = api_url(CITY_ID)
+POLL_INTERVAL = 5  # Sekunden
+REQUEST_TIMEOUT = 10  # Sekunden
+RECORD_SNAPSHOTS = False  # Rohdaten für Replays aufzeichnen (snapshot_recorder.py)
+PARTIAL_DECODE = False  # Nur die von den Detektoren genutzten Felder dekodieren (siehe feed_decoder.py)
+CONSUMER_TIMEOUT = 300  # Sekunden ohne abgeholten Snapshot, ab denen ein Konsument als hängend gilt
+
+
+def place_fingerprint(place):
+    # Hash über die Felder, auf die die Detektoren reagieren
+    return hash((
+        place.get('uid'), place.get('name'), place.get('lat'), place.get('lng'),
+        place.get('bikes'), place.get('booked_bikes'),
+        tuple((b.get('number'), b.get('active')) for b in place.get('bike_list', []))
+    ))
+
+
+class Snapshot:
+    """
+    Ein einmal abgerufener und geparster Stand des Nextbike-Feeds.
+    Wird unverändert an alle Abonnenten verteilt und darf daher nicht verändert werden.
+    """
+
+    def __init__(self, data, fetched_at=None, city_id=CITY_ID):
+        self.data = data
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self.city_id = city_id
+        with instrumentation.timed("feed.index"):
+            self.build_indexes()
+
+    def build_indexes(self):
+        # Einmal pro Abruf: Hash-Indizes statt verschachtelter Suche über countries/cities/places
+        self.places = []
+        self.place_index = {}    # place uid -> place
+        self.bike_index = {}     # Bike-Nummer -> (place, bike)
+        self.station_index = {}  # Stationsname -> place (nur Plätze mit bike == False)
+        self.fingerprints = {}   # place uid -> Hash des Platzes (für changed_places)
+        for country in self.data.get('countries', []):
+            for city in country.get('cities', []):
+                if city.get('uid') != self.city_id:
+                    continue
+                for place in city.get('places', []):
+                    self.places.append(place)
+                    self.place_index[place.get('uid')] = place
+                    self.fingerprints[place.get('uid')] = place_fingerprint(place)
+                    if not place.get('bike', False):
+                        self.station_index.setdefault(place.get('name'), place)
+                    for bike in place.get('bike_list', []):
+                        number = bike.get('number')
+                        if number:
+                            self.bike_index.setdefault(number, (place, bike))
+
+    def refreshed(self, fetched_at=None):
+        # Unveränderter Feed (HTTP 304): gleiche Daten und Indizes, neuer Zeitpunkt
+        snapshot = copy.copy(self)
+        snapshot.fetched_at = fetched_at if fetched_at is not None else time.time()
+        return snapshot
+
+    def changed_places(self, previous):
+        """
+        Plätze, die gegenüber dem vorherigen Snapshot des Konsumenten neu sind oder sich geändert haben.
+        Jeder Konsument übergibt seinen eigenen letzten Snapshot, da übersprungene Stände sonst fehlen würden.
+        """
+        if previous is None:
+            return list(self.places)
+        if previous.fingerprints is self.fingerprints:
+            return []
+        old = previous.fingerprints
+        return [place for place in self.places if old.get(place.get('uid')) != self.fingerprints[place.get('uid')]]
+
+    def removed_places(self, previous):
+        # Plätze des vorherigen Snapshots, die im aktuellen fehlen
+        if previous is None or previous.fingerprints is self.fingerprints:
+            return []
+        return [place for uid, place in previous.place_index.items() if uid not in self.place_index]
+
+
+class Subscription:
+    """
+    Abonnement auf den Snapshot-Bus. Hält immer nur den neuesten Snapshot vor,
+    langsame Konsumenten überspringen also ältere Stände statt sich zu stauen.
+    """
+
+    def __init__(self, bus, name=None):
+        self._bus = bus
+        self._queue = queue.Queue(maxsize=1)
+        self.name = name
+        self.last_active = time.time()  # Letzter Aufruf von get (Konsument war bereit)
+        self.waiting = False
+        self.backing_off = False  # Konsument wartet nach einem Absturz auf den Neustart (run_forever)
+
+    def put(self, snapshot):
+        try:
+            self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        self._queue.put_nowait(snapshot)
+
+    def get(self, timeout=None):
+        # Blockiert bis zum nächsten neuen Snapshot
+        self.last_active = time.time()
+        self.waiting = True
+        try:
+            return self._queue.get(timeout=timeout)
+        finally:
+            self.waiting = False
+
+    def idle_seconds(self, now):
+        # Wartet der Konsument auf Daten, hängt er nicht
+        return 0 if self.waiting else now - self.last_active
+
+
+class SnapshotBus:
+    """
+    Ruft den Feed einmal pro Takt ab und verteilt den geparsten Snapshot an alle Abonnenten.
+    """
+
+    def __init__(self, url=None, interval=POLL_INTERVAL, city_id=CITY_ID, heartbeat=None):
+        self.city_id = city_id
+        self.heartbeat = heartbeat  # Name der Heartbeat-Datei (None = keine)
+        self.url = url or api_url(city_id)
+        self.interval = interval
+        self.latest = None
+        self.session = pooled_session(1)  # Keep-Alive über alle Abrufe
+        self.etag = None
+        self.last_modified = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, name=None):
+        subscription = Subscription(self, name)
+        with self._lock:
+            self._subscribers.append(subscription)
+        return subscription
+
+    def fetch(self):
+        # Bedingte Anfrage, falls der Server ETag/Last-Modified liefert (nur mit bereits geparstem Stand)
+        headers = {}
+        if self.latest is not None:
+            if self.etag:
+                headers['If-None-Match'] = self.etag
+            if self.last_modified:
+                headers['If-Modified-Since'] = self.last_modified
+        with instrumentation.timed("feed.fetch"):
+            response = self.session.get(self.url, timeout=REQUEST_TIMEOUT, headers=headers)
+        if response.status_code == 304 and self.latest is not None:
+            return self.latest.refreshed()
+        response.raise_for_status()
+        with instrumentation.timed("feed.parse"):
+            data = feed_decoder.decode_feed(response.content, self.city_id, partial=PARTIAL_DECODE)
+        snapshot = Snapshot(data, city_id=self.city_id)
+        # Validatoren erst übernehmen, wenn diese Fassung wirklich geparst ist
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        return snapshot
+
+    def publish(self, snapshot):
+        self.latest = snapshot
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(snapshot)
+
+    def poll_once(self):
+        snapshot = self.fetch()
+        self.publish(snapshot)
+        return snapshot
+
+    def write_heartbeat(self, poll_seconds, ok):
+        now = time.time()
+        with self._lock:
+            subscribers = [s for s in self._subscribers if s.name]
+        write_heartbeat(
+            self.heartbeat, timeout=max(60, self.interval * 6),
+            interval=self.interval, poll_seconds=round(poll_seconds, 3), poll_ok=ok,
+            consumer_timeout=CONSUMER_TIMEOUT,
+            consumers_idle={s.name: round(s.idle_seconds(now), 1) for s in subscribers},
+            consumers_backing_off=[s.name for s in subscribers if s.backing_off]
+        )
+
+    def run(self):
+        instrumentation.start_exporter()
+        # Fester Takt: Abrufe beginnen alle interval Sekunden, egal wie lange der vorige gedauert hat
+        ticker = Ticker(self.interval, name="feed")
+        while True:
+            ticker.wait()
+            started = time.monotonic()
+            ok = True
+            try:
+                self.poll_once()
+            except Exception as e:
+                ok = False
+                print(f"🌐 Fehler beim Abrufen der Nextbike-Daten: {e}")
+            poll_seconds = time.monotonic() - started
+            instrumentation.observe("feed.poll", poll_seconds)
+            if self.heartbeat:
+                self.write_heartbeat(poll_seconds, ok)
+
+    def start(self):
+        thread = threading.Thread(target=self.run, name="snapshot-bus", daemon=True)
+        thread.start()
+        return thread
+
+
+def local_subscription(interval=POLL_INTERVAL):
+    """
+    Eigener Bus für den Einzelbetrieb eines Skripts (ohne gemeinsamen Fetcher).
+    """
+    bus = SnapshotBus(interval=interval)
+    subscription = bus.subscribe()
+    bus.start()
+    return subscription
+
+
+RESTART_DELAY = 10       # Sekunden vor dem ersten Neustart eines Konsumenten
+RESTART_DELAY_MAX = 600  # Obergrenze bei wiederholten Fehlern
+STABLE_AFTER = 300       # Läuft ein Konsument so lange fehlerfrei, beginnt die Wartezeit wieder bei RESTART_DELAY
+
+
+def run_forever(name, target, *args):
+    # Konsument bei Fehlern neu starten (exponentielles Backoff), ohne die anderen zu beeinflussen.
+    # Während der Wartezeit meldet das Abonnement "backing_off", damit der Supervisor den
+    # Bus-Prozess nicht wegen des untätigen Konsumenten als hängend beendet.
+    subscription = next((arg for arg in args if isinstance(arg, Subscription)), None)
+    delay = RESTART_DELAY
+    while True:
+        started = time.monotonic()
+        try:
+            target(*args)
+        except Exception as e:
+            if time.monotonic() - started >= STABLE_AFTER:
+                delay = RESTART_DELAY
+            print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Fehler in {name}: {e} - Neustart in {delay} Sekunden")
+            if subscription is not None:
+                subscription.backing_off = True
+            try:
+                time.sleep(delay)
+            finally:
+                if subscription is not None:
+                    subscription.backing_off = False
+                    subscription.last_active = time.time()
+            delay = min(delay * 2, RESTART_DELAY_MAX)
+
+
+def exit_on_sigterm():
+    """
+    SIGTERM (terminate() durch run_all.py/multi_city.py) als normales Beenden behandeln.
+    Pythons Standardverhalten beendet den Prozess ohne atexit; so laufen die Flushes von
+    EventSink, ParquetSink und RollingAggregates vor dem kill nach TERMINATE_TIMEOUT.
+    Nur im Haupt-Thread aufrufen.
+    """
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+
+def main():
+    exit_on_sigterm()
+    # Konsumenten erst hier importieren, damit sie den Bus ohne Zirkelimport nutzen können
+    import nextbike_trip_analysis
+    import snapshot_recorder
+    import station_reservation
+    import total_bookedbikesn_weather
+
+    bus = SnapshotBus(heartbeat="nextbike_feed")
+    consumers = [
+        ("station_reservation", station_reservation.main),
+        ("total_bookedbikesn_weather", total_bookedbikesn_weather.collect_data),
+        ("nextbike_trip_analysis", nextbike_trip_analysis.track_bike_movements),
+    ]
+    if RECORD_SNAPSHOTS:
+        consumers.append(("snapshot_recorder", snapshot_recorder.record))
+    threads = []
+    for name, target in consumers:
+        thread = threading.Thread(
+            target=run_forever, args=(name, target, bus.subscribe(name)), name=name, daemon=True
+        )
+        thread.start()
+        threads.append(thread)
+
+    print(f"Snapshot-Bus gestartet mit {len(consumers)} Konsumenten")
+    try:
+        bus.run()
+    except KeyboardInterrupt:
+        print("\nSnapshot-Bus beendet")
+
+
+if __name__ == "__main__":
+    main()
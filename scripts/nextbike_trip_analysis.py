@@ -1,36 +1,57 @@
-import requests
+import atexit
 import time
 import json
-import csv
 import os
 from datetime import datetime, timedelta
-from shapely.geometry import Point, Polygon
-import threading
 import os
 
+import columnar_sink
+import event_sink
+import instrumentation
+import nextbike_feed
+from atomic_file import atomic_write
+from deadline_queue import DeadlineQueue
+from fleet_state import FleetState, FreeBikeBooking, FreeBikeStatus, intern_text, records_from, records_to_dicts
+from flexzone_raster import load_geojson, load_raster, polygons_from_geojson
+from rolling_aggregates import RollingAggregates
+from state_eviction import Evictor
+from tracker_checkpoint import TrackerCheckpoint
+
 # Konfiguration
-city_id = 362  # Berlin
-api_url = f"https://api.nextbike.net/maps/nextbike-live.json?city={city_id}"
+city_id = nextbike_feed.CITY_ID  # Berlin
 flexzone_url = "https://api.nextbike.net/reservation/geojson/flexzone_bn.json"
+flexzone_file = None  # Lokale GeoJSON-Datei statt flexzone_url (z.B. für Replays ohne Netzwerk)
+flexzone_raster = True      # Vorberechnetes Raster statt exakter Polygonprüfung (exakt nur in Randzellen)
+flexzone_cell_size = 25     # Zellgröße des Rasters in Metern
 
 # CSV-Dateiname für abgeschlossene Fahrten
 nextbike_trips_csv = "results_trips/nextbike_trips.csv"
+nextbike_trips_parquet = "results_trips/nextbike_trips_parquet"  # Nach Tag partitioniertes Parquet
+csv_output = True      # Bisherige CSV-Ausgabe
+parquet_output = True  # Zusätzlich Parquet (nur wenn pyarrow installiert ist)
+trips_parquet_sink = None
+trip_aggregates_file = "results_trips/aggregates.json"  # Fahrten je Stunde und Bewegungstyp
+trip_aggregates = None
 
 os.makedirs("results_trips", exist_ok=True)
 
 # Speicher
 station_status = {}         # Für Stationen
-bike_status = {}            # Für freistehende Fahrräder
-all_bikes_status = {}       # Für ALLE Fahrräder (egal wo)
+bike_status = {}            # Für freistehende Fahrräder (Bike-Nummer -> FreeBikeStatus)
+fleet = FleetState()        # Für ALLE Fahrräder (egal wo): aktueller Platz und letzte bekannte Position
 flex_polygons = []          # Flexzonen
+flex_index = None           # FlexzoneRaster bzw. räumlicher Index mit Cache über flex_polygons
 first_run = True            # Flag für ersten Durchlauf
+restored_checkpoint = None  # Geladener Checkpoint (Zustand, Zeitpunkt), bis zum ersten Snapshot
 bikes_in_transit = {}       # Fahrräder, die gerade ausgeliehen sind
 bikes_pending_return = {}   # Fahrräder, die zurückgegeben wurden aber auf finale Position warten
-freebike_booked = {}        # Freistehende Fahrräder mit ihrem vorherigen booked_bikes Status
+return_confirmations = DeadlineQueue()  # Fällige Positionsprüfungen der zurückgegebenen Fahrräder
+freebike_booked = {}        # Freistehende Fahrräder mit ihrem vorherigen booked_bikes Status (uid -> FreeBikeBooking)
 newly_booked_bikes = set()  # Fahrräder, die im aktuellen Durchlauf gebucht wurden
-bike_last_locations = {}    # Letzte bekannte Position jedes Fahrrads
 bike_last_station = {}      # Speichert für jedes Bike die letzte Station (für Station→Flexzone Erkennung)
 bikes_removed_from_stations = set() # Fahrräder, die kürzlich aus Stationen entfernt wurden
+feed_subscription = None    # Abonnement auf den gemeinsamen Snapshot-Bus
+last_snapshot = None        # Zuletzt verarbeiteter Snapshot (Basis für geänderte Plätze)
 
 # Häufiger abfragen für weniger verpasste Fahrten
 polling_interval = 5  # 5 Sekunden
@@ -38,27 +59,57 @@ polling_interval = 5  # 5 Sekunden
 # Wartezeit für finale Positionsbestimmung bei Rückgabe (in Sekunden)
 return_confirmation_delay = 120  # 2 Minuten
 
+# Checkpoints: Binär-Snapshot alle checkpoint_interval Sekunden, dazwischen Deltas pro Abfrage
+checkpoint_interval = 300  # 5 Minuten
+checkpoint_max_age = 900   # Älterer Checkpoint: nur laufende Fahrten wiederherstellen
+checkpoint = TrackerCheckpoint(snapshot_interval=checkpoint_interval)
+restore_checkpoint = True  # Beim Start den letzten Checkpoint laden (Replays starten ohne)
+
+# Speicherbegrenzung: Einträge von Fahrrädern und Plätzen, die seit eviction_ttl nicht mehr
+# im Feed vorkommen, werden entfernt (laufende Fahrten bleiben unberührt)
+eviction_interval = 60          # Sekunden zwischen zwei Durchläufen
+eviction_ttl = 3 * 86400        # 3 Tage
+eviction_max_entries = 100000   # Obergrenze pro Dict (entfernt zuerst die am längsten fehlenden)
+evictors = {
+    name: Evictor(name, eviction_ttl, eviction_max_entries)
+    for name in ("fleet", "stations", "bikes", "freebike_booked", "bike_last_station")
+}
+last_eviction = 0
+
+# Menschenlesbarer Zustand in bike_movements.json (seltener als jede Abfrage)
+json_dump_interval = 60  # Sekunden
+last_json_dump = 0
+
 # Debug-Level: 0=minimal, 1=normal, 2=ausführlich, 3=alle Details
 debug_level = 1
 
-# CSV-Datei initialisieren
+# CSV-Datei initialisieren (prüft nur die erste Zeile auf den Header)
 def init_csv_file():
-    header_line = "Bike-Number,Rental-Time,Rental-Type,Rental-Location,Rental-Lat,Rental-Lng,Return-Time,Return-Type,Return-Location,Return-Lat,Return-Lng,Duration-Minutes,Movement-Type\n"
-    
-    if os.path.exists(nextbike_trips_csv):
-        with open(nextbike_trips_csv, 'r', encoding='utf-8') as file:
-            content = file.readlines()
-        
-        if not content or "Bike-Number" not in content[0]:
-            content.insert(0, header_line)
-            with open(nextbike_trips_csv, 'w', encoding='utf-8') as file:
-                file.writelines(content)
-    else:
-        with open(nextbike_trips_csv, 'w', encoding='utf-8') as file:
-            file.write(header_line)
-            
+    header = ["Bike-Number", "Rental-Time", "Rental-Type", "Rental-Location", "Rental-Lat", "Rental-Lng",
+              "Return-Time", "Return-Type", "Return-Location", "Return-Lat", "Return-Lng",
+              "Duration-Minutes", "Movement-Type"]
+    if event_sink.ensure_csv_header(nextbike_trips_csv, header):
         print(f"CSV-Datei '{nextbike_trips_csv}' mit Header erstellt")
 
+# Parquet-Ausgabe öffnen (Spaltennamen wie im CSV-Header, typisierte Spalten)
+def init_parquet_sink():
+    global trips_parquet_sink
+    if not parquet_output or trips_parquet_sink is not None:
+        return
+    if not columnar_sink.available():
+        debug_log("pyarrow nicht installiert - Parquet-Ausgabe deaktiviert")
+        return
+    pa = columnar_sink.pa
+    category = columnar_sink.category()
+    trips_parquet_sink = columnar_sink.ParquetSink(nextbike_trips_parquet, [
+        ("Bike-Number", pa.string()),
+        ("Rental-Time", pa.timestamp("s")), ("Rental-Type", category), ("Rental-Location", category),
+        ("Rental-Lat", pa.float64()), ("Rental-Lng", pa.float64()),
+        ("Return-Time", pa.timestamp("s")), ("Return-Type", category), ("Return-Location", category),
+        ("Return-Lat", pa.float64()), ("Return-Lng", pa.float64()),
+        ("Duration-Minutes", pa.float32()), ("Movement-Type", category)
+    ], "Rental-Time")
+
 # Debug-Log mit konfigurierbarem Level
 def debug_log(message, level=1):
     if level <= debug_level:
@@ -109,7 +160,7 @@ def get_movement_type(rental_type, return_type, rental_location, return_location
     else:
         return "Unbekannt"
 
-# Kompletten Ausleihvorgang ins CSV schreiben
+# Kompletten Ausleihvorgang ins CSV (und ggf. Parquet) schreiben
 def write_trip_to_csv(bike_number, trip_data):
     # Dauer berechnen
     rental_time = datetime.strptime(trip_data['rental_time'], "%Y-%m-%d %H:%M:%S")
@@ -125,9 +176,9 @@ def write_trip_to_csv(bike_number, trip_data):
         trip_data['return_location']
     )
 
-    with open(nextbike_trips_csv, 'a', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        writer.writerow([
+    if csv_output:
+        # Zeile an den gemeinsamen Schreib-Thread übergeben (einziger Schreiber der Datei)
+        event_sink.shared_sink().write_row(nextbike_trips_csv, [
             bike_number,
             trip_data['rental_time'],
             trip_data['rental_type'],
@@ -143,6 +194,26 @@ def write_trip_to_csv(bike_number, trip_data):
             movement_type
         ])
 
+    if trip_aggregates is not None:
+        trip_aggregates.add_trip(rental_time, movement_type)
+
+    if trips_parquet_sink is not None:
+        trips_parquet_sink.write([
+            str(bike_number),
+            rental_time,
+            trip_data['rental_type'],
+            trip_data['rental_location'],
+            columnar_sink.to_float(trip_data['rental_lat']),
+            columnar_sink.to_float(trip_data['rental_lng']),
+            return_time,
+            trip_data['return_type'],
+            trip_data['return_location'],
+            columnar_sink.to_float(trip_data['return_lat']),
+            columnar_sink.to_float(trip_data['return_lng']),
+            round(duration_minutes, 1),
+            movement_type
+        ])
+
     debug_log(f"[{trip_data['return_time']}] Vollständige Fahrt für {bike_number} ins CSV geschrieben: "
           f"{movement_type}, ausgeliehen um {trip_data['rental_time']} in {trip_data['rental_location']}, "
           f"zurückgegeben um {trip_data['return_time']} bei {trip_data['return_location']}, "
@@ -150,435 +221,560 @@ def write_trip_to_csv(bike_number, trip_data):
 
 # Flexzonen laden
 def load_flexzones():
-    global flex_polygons
+    global flex_polygons, flex_index
     try:
-        response = requests.get(flexzone_url)
-        data = response.json()
-        features = data.get('features', [])
-        
-        for feature in features:
-            if feature['geometry']['type'] == 'Polygon':
-                coords = feature['geometry']['coordinates']
-                exterior = [(c[0], c[1]) for c in coords[0]]
-                interiors = [[(c[0], c[1]) for c in inner] for inner in coords[1:]]
-                flex_polygons.append(Polygon(exterior, interiors))
+        if flexzone_file:
+            with open(flexzone_file, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        else:
+            # Zwischengespeichert, bei Netzwerkfehlern gilt die letzte abgerufene Fassung
+            data = load_geojson(flexzone_url)
+
+        if flexzone_raster:
+            flex_index = load_raster(data, flexzone_cell_size)
+            stats = flex_index.stats()
+            debug_log(f"Flexzonen-Raster {flex_index.version} geladen: {len(flex_index.polygons)} Polygone, "
+                      f"{stats['rows']} x {stats['cols']} Zellen, davon {stats['boundary']} Randzellen")
+            return
+
+        # Exakte Prüfung mit shapely (nur hier benötigt, nicht in requirements.txt)
+        from shapely.geometry import Polygon
+        from flexzones import FlexzoneIndex
         
+        # Dieselben Polygone wie im Raster: Polygon- und MultiPolygon-Features, jedes Teilpolygon einzeln
+        flex_polygons = [Polygon(rings[0], rings[1:]) for rings in polygons_from_geojson(data)]
+        flex_index = FlexzoneIndex(flex_polygons)
         debug_log(f"Flexzonen geladen: {len(flex_polygons)} Polygone")
     except Exception as e:
         debug_log(f"Fehler beim Laden der Flexzonen: {e}")
 
 # Prüfen, ob ein Punkt in der Flexzone liegt
 def is_in_flexzone(lng, lat):
-    point = Point(lng, lat)
-    return any(poly.contains(point) for poly in flex_polygons)
+    if flex_index is None:
+        return False
+    return flex_index.contains(lng, lat)
 
-# API-Daten abrufen
+# Alle Plätze eines Snapshots in einem Aufruf klassifizieren (Liste parallel zu snapshot.places)
+def classify_flexzones(places):
+    if flex_index is None:
+        return [False] * len(places)
+    return flex_index.classify([(place.get('lng'), place.get('lat')) for place in places])
+
+# Snapshot (inkl. Indizes) vom Snapshot-Bus holen
 def fetch_nextbike_data():
-    response = requests.get(api_url)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        debug_log(f"Fehler beim Abrufen der API-Daten: {response.status_code}")
-        return None
+    return feed_subscription.get()
+
+# Zeitstempel eines Snapshots (Abrufzeitpunkt statt aktueller Uhrzeit, damit Replays identisch laufen)
+def snapshot_time(snapshot):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snapshot.fetched_at))
+
+# Änderung an einem getrackten Eintrag für das nächste Checkpoint-Delta vormerken
+def mark_changed(name, key):
+    checkpoint.touch(name, key)
 
-# Verzögerte finale Positionsprüfung und CSV-Eintrag
-def finalize_bike_return(bike_number, trip_data):
+# Rückgabe vormerken: finale Position wird nach return_confirmation_delay im Hauptloop geprüft
+def schedule_bike_return(bike_number, trip_data, now):
+    bikes_pending_return[bike_number] = trip_data
+    mark_changed("pending_return", bike_number)
+    return_confirmations.push(now + return_confirmation_delay, (bike_number, trip_data))
+
+# Alle fälligen Rückgaben gegen den aktuellen Snapshot bestätigen
+def confirm_due_returns(snapshot):
+    for bike_number, trip_data in return_confirmations.pop_due(snapshot.fetched_at):
+        finalize_bike_return(bike_number, trip_data, snapshot)
+
+# Finale Positionsprüfung und CSV-Eintrag
+def finalize_bike_return(bike_number, trip_data, snapshot):
     global bikes_pending_return
     
     # Ursprüngliche Rückgabezeit speichern
     original_return_time = trip_data['return_time']
     
-    # Warte die vorgegebene Zeit
-    time.sleep(return_confirmation_delay)
-    
-    # Aktuelle Zeit nach dem Warten
-    current_time = time.strftime("%Y-%m-%d %H:%M:%S")
+    current_time = snapshot_time(snapshot) if snapshot else time.strftime("%Y-%m-%d %H:%M:%S")
     
     debug_log(f"[{current_time}] Prüfe finale Position für Bike {bike_number}, zurückgegeben um {original_return_time}")
     
-    # Hole aktuelle API-Daten für finale Position
-    current_data = fetch_nextbike_data()
-    if not current_data:
+    if not snapshot:
         debug_log(f"Fehler beim Abrufen der finalen Position für Bike {bike_number}, verwende Ausgangsdaten")
         write_trip_to_csv(bike_number, trip_data)
-        if bike_number in bikes_pending_return:
-            del bikes_pending_return[bike_number]
+        clear_pending_return(bike_number)
         return
     
-    found_bike = False
+    # Fahrrad direkt über den Bike-Index des Snapshots nachschlagen
+    found = snapshot.bike_index.get(bike_number)
     
-    # Nach dem Fahrrad suchen
-    for country in current_data['countries']:
-        for city in country.get('cities', []):
-            if city.get('uid') == city_id:
-                for place in city.get('places', []):
-                    bike_list_full = place.get('bike_list', [])
-                    
-                    # Suche nach dem Fahrrad
-                    for bike in bike_list_full:
-                        if bike.get('number') == bike_number:
-                            found_bike = True
-                            lat = place.get('lat')
-                            lng = place.get('lng')
-                            in_flexzone = is_in_flexzone(lng, lat)
-                            zone_type = "Flexzone" if in_flexzone else "außerhalb Flexzone"
-                            
-                            # Prüfen, ob das Fahrrad tatsächlich zurückgegeben wurde (nicht mehr gebucht ist)
-                            is_still_booked = place.get('booked_bikes', 0) > 0 and not bike.get('active', True)
-                            
-                            if is_still_booked:
-                                debug_log(f"[{current_time}] Bike {bike_number} ist noch gebucht! Fahrt wird fortgesetzt.")
-                                # Zurück in Transit-Liste verschieben
-                                bikes_in_transit[bike_number] = trip_data
-                                if bike_number in bikes_pending_return:
-                                    del bikes_pending_return[bike_number]
-                                return
-                            
-                            # Update return_location
-                            if not place.get('spot', False):
-                                trip_data['return_location'] = zone_type
-                                trip_data['return_lat'] = lat
-                                trip_data['return_lng'] = lng
-                                
-                                debug_log(f"[{current_time}] FINALE POSITION für Bike {bike_number}: {zone_type} ({lat}, {lng})")
-                            else:
-                                station_type = "virtuell" if place.get('terminal_type') == "free" else "physisch"
-                                trip_data['return_type'] = f"Station ({station_type})"
-                                trip_data['return_location'] = place.get('name', 'Unbekannte Station')
-                                trip_data['return_lat'] = lat
-                                trip_data['return_lng'] = lng
-                                
-                                debug_log(f"[{current_time}] FINALE POSITION für Bike {bike_number}: Station {place.get('name')}")
-                            
-                            break
-                    
-                    if found_bike:
-                        break
-                
-                if found_bike:
-                    break
+    if found:
+        place, bike = found
+        lat = place.get('lat')
+        lng = place.get('lng')
+        in_flexzone = is_in_flexzone(lng, lat)
+        zone_type = "Flexzone" if in_flexzone else "außerhalb Flexzone"
+        
+        # Prüfen, ob das Fahrrad tatsächlich zurückgegeben wurde (nicht mehr gebucht ist)
+        is_still_booked = place.get('booked_bikes', 0) > 0 and not bike.get('active', True)
+        
+        if is_still_booked:
+            debug_log(f"[{current_time}] Bike {bike_number} ist noch gebucht! Fahrt wird fortgesetzt.")
+            # Zurück in Transit-Liste verschieben
+            bikes_in_transit[bike_number] = trip_data
+            mark_changed("in_transit", bike_number)
+            clear_pending_return(bike_number)
+            return
+        
+        # Update return_location
+        if not place.get('spot', False):
+            trip_data['return_location'] = zone_type
+            trip_data['return_lat'] = lat
+            trip_data['return_lng'] = lng
             
-            if found_bike:
-                break
-    
-    if not found_bike:
+            debug_log(f"[{current_time}] FINALE POSITION für Bike {bike_number}: {zone_type} ({lat}, {lng})")
+        else:
+            station_type = "virtuell" if place.get('terminal_type') == "free" else "physisch"
+            trip_data['return_type'] = f"Station ({station_type})"
+            trip_data['return_location'] = place.get('name', 'Unbekannte Station')
+            trip_data['return_lat'] = lat
+            trip_data['return_lng'] = lng
+            
+            debug_log(f"[{current_time}] FINALE POSITION für Bike {bike_number}: Station {place.get('name')}")
+    else:
         debug_log(f"[{current_time}] Bike {bike_number} nicht mehr gefunden für finale Positionsbestimmung")
     
     # Ins CSV schreiben
     write_trip_to_csv(bike_number, trip_data)
     
     # Aus der pending-Liste entfernen
+    clear_pending_return(bike_number)
+
+def clear_pending_return(bike_number):
     if bike_number in bikes_pending_return:
         del bikes_pending_return[bike_number]
+        mark_changed("pending_return", bike_number)
 
 # Prüfe, ob ein kürzlich aus einer Station entferntes Fahrrad als eigenes Objekt erscheint
-def check_removed_bikes_transformation(current_data):
+def check_removed_bikes_transformation(snapshot):
     global bikes_removed_from_stations, bikes_in_transit, bikes_pending_return
     
     bikes_to_remove = set()  # Bikes, die aus der Tracking-Liste entfernt werden sollen
-    current_time = time.strftime("%Y-%m-%d %H:%M:%S")
+    current_time = snapshot_time(snapshot)
     
-    # Bike-Objekte in der aktuellen API-Antwort durchsuchen
-    for country in current_data['countries']:
-        for city in country.get('cities', []):
-            if city.get('uid') == city_id:
-                for place in city.get('places', []):
-                    # Nur freistehende Fahrräder überprüfen
-                    if place.get('bike', True) and not place.get('spot', False):
-                        bike_numbers = place.get('bike_numbers', [])
-                        if not bike_numbers:
-                            continue
-                            
-                        bike_number = bike_numbers[0]
-                        booked_bikes = place.get('booked_bikes', 0)
-                        lat = place.get('lat')
-                        lng = place.get('lng')
-                        in_flexzone = is_in_flexzone(lng, lat)
-                        zone_type = "Flexzone" if in_flexzone else "außerhalb Flexzone"
-                        
-                        # Ist dieses Fahrrad eines, das kürzlich aus einer Station entfernt wurde?
-                        if bike_number in bikes_removed_from_stations:
-                            bikes_to_remove.add(bike_number)
-                            
-                            # Ist es als ausgeliehen markiert (booked_bikes = 1)?
-                            if booked_bikes == 1:
-                                debug_log(f"[{current_time}] BESTÄTIGT: Bike {bike_number} aus Station entfernt und als eigenes Array mit booked_bikes=1 gefunden!", 1)
-                                
-                                # Zusätzliche Informationen über das letzte Rental tracken
-                                if bike_number in bike_last_station:
-                                    station_info = bike_last_station[bike_number]
-                                    debug_log(f"    Ursprünglich ausgeliehen von: {station_info['name']} ({station_info['type']})", 2)
-                            else:
-                                debug_log(f"[{current_time}] DIREKTE VERSCHIEBUNG: Bike {bike_number} aus Station entfernt und direkt als freistehend (booked_bikes={booked_bikes}) gefunden!", 1)
-                                
-                                # In diesem Fall behandeln wir es als abgeschlossene Fahrt (wahrscheinlich durch Service-Team bewegt)
-                                if bike_number in bikes_in_transit:
-                                    trip_data = bikes_in_transit[bike_number]
-                                    trip_data['return_time'] = current_time
-                                    trip_data['return_type'] = "Freistehend"
-                                    trip_data['return_location'] = zone_type
-                                    trip_data['return_lat'] = lat
-                                    trip_data['return_lng'] = lng
-                                    
-                                    debug_log(f"[{current_time}] ERFASSTE DIREKTE STATION→FLEXZONE BEWEGUNG für Bike {bike_number}!", 1)
-                                    
-                                    # In Pending-Liste aufnehmen und aus Transit entfernen
-                                    bikes_pending_return[bike_number] = trip_data
-                                    del bikes_in_transit[bike_number]
-                                    
-                                    # Finale Position verzögert prüfen in separatem Thread
-                                    threading.Thread(target=finalize_bike_return, args=(bike_number, trip_data)).start()
+    # Nur die kürzlich aus Stationen entfernten Bikes im Bike-Index nachschlagen
+    for bike_number in list(bikes_removed_from_stations):
+        found = snapshot.bike_index.get(bike_number)
+        if not found:
+            continue
+        place = found[0]
+        
+        # Nur freistehende Fahrräder überprüfen
+        if not (place.get('bike', True) and not place.get('spot', False)):
+            continue
+        bike_numbers = place.get('bike_numbers', [])
+        if not bike_numbers or bike_numbers[0] != bike_number:
+            continue
+        
+        booked_bikes = place.get('booked_bikes', 0)
+        lat = place.get('lat')
+        lng = place.get('lng')
+        in_flexzone = is_in_flexzone(lng, lat)
+        zone_type = "Flexzone" if in_flexzone else "außerhalb Flexzone"
+        
+        bikes_to_remove.add(bike_number)
+        
+        # Ist es als ausgeliehen markiert (booked_bikes = 1)?
+        if booked_bikes == 1:
+            debug_log(f"[{current_time}] BESTÄTIGT: Bike {bike_number} aus Station entfernt und als eigenes Array mit booked_bikes=1 gefunden!", 1)
+            
+            # Zusätzliche Informationen über das letzte Rental tracken
+            if bike_number in bike_last_station:
+                station_info = bike_last_station[bike_number]
+                debug_log(f"    Ursprünglich ausgeliehen von: {station_info['name']} ({station_info['type']})", 2)
+        else:
+            debug_log(f"[{current_time}] DIREKTE VERSCHIEBUNG: Bike {bike_number} aus Station entfernt und direkt als freistehend (booked_bikes={booked_bikes}) gefunden!", 1)
+            
+            # In diesem Fall behandeln wir es als abgeschlossene Fahrt (wahrscheinlich durch Service-Team bewegt)
+            if bike_number in bikes_in_transit:
+                trip_data = bikes_in_transit[bike_number]
+                trip_data['return_time'] = current_time
+                trip_data['return_type'] = "Freistehend"
+                trip_data['return_location'] = zone_type
+                trip_data['return_lat'] = lat
+                trip_data['return_lng'] = lng
+                
+                debug_log(f"[{current_time}] ERFASSTE DIREKTE STATION→FLEXZONE BEWEGUNG für Bike {bike_number}!", 1)
+                
+                # In Pending-Liste aufnehmen und aus Transit entfernen
+                schedule_bike_return(bike_number, trip_data, snapshot.fetched_at)
+                del bikes_in_transit[bike_number]
+                mark_changed("in_transit", bike_number)
 
     # Bikes aus dem Tracking entfernen, die jetzt als eigene Arrays identifiziert wurden
     bikes_removed_from_stations -= bikes_to_remove
 
+# Einträge entfernen, deren Fahrrad oder Platz nicht mehr im Feed ist
+def evict_stale_state(snapshot):
+    global last_eviction
+    now = snapshot.fetched_at
+    if now - last_eviction < eviction_interval:
+        return
+    last_eviction = now
+    
+    # Fahrräder mit offener Fahrt oder Rückgabe werden weiter gebraucht
+    in_use = set(bikes_in_transit) | set(bikes_pending_return) | bikes_removed_from_stations
+    
+    def place_present(uid, _):
+        return uid in snapshot.place_index
+    
+    def bike_present(bike_number, _):
+        return bike_number in snapshot.bike_index or bike_number in in_use
+    
+    evicted = {
+        "stations": evictors["stations"].sweep(station_status, place_present, now),
+        "bikes": evictors["bikes"].sweep(bike_status, bike_present, now),
+        "freebike_booked": evictors["freebike_booked"].sweep(freebike_booked, place_present, now),
+        "bike_last_station": evictors["bike_last_station"].sweep(bike_last_station, bike_present, now),
+    }
+    for name, keys in evicted.items():
+        for key in keys:
+            mark_changed(name, key)
+    fleet_evicted = fleet.evict(evictors["fleet"], now, in_use)
+    
+    total = sum(len(keys) for keys in evicted.values()) + len(fleet_evicted)
+    if total:
+        counts = ", ".join(f"{name}: {len(keys)}" for name, keys in evicted.items() if keys)
+        if fleet_evicted:
+            counts += f"{', ' if counts else ''}fleet: {len(fleet_evicted)}"
+        debug_log(f"{total} veraltete Einträge entfernt ({counts})", 2)
+
+# Getrackter Zustand unter den Namen aus bike_movements.json
+def tracker_state():
+    return {
+        "stations": station_status,
+        "bikes": bike_status,
+        "in_transit": bikes_in_transit,
+        "pending_return": bikes_pending_return,
+        "freebike_booked": freebike_booked,
+        "bike_last_station": bike_last_station,
+        "bikes_removed_from_stations": bikes_removed_from_stations
+    }
+
+# Checkpoint (Snapshot oder Delta) schreiben und gelegentlich bike_movements.json aktualisieren
+def save_tracker_state(current_time, now):
+    global last_json_dump
+    
+    checkpoint.save(tracker_state(), now)
+    
+    if now - last_json_dump < json_dump_interval:
+        return
+    last_json_dump = now
+    with instrumentation.timed("trips.json_dump"), atomic_write("results_trips/bike_movements.json") as file:
+        json.dump({
+            "timestamp": current_time,
+            "stations": station_status,
+            "bikes": records_to_dicts(bike_status),
+            "in_transit": bikes_in_transit,
+            "pending_return": bikes_pending_return,
+            "freebike_booked": records_to_dicts(freebike_booked),
+            "bike_last_station": bike_last_station,
+            "bikes_removed_from_stations": list(bikes_removed_from_stations),
+            "stats": {
+                "stations_count": len(station_status),
+                "bikes_count": len(bike_status),
+                "in_transit_count": len(bikes_in_transit),
+                "pending_return_count": len(bikes_pending_return),
+                "evicted": {name: evictor.evicted for name, evictor in evictors.items()}
+            }
+        }, file, indent=4)
+
+# Letzten Checkpoint nach einem Neustart laden; angewendet wird er mit dem ersten Snapshot (apply_restored_state)
+def restore_tracker_state():
+    global restored_checkpoint
+    
+    try:
+        state, saved_at = checkpoint.load()
+    except Exception as e:
+        debug_log(f"Checkpoint konnte nicht geladen werden: {e}")
+        return
+    if state is not None:
+        restored_checkpoint = (state, saved_at)
+
+# Geladenen Checkpoint gegen den ersten Snapshot anwenden (Alter und Fristen in Snapshot-Zeit, wie alle Fristen)
+def apply_restored_state(snapshot):
+    global station_status, bike_status, bikes_in_transit, bikes_pending_return, restored_checkpoint
+    global freebike_booked, bike_last_station, bikes_removed_from_stations, first_run
+    
+    if restored_checkpoint is None:
+        return
+    state, saved_at = restored_checkpoint
+    restored_checkpoint = None
+    
+    age = snapshot.fetched_at - saved_at
+    bikes_in_transit = state["in_transit"]
+    bikes_pending_return = state["pending_return"]
+    
+    # Offene Rückgaben erneut zur Bestätigung einplanen
+    for bike_number, trip_data in bikes_pending_return.items():
+        return_confirmations.push(snapshot.fetched_at + return_confirmation_delay, (bike_number, trip_data))
+    
+    if age <= checkpoint_max_age:
+        # Frischer Checkpoint: Vergleich direkt gegen den gesicherten Stand fortsetzen
+        station_status = state["stations"]
+        bike_status = records_from(state["bikes"], FreeBikeStatus)
+        freebike_booked = records_from(state["freebike_booked"], FreeBikeBooking)
+        bike_last_station = state["bike_last_station"]
+        bikes_removed_from_stations = set(state["bikes_removed_from_stations"])
+        first_run = False
+    
+    debug_log(f"Checkpoint wiederhergestellt ({int(age)} s alt): {len(bikes_in_transit)} Fahrten in Transit, "
+              f"{len(bikes_pending_return)} Rückgaben ausstehend")
+
 # Tracking der Bewegungen
-def track_bike_movements():
-    global station_status, bike_status, first_run, bikes_in_transit, all_bikes_status, bikes_pending_return
-    global freebike_booked, newly_booked_bikes, bike_last_locations, bike_last_station, bikes_removed_from_stations
+def track_bike_movements(subscription=None):
+    global station_status, bike_status, first_run, bikes_in_transit, bikes_pending_return
+    global freebike_booked, newly_booked_bikes, bike_last_station, bikes_removed_from_stations
+    global feed_subscription, last_snapshot, trip_aggregates
     
-    # CSV-Datei initialisieren
+    feed_subscription = subscription or nextbike_feed.local_subscription(polling_interval)
+    instrumentation.start_exporter()
+    
+    # CSV-Datei und Parquet-Ausgabe initialisieren
     init_csv_file()
+    init_parquet_sink()
+    if trip_aggregates is None:
+        trip_aggregates = RollingAggregates.load(trip_aggregates_file)
+        atexit.register(trip_aggregates.save)
     
     # Flexzonen laden
     load_flexzones()
     
+    # Beim ersten Start den letzten Checkpoint laden (nach internem Neustart ist der Zustand noch im Speicher)
+    if restore_checkpoint and first_run and not bikes_in_transit:
+        restore_tracker_state()
+    
     debug_log("Starte das Tracking der Fahrräder...")
     
     while True:
         # Leere die Liste der neu gebuchten Fahrräder für diesen Durchlauf
         newly_booked_bikes = set()
         
-        data = fetch_nextbike_data()
-        if not data:
-            time.sleep(polling_interval)
+        snapshot = fetch_nextbike_data()
+        if not snapshot:
             continue
+        detect_started = instrumentation.start()
+        if detect_started is not None:
+            # Alter des Snapshots bei Verarbeitungsbeginn (Wartezeit hinter dem Bus)
+            instrumentation.observe("trips.snapshot_age", max(0, time.time() - snapshot.fetched_at))
 
-        current_time = time.strftime("%Y-%m-%d %H:%M:%S")
-        visible_bike_numbers = set()  # Alle aktuell sichtbaren Bike-Nummern
-        current_all_bikes = {}        # Aktueller Status aller Fahrräder
+        # Nach einem Neustart: geladenen Checkpoint mit dem ersten Snapshot übernehmen
+        apply_restored_state(snapshot)
+        
+        # Fällige Rückgaben mit diesem Snapshot bestätigen (kein zusätzlicher API-Abruf)
+        confirm_due_returns(snapshot)
+
+        current_time = snapshot_time(snapshot)
         
         # Nach aus Stationen entfernten Fahrrädern suchen, die jetzt als eigene Arrays erscheinen
         if bikes_removed_from_stations:
-            check_removed_bikes_transformation(data)
+            check_removed_bikes_transformation(snapshot)
         
-        # Alle Stationen und freistehenden Fahrräder durchgehen
-        for country in data['countries']:
-            for city in country.get('cities', []):
-                if city.get('uid') == city_id:
-                    # 1. Stationen verarbeiten
-                    for place in city.get('places', []):
-                        # Fahrradliste und Buchungsstatus für alle Plätze
-                        bike_list_full = place.get('bike_list', [])
-                        
-                        # Alle Fahrräder an diesem Ort erfassen
-                        for bike in bike_list_full:
-                            bike_number = bike.get('number')
-                            if bike_number:
-                                visible_bike_numbers.add(bike_number)
-                                current_all_bikes[bike_number] = {
-                                    'lat': place.get('lat'),
-                                    'lng': place.get('lng'),
-                                    'active': bike.get('active', True),
-                                    'state': bike.get('state', 'ok'),
-                                    'spot': place.get('spot', False),
-                                    'spot_name': place.get('name', '') if place.get('spot', False) else None,
-                                    'terminal_type': place.get('terminal_type', ''),
-                                    'is_booked': not bike.get('active', True),
-                                    'booked_bikes': place.get('booked_bikes', 0),
-                                    'place_uid': place.get('uid')
-                                }
-                                
-                                # Position für jedes Fahrrad speichern
-                                bike_last_locations[bike_number] = {
-                                    'time': current_time,
-                                    'lat': place.get('lat'),
-                                    'lng': place.get('lng'),
-                                    'spot': place.get('spot', False),
-                                    'spot_name': place.get('name', '') if place.get('spot', False) else None,
-                                    'terminal_type': place.get('terminal_type', ''),
-                                    'in_flexzone': is_in_flexzone(place.get('lng'), place.get('lat'))
-                                }
-                                
-                        # 1. Stationen verarbeiten
-                        if place.get('spot', False):
-                            station_id = place.get('uid')
-                            name = place.get('name', 'Unbenannte Station')
-                            terminal_type = place.get('terminal_type', '')
-                            station_type = "virtuell" if terminal_type == "free" else "physisch"
-                            bike_list = [bike['number'] for bike in place.get('bike_list', [])]
-                            
-                            # Station initialisieren, wenn neu
-                            if station_id not in station_status:
-                                station_status[station_id] = {
-                                    "name": name,
-                                    "station_type": station_type,
-                                    "last_bike_list": bike_list
-                                }
-                                if not first_run:
-                                    debug_log(f"[{current_time}] Neue Station gefunden: {name} ({station_type})")
-                            
-                            last_status = station_status[station_id]
-                            
-                            # Nur wenn nicht erster Durchlauf: Änderungen prüfen
-                            if not first_run:
-                                # Neu hinzugekommene Fahrräder identifizieren (Rückgabe an Station)
-                                new_bikes_at_station = set(bike_list) - set(last_status["last_bike_list"])
-                                
-                                # Prüfen, ob eines der neuen Fahrräder in Transit ist
-                                for bike in new_bikes_at_station:
-                                    if bike in bikes_in_transit and bike not in newly_booked_bikes:
-                                        # Als Stationsrückgabe erfassen
-                                        trip_data = bikes_in_transit[bike]
-                                        trip_data['return_time'] = current_time
-                                        trip_data['return_type'] = f"Station ({station_type})"
-                                        trip_data['return_location'] = name
-                                        trip_data['return_lat'] = place.get('lat')
-                                        trip_data['return_lng'] = place.get('lng')
-                                        
-                                        # Rückgabeart identifizieren
-                                        rental_type = trip_data['rental_type']
-                                        if rental_type.startswith("Station"):
-                                            trans_type = "Station → Station"
-                                        else:
-                                            trans_type = "Flexzone → Station"
-                                            
-                                        debug_log(f"[{current_time}] Fahrrad {bike} wurde an Station {name} zurückgegeben ({trans_type}) - warte auf finale Position...")
-                                        
-                                        # In Pending-Liste aufnehmen und aus Transit entfernen
-                                        bikes_pending_return[bike] = trip_data
-                                        del bikes_in_transit[bike]
-                                        
-                                        # Finale Position verzögert prüfen in separatem Thread
-                                        threading.Thread(target=finalize_bike_return, args=(bike, trip_data)).start()
-                                
-                                # Fahrräder, die entfernt wurden (aus der bike_list verschwunden)
-                                removed_bikes = set(last_status["last_bike_list"]) - set(bike_list)
-                                for bike in removed_bikes:
-                                    debug_log(f"[{current_time}] Fahrrad {bike} wurde von {station_type}r Station {name} entfernt")
-                                    
-                                    # Wichtig: Dieses Fahrrad tracken, um zu überprüfen, ob es als eigenes Array erscheint
-                                    bikes_removed_from_stations.add(bike)
-                                    
-                                    # Stationsdaten für spätere Referenz speichern
-                                    bike_last_station[bike] = {
-                                        'name': name,
-                                        'type': station_type,
-                                        'time': current_time,
-                                        'lat': place.get('lat'),
-                                        'lng': place.get('lng')
-                                    }
-                                    
-                                    # Fahrrad in Transit-Liste aufnehmen
-                                    bikes_in_transit[bike] = {
-                                        'rental_time': current_time,
-                                        'rental_type': f"Station ({station_type})",
-                                        'rental_location': name,
-                                        'rental_lat': place.get('lat'),
-                                        'rental_lng': place.get('lng')
-                                    }
-                                    
-                                    # Als neu gebucht markieren
-                                    newly_booked_bikes.add(bike)
-
-                            # Aktualisiere den Status der Station
-                            last_status["last_bike_list"] = bike_list
-                        
-                        # 2. Freistehende Fahrräder verarbeiten
-                        elif place.get('bike', False) and not place.get('spot', False):
-                            bike_number = place.get('bike_numbers', ['unbekannt'])[0] if place.get('bike_numbers') else 'unbekannt'
-                            if bike_number == 'unbekannt':
-                                continue
-                                
-                            lat = place.get('lat')
-                            lng = place.get('lng')
-                            in_flexzone = is_in_flexzone(lng, lat)
-                            zone_type = "Flexzone" if in_flexzone else "außerhalb Flexzone"
-                            booked_bikes = place.get('booked_bikes', 0)
-                            
-                            # Prüfe, ob es einen vorherigen Wert für booked_bikes gibt
-                            bike_uid = place.get('uid')
-                            if bike_uid not in freebike_booked:
-                                freebike_booked[bike_uid] = {
-                                    "booked_bikes": booked_bikes,
-                                    "bike_number": bike_number,
-                                    "last_seen_time": current_time,
-                                    "last_position": {"lat": lat, "lng": lng}
-                                }
-                            
-                            # Wenn booked_bikes von 0 auf 1 wechselt -> Ausleihe starten
-                            if not first_run and freebike_booked[bike_uid]["booked_bikes"] == 0 and booked_bikes == 1:
-                                debug_log(f"[{current_time}] Fahrrad {bike_number} wurde freistehend in {zone_type} gebucht (booked_bikes: 0->1)")
-                                
-                                # Fahrrad in Transit-Liste aufnehmen
-                                bikes_in_transit[bike_number] = {
-                                    'rental_time': current_time,
-                                    'rental_type': "Freistehend",
-                                    'rental_location': zone_type,
-                                    'rental_lat': lat,
-                                    'rental_lng': lng
-                                }
-                                
-                                # Als neu gebucht markieren
-                                newly_booked_bikes.add(bike_number)
+        # Nur neue oder geänderte Plätze verarbeiten; unveränderte können keine Ereignisse auslösen
+        changed_places = snapshot.changed_places(last_snapshot)
+        
+        # Fahrräder geänderter oder verschwundener Plätze aus dem Gesamtstatus nehmen (werden unten neu erfasst)
+        if last_snapshot is not None:
+            for place in changed_places + snapshot.removed_places(last_snapshot):
+                old_place = last_snapshot.place_index.get(place.get('uid'))
+                if old_place is not None:
+                    fleet.remove_place(old_place)
+        
+        # Flexzonen-Zugehörigkeit der geänderten Plätze in einem Aufruf bestimmen
+        with instrumentation.timed("trips.flexzone"):
+            place_in_flexzone = classify_flexzones(changed_places)
+        
+        # Geänderte Stationen und freistehende Fahrräder durchgehen
+        for place, in_flexzone in zip(changed_places, place_in_flexzone):
+            # Alle Fahrräder an diesem Ort erfassen (time = letzte Änderung am Platz)
+            fleet.update_place(place, in_flexzone, current_time)
+            
+            # 1. Stationen verarbeiten
+            if place.get('spot', False):
+                station_id = place.get('uid')
+                name = intern_text(place.get('name', 'Unbenannte Station'))
+                terminal_type = place.get('terminal_type', '')
+                station_type = "virtuell" if terminal_type == "free" else "physisch"
+                bike_list = [intern_text(bike['number']) for bike in place.get('bike_list', [])]
+                
+                # Station initialisieren, wenn neu
+                if station_id not in station_status:
+                    station_status[station_id] = {
+                        "name": name,
+                        "station_type": station_type,
+                        "last_bike_list": bike_list
+                    }
+                    mark_changed("stations", station_id)
+                    if not first_run:
+                        debug_log(f"[{current_time}] Neue Station gefunden: {name} ({station_type})")
+                
+                last_status = station_status[station_id]
+                
+                # Nur wenn nicht erster Durchlauf: Änderungen prüfen
+                if not first_run:
+                    # Neu hinzugekommene Fahrräder identifizieren (Rückgabe an Station)
+                    new_bikes_at_station = set(bike_list) - set(last_status["last_bike_list"])
+                    
+                    # Prüfen, ob eines der neuen Fahrräder in Transit ist
+                    for bike in new_bikes_at_station:
+                        if bike in bikes_in_transit and bike not in newly_booked_bikes:
+                            # Als Stationsrückgabe erfassen
+                            trip_data = bikes_in_transit[bike]
+                            trip_data['return_time'] = current_time
+                            trip_data['return_type'] = f"Station ({station_type})"
+                            trip_data['return_location'] = name
+                            trip_data['return_lat'] = place.get('lat')
+                            trip_data['return_lng'] = place.get('lng')
                             
-                            # Wenn booked_bikes von 1 auf 0 wechselt -> Rückgabe erkennen
-                            elif not first_run and freebike_booked[bike_uid]["booked_bikes"] == 1 and booked_bikes == 0:
-                                debug_log(f"[{current_time}] Fahrrad {bike_number} wurde freistehend zurückgegeben (booked_bikes: 1->0)")
+                            # Rückgabeart identifizieren
+                            rental_type = trip_data['rental_type']
+                            if rental_type.startswith("Station"):
+                                trans_type = "Station → Station"
+                            else:
+                                trans_type = "Flexzone → Station"
                                 
-                                # Prüfen, ob das Fahrrad in der Transit-Liste ist
-                                if bike_number in bikes_in_transit:
-                                    # Komplette Fahrt erfassen
-                                    trip_data = bikes_in_transit[bike_number]
-                                    trip_data['return_time'] = current_time
-                                    trip_data['return_type'] = "Freistehend"
-                                    trip_data['return_location'] = zone_type
-                                    trip_data['return_lat'] = lat
-                                    trip_data['return_lng'] = lng
-                                    
-                                    # Rückgabeart identifizieren (von wo nach wo)
-                                    rental_type = trip_data['rental_type']
-                                    if rental_type.startswith("Station"):
-                                        trans_type = "Station → Flexzone"
-                                        debug_log(f"[{current_time}] ERFOLGREICHE STATION→FLEXZONE BEWEGUNG für Bike {bike_number}!", 1)
-                                    else:
-                                        trans_type = "Flexzone → Flexzone"
-                                        
-                                    debug_log(f"[{current_time}] Fahrrad {bike_number} wurde freistehend ({zone_type}) zurückgegeben ({trans_type}) - warte auf finale Position...")
-                                    
-                                    # In Pending-Liste aufnehmen und aus Transit entfernen
-                                    bikes_pending_return[bike_number] = trip_data
-                                    del bikes_in_transit[bike_number]
-                                    
-                                    # Finale Position verzögert prüfen in separatem Thread
-                                    threading.Thread(target=finalize_bike_return, args=(bike_number, trip_data)).start()
+                            debug_log(f"[{current_time}] Fahrrad {bike} wurde an Station {name} zurückgegeben ({trans_type}) - warte auf finale Position...")
                             
-                            # Update den booked_bikes Status und Position
-                            freebike_booked[bike_uid]["booked_bikes"] = booked_bikes
-                            freebike_booked[bike_uid]["bike_number"] = bike_number
-                            freebike_booked[bike_uid]["last_seen_time"] = current_time
-                            freebike_booked[bike_uid]["last_position"] = {"lat": lat, "lng": lng}
+                            # In Pending-Liste aufnehmen und aus Transit entfernen
+                            schedule_bike_return(bike, trip_data, snapshot.fetched_at)
+                            del bikes_in_transit[bike]
+                            mark_changed("in_transit", bike)
+                    
+                    # Fahrräder, die entfernt wurden (aus der bike_list verschwunden)
+                    removed_bikes = set(last_status["last_bike_list"]) - set(bike_list)
+                    for bike in removed_bikes:
+                        debug_log(f"[{current_time}] Fahrrad {bike} wurde von {station_type}r Station {name} entfernt")
+                        
+                        # Wichtig: Dieses Fahrrad tracken, um zu überprüfen, ob es als eigenes Array erscheint
+                        bikes_removed_from_stations.add(bike)
+                        
+                        # Stationsdaten für spätere Referenz speichern
+                        bike_last_station[bike] = {
+                            'name': name,
+                            'type': station_type,
+                            'time': current_time,
+                            'lat': place.get('lat'),
+                            'lng': place.get('lng')
+                        }
+                        
+                        # Fahrrad in Transit-Liste aufnehmen
+                        bikes_in_transit[bike] = {
+                            'rental_time': current_time,
+                            'rental_type': f"Station ({station_type})",
+                            'rental_location': name,
+                            'rental_lat': place.get('lat'),
+                            'rental_lng': place.get('lng')
+                        }
+                        mark_changed("bike_last_station", bike)
+                        mark_changed("in_transit", bike)
+                        
+                        # Als neu gebucht markieren
+                        newly_booked_bikes.add(bike)
+
+                # Aktualisiere den Status der Station
+                if last_status["last_bike_list"] != bike_list:
+                    mark_changed("stations", station_id)
+                last_status["last_bike_list"] = bike_list
+            
+            # 2. Freistehende Fahrräder verarbeiten
+            elif place.get('bike', False) and not place.get('spot', False):
+                bike_number = place.get('bike_numbers', ['unbekannt'])[0] if place.get('bike_numbers') else 'unbekannt'
+                if bike_number == 'unbekannt':
+                    continue
+                bike_number = intern_text(bike_number)
+                    
+                lat = place.get('lat')
+                lng = place.get('lng')
+                zone_type = "Flexzone" if in_flexzone else "außerhalb Flexzone"
+                booked_bikes = place.get('booked_bikes', 0)
+                
+                # Prüfe, ob es einen vorherigen Wert für booked_bikes gibt
+                bike_uid = place.get('uid')
+                if bike_uid not in freebike_booked:
+                    freebike_booked[bike_uid] = FreeBikeBooking(booked_bikes, bike_number, current_time, lat, lng)
+                    mark_changed("freebike_booked", bike_uid)
+                previous = freebike_booked[bike_uid]
+                
+                # Wenn booked_bikes von 0 auf 1 wechselt -> Ausleihe starten
+                if not first_run and previous.booked_bikes == 0 and booked_bikes == 1:
+                    debug_log(f"[{current_time}] Fahrrad {bike_number} wurde freistehend in {zone_type} gebucht (booked_bikes: 0->1)")
+                    
+                    # Fahrrad in Transit-Liste aufnehmen
+                    bikes_in_transit[bike_number] = {
+                        'rental_time': current_time,
+                        'rental_type': "Freistehend",
+                        'rental_location': zone_type,
+                        'rental_lat': lat,
+                        'rental_lng': lng
+                    }
+                    mark_changed("in_transit", bike_number)
+                    
+                    # Als neu gebucht markieren
+                    newly_booked_bikes.add(bike_number)
+                
+                # Wenn booked_bikes von 1 auf 0 wechselt -> Rückgabe erkennen
+                elif not first_run and previous.booked_bikes == 1 and booked_bikes == 0:
+                    debug_log(f"[{current_time}] Fahrrad {bike_number} wurde freistehend zurückgegeben (booked_bikes: 1->0)")
+                    
+                    # Prüfen, ob das Fahrrad in der Transit-Liste ist
+                    if bike_number in bikes_in_transit:
+                        # Komplette Fahrt erfassen
+                        trip_data = bikes_in_transit[bike_number]
+                        trip_data['return_time'] = current_time
+                        trip_data['return_type'] = "Freistehend"
+                        trip_data['return_location'] = zone_type
+                        trip_data['return_lat'] = lat
+                        trip_data['return_lng'] = lng
+                        
+                        # Rückgabeart identifizieren (von wo nach wo)
+                        rental_type = trip_data['rental_type']
+                        if rental_type.startswith("Station"):
+                            trans_type = "Station → Flexzone"
+                            debug_log(f"[{current_time}] ERFOLGREICHE STATION→FLEXZONE BEWEGUNG für Bike {bike_number}!", 1)
+                        else:
+                            trans_type = "Flexzone → Flexzone"
                             
-                            # Fahrrad initialisieren, wenn neu
-                            if bike_number not in bike_status:
-                                bike_status[bike_number] = {
-                                    "visible": True,
-                                    "last_seen": current_time,
-                                    "last_position": {"lat": lat, "lng": lng},
-                                    "in_flexzone": in_flexzone
-                                }
-                                if not first_run:
-                                    debug_log(f"[{current_time}] Neues freies Fahrrad {bike_number} gefunden in {zone_type}")
-                                
-                            # Fahrrad-Status aktualisieren
-                            last_status = bike_status[bike_number]
-                            last_status["visible"] = True
-                            last_status["last_seen"] = current_time
-                            last_status["last_position"] = {"lat": lat, "lng": lng}
-                            last_status["in_flexzone"] = in_flexzone
+                        debug_log(f"[{current_time}] Fahrrad {bike_number} wurde freistehend ({zone_type}) zurückgegeben ({trans_type}) - warte auf finale Position...")
+                        
+                        # In Pending-Liste aufnehmen und aus Transit entfernen
+                        schedule_bike_return(bike_number, trip_data, snapshot.fetched_at)
+                        del bikes_in_transit[bike_number]
+                        mark_changed("in_transit", bike_number)
+                
+                # Update den booked_bikes Status und Position (last_seen_time allein erzeugt kein Delta)
+                if (previous.booked_bikes != booked_bikes or previous.bike_number != bike_number
+                        or previous.lat != lat or previous.lng != lng):
+                    mark_changed("freebike_booked", bike_uid)
+                previous.booked_bikes = booked_bikes
+                previous.bike_number = bike_number
+                previous.last_seen_time = current_time
+                previous.lat = lat
+                previous.lng = lng
+                
+                # Fahrrad initialisieren, wenn neu
+                if bike_number not in bike_status:
+                    bike_status[bike_number] = FreeBikeStatus(current_time, lat, lng, in_flexzone)
+                    mark_changed("bikes", bike_number)
+                    if not first_run:
+                        debug_log(f"[{current_time}] Neues freies Fahrrad {bike_number} gefunden in {zone_type}")
+                    
+                # Fahrrad-Status aktualisieren
+                last_status = bike_status[bike_number]
+                if last_status.lat != lat or last_status.lng != lng or last_status.in_flexzone != in_flexzone:
+                    mark_changed("bikes", bike_number)
+                last_status.visible = True
+                last_status.last_seen = current_time
+                last_status.lat = lat
+                last_status.lng = lng
+                last_status.in_flexzone = in_flexzone
 
-        # Aktualisiere den Status aller Fahrräder für die nächste Iteration
-        all_bikes_status = current_all_bikes
+        # Snapshot als Vergleichsbasis für die nächste Iteration merken
+        last_snapshot = snapshot
 
         # Wenn mehr als 5 Minuten seit Entfernung eines Fahrrads vergangen sind und es nicht als eigenes Array gefunden wurde
         current_datetime = datetime.strptime(current_time, "%Y-%m-%d %H:%M:%S")
@@ -616,33 +812,24 @@ def track_bike_movements():
 
         for bike in bikes_to_remove:
             del bikes_in_transit[bike]
+            mark_changed("in_transit", bike)
         
-        # Status speichern
-        with open("results_trips/bike_movements.json", "w") as file:
-            json.dump({
-                "timestamp": current_time,
-                "stations": station_status,
-                "bikes": bike_status,
-                "in_transit": bikes_in_transit,
-                "pending_return": bikes_pending_return,
-                "freebike_booked": freebike_booked,
-                "bike_last_station": bike_last_station,
-                "bikes_removed_from_stations": list(bikes_removed_from_stations),
-                "stats": {
-                    "stations_count": len(station_status),
-                    "bikes_count": len(bike_status),
-                    "in_transit_count": len(bikes_in_transit),
-                    "pending_return_count": len(bikes_pending_return)
-                }
-            }, file, indent=4)
+        evict_stale_state(snapshot)
+        instrumentation.stop("trips.detect", detect_started)
         
-        time.sleep(polling_interval)
+        # Status speichern
+        with instrumentation.timed("trips.persist"):
+            save_tracker_state(current_time, snapshot.fetched_at)
+            # Gepufferte Parquet-Zeilen auch in ruhigen Phasen spätestens nach dem Flush-Intervall schreiben
+            if trips_parquet_sink is not None:
+                trips_parquet_sink.flush_if_due()
 
 if __name__ == "__main__":
     # Starte das Tracking mit robuster Fehlerbehandlung und automatischem Neustart bei Fehlern
+    subscription = nextbike_feed.local_subscription(polling_interval)
     while True:
         try:
-            track_bike_movements()
+            track_bike_movements(subscription)
         except KeyboardInterrupt:
             debug_log("\nTracking wurde vom Benutzer beendet")
             break
@@ -0,0 +1,136 @@
+"""
+Replay: aufgezeichnete Snapshots offline durch die Detektoren schicken, so schnell die CPU erlaubt.
+
+Aufruf (aus dem Projekt-Root):
+    python3 scripts/replay.py recordings/2025-07-01 --output replay_out [--flexzones flexzone_bn.json]
+
+Die Ergebnisse landen in denselben Unterordnern wie im Live-Betrieb, aber unterhalb von --output.
+Die Zeit kommt ausschließlich aus den Zeitstempeln der Aufnahme. Ein Replay startet immer ohne
+Vorzustand: --output muss leer sein oder fehlen, Checkpoints werden nicht geladen.
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+# Pfade vor dem Wechsel ins Ausgabeverzeichnis auflösen
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import event_sink
+from snapshot_recorder import read_snapshots
+
+
+class ReplayFinished(Exception):
+    pass
+
+
+class ReplaySubscription:
+    """
+    Verlustfreies Gegenstück zu nextbike_feed.Subscription: der Treiber wartet,
+    bis jeder Detektor den Snapshot abgeholt hat, statt Stände zu verwerfen.
+    """
+
+    _END = object()
+
+    def __init__(self, maxsize=4):
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, snapshot):
+        self._queue.put(snapshot)
+
+    def close(self):
+        self._queue.put(self._END)
+
+    def get(self, timeout=None):
+        snapshot = self._queue.get()
+        if snapshot is self._END:
+            raise ReplayFinished()
+        return snapshot
+
+
+def run_detector(name, target, subscription, errors):
+    try:
+        target(subscription)
+    except ReplayFinished:
+        pass
+    except Exception as e:
+        errors.append((name, e))
+        # Treiber nicht blockieren: restliche Snapshots verwerfen
+        try:
+            while True:
+                subscription.get()
+        except ReplayFinished:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="+", help="Aufzeichnungsdateien oder -ordner")
+    parser.add_argument("--output", default="replay_out")
+    parser.add_argument("--flexzones", help="Lokale Flexzonen-GeoJSON-Datei (sonst Abruf über das Netz)")
+    parser.add_argument("--detectors", default="trips,reservations")
+    args = parser.parse_args()
+
+    recordings = [os.path.abspath(path) for path in args.recordings]
+    flexzones = os.path.abspath(args.flexzones) if args.flexzones else None
+    # Checkpoints, Aggregate und CSVs eines früheren Laufs würden den Zustand verfälschen
+    if os.path.isdir(args.output) and os.listdir(args.output):
+        sys.exit(f"❌ Ausgabeverzeichnis {args.output} ist nicht leer - bitte leeren oder ein neues angeben")
+    os.makedirs(args.output, exist_ok=True)
+    os.chdir(args.output)
+
+    # Detektoren erst im Ausgabeverzeichnis importieren (legen ihre Ordner beim Import an)
+    detectors = []
+    selected = args.detectors.split(",")
+    if "trips" in selected:
+        import nextbike_trip_analysis
+        nextbike_trip_analysis.flexzone_file = flexzones
+        nextbike_trip_analysis.debug_level = 0
+        nextbike_trip_analysis.restore_checkpoint = False
+        detectors.append(("trips", nextbike_trip_analysis.track_bike_movements))
+    if "reservations" in selected:
+        import station_reservation
+        detectors.append(("reservations", station_reservation.main))
+
+    errors = []
+    subscriptions = []
+    threads = []
+    for name, target in detectors:
+        subscription = ReplaySubscription()
+        thread = threading.Thread(target=run_detector, args=(name, target, subscription, errors), name=name)
+        thread.start()
+        subscriptions.append(subscription)
+        threads.append(thread)
+
+    started = time.perf_counter()
+    count = 0
+    first = last = None
+    for snapshot in read_snapshots(recordings):
+        for subscription in subscriptions:
+            subscription.put(snapshot)
+        count += 1
+        first = first or snapshot.fetched_at
+        last = snapshot.fetched_at
+
+    for subscription in subscriptions:
+        subscription.close()
+    for thread in threads:
+        thread.join()
+    # Noch gepufferte Ergebniszeilen schreiben, bevor gemessen wird
+    event_sink.shared_sink().flush()
+    elapsed = time.perf_counter() - started
+
+    for name, error in errors:
+        print(f"❌ Detektor {name} abgebrochen: {error}")
+    if count:
+        covered = (last - first) / 3600
+        print(f"{count} Snapshots ({covered:.1f} h Aufnahme) in {elapsed:.1f} s verarbeitet "
+              f"-> {count / elapsed:.1f} Snapshots/s")
+    else:
+        print("Keine Snapshots gefunden")
+
+
+if __name__ == "__main__":
+    main()
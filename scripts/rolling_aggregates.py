@@ -0,0 +1,242 @@
+"""
+Laufende Aggregate, die die Sammler bei jedem Ereignis fortschreiben.
+
+Statt für jede Auswertung die komplette Rohdaten-Historie neu zu gruppieren, halten die
+Sammler kleine Zähler und Skizzen im Speicher und schreiben sie regelmäßig als kompaktes
+JSON (wenige KB) weg. Auswertung im Notebook:
+
+    from rolling_aggregates import RollingAggregates
+    agg = RollingAggregates.load("results_station_reservation/aggregates.json")
+    agg.hourly_counts()                         # {(stunde, available_bikes_before, event_type): anzahl}
+    agg.success_rates()                         # {available_bikes_before: anteil booked:bike_taken}
+    agg.duration_summary("booked:bike_taken")   # count, mean, p50, p90, ...
+    agg.booked_curve(weekend=True)              # {viertelstunde: mittlere booked_bikes}
+"""
+import json
+import math
+import os
+import time
+
+from atomic_file import atomic_write
+
+SAVE_INTERVAL = 60          # Sekunden zwischen zwei Sicherungen
+RELATIVE_ACCURACY = 0.01    # Quantil-Skizze: max. relativer Fehler (1 %)
+SLOT_MINUTES = 15
+
+
+class QuantileSketch:
+    """
+    Quantil-Skizze mit logarithmischen Buckets (Prinzip DDSketch): jeder Wert fällt in
+    den Bucket ceil(log_gamma(v)), Quantile sind damit auf RELATIVE_ACCURACY genau.
+    Für Dauern in Sekunden reichen wenige hundert Buckets, egal wie viele Werte.
+    """
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        value = float(value)
+        if value <= 0:
+            self.zeros += 1
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[key] = self.buckets.get(key, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                # Bucket-Mitte (Rückrechnung wie bei DDSketch)
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {"a": self.relative_accuracy, "b": {str(k): v for k, v in self.buckets.items()},
+                "z": self.zeros, "n": self.count, "s": self.total, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["a"])
+        sketch.buckets = {int(k): v for k, v in data["b"].items()}
+        sketch.zeros = data["z"]
+        sketch.count = data["n"]
+        sketch.total = data["s"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        return sketch
+
+
+def _key(*parts):
+    # Kompakte String-Schlüssel für JSON: "13|2|booked:bike_taken"
+    return "|".join(str(p) for p in parts)
+
+
+class RollingAggregates:
+    """
+    counts:     (stunde, available_bikes_before, event_type) -> Anzahl Reservierungsereignisse
+    durations:  (event_type, stunde) -> QuantileSketch über duration_seconds
+    booked:     (wochentag, viertelstunde) -> [Anzahl Messungen, Summe booked_bikes]
+    trips:      (stunde, Movement-Type) -> Anzahl abgeschlossener Fahrten
+    """
+
+    def __init__(self, path, save_interval=SAVE_INTERVAL):
+        self.path = path
+        self.save_interval = save_interval
+        self.counts = {}
+        self.durations = {}
+        self.booked = {}
+        self.trips = {}
+        self._last_save = time.monotonic()
+
+    @classmethod
+    def load(cls, path, save_interval=SAVE_INTERVAL):
+        # Bestehenden Stand fortführen; ohne Datei mit leeren Aggregaten beginnen
+        aggregates = cls(path, save_interval)
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+                aggregates.counts = data.get("counts", {})
+                aggregates.durations = {k: QuantileSketch.from_dict(v) for k, v in data.get("durations", {}).items()}
+                aggregates.booked = data.get("booked", {})
+                aggregates.trips = data.get("trips", {})
+            except Exception as e:
+                print(f"⚠️ Aggregate aus {path} nicht lesbar, beginne neu: {e}")
+        return aggregates
+
+    # --- Fortschreiben ---
+
+    def add_reservation_event(self, timestamp, event_type, duration_seconds, available_bikes_before):
+        # timestamp: datetime des Ereignisses
+        key = _key(timestamp.hour, available_bikes_before, event_type)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        sketch_key = _key(event_type, timestamp.hour)
+        if sketch_key not in self.durations:
+            self.durations[sketch_key] = QuantileSketch()
+        self.durations[sketch_key].add(duration_seconds)
+        self.maybe_save()
+
+    def add_booked_bikes(self, timestamp, booked_bikes):
+        if booked_bikes is None:
+            return
+        slot = (timestamp.hour * 60 + timestamp.minute) // SLOT_MINUTES
+        key = _key(timestamp.weekday(), slot)
+        entry = self.booked.setdefault(key, [0, 0])
+        entry[0] += 1
+        entry[1] += booked_bikes
+        self.maybe_save()
+
+    def add_trip(self, rental_time, movement_type):
+        key = _key(rental_time.hour, movement_type)
+        self.trips[key] = self.trips.get(key, 0) + 1
+        self.maybe_save()
+
+    def maybe_save(self):
+        if time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    def save(self):
+        self._last_save = time.monotonic()
+        data = {
+            "counts": self.counts,
+            "durations": {k: v.to_dict() for k, v in self.durations.items()},
+            "booked": self.booked,
+            "trips": self.trips,
+        }
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with atomic_write(self.path) as f:
+                json.dump(data, f, separators=(",", ":"))
+        except Exception as e:
+            print(f"❌ Fehler beim Speichern der Aggregate: {e}")
+
+    # --- Auswerten ---
+
+    def hourly_counts(self, event_type=None):
+        result = {}
+        for key, count in self.counts.items():
+            hour, before, kind = key.split("|", 2)
+            if event_type is None or kind == event_type:
+                result[(int(hour), int(before), kind)] = count
+        return result
+
+    def success_rates(self):
+        # Anteil booked:bike_taken an allen beendeten Reservierungen je available_bikes_before
+        taken = {}
+        total = {}
+        for (hour, before, kind), count in self.hourly_counts().items():
+            if not kind.startswith("booked:"):
+                continue
+            total[before] = total.get(before, 0) + count
+            if kind == "booked:bike_taken":
+                taken[before] = taken.get(before, 0) + count
+        return {before: taken.get(before, 0) / total[before] for before in sorted(total)}
+
+    def duration_sketch(self, event_type, hour=None):
+        sketch = QuantileSketch()
+        for key, part in self.durations.items():
+            kind, part_hour = key.rsplit("|", 1)
+            if kind == event_type and (hour is None or int(part_hour) == hour):
+                sketch.merge(part)
+        return sketch
+
+    def duration_summary(self, event_type, hour=None, quantiles=(0.5, 0.9, 0.99)):
+        sketch = self.duration_sketch(event_type, hour)
+        summary = {"count": sketch.count, "mean": sketch.mean, "min": sketch.min, "max": sketch.max}
+        for q in quantiles:
+            summary[f"p{round(q * 100)}"] = sketch.quantile(q)
+        return summary
+
+    def booked_curve(self, weekend=None):
+        # Mittlere booked_bikes je Viertelstunde; weekend=True/False filtert Sa+So bzw. Mo-Fr
+        sums = {}
+        for key, (count, total) in self.booked.items():
+            weekday, slot = (int(p) for p in key.split("|"))
+            if weekend is not None and (weekday >= 5) != weekend:
+                continue
+            entry = sums.setdefault(slot, [0, 0])
+            entry[0] += count
+            entry[1] += total
+        return {slot: total / count for slot, (count, total) in sorted(sums.items())}
+
+    def trip_counts(self):
+        result = {}
+        for key, count in self.trips.items():
+            hour, movement_type = key.split("|", 1)
+            result[(int(hour), movement_type)] = count
+        return result
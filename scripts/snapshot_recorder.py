@@ -0,0 +1,86 @@
+import glob
+import gzip
+import json
+import os
+import time
+
+import feed_decoder
+import nextbike_feed
+
+# Rohdaten-Aufzeichnung: ein gzip-komprimiertes JSON-Lines-File pro Stunde
+RECORD_DIR = "recordings"
+
+
+def record_path(fetched_at, directory=RECORD_DIR):
+    local = time.localtime(fetched_at)
+    return os.path.join(directory, time.strftime("%Y-%m-%d", local), time.strftime("%H", local) + ".jsonl.gz")
+
+
+def write_snapshot(snapshot, directory=RECORD_DIR, unchanged=False):
+    """
+    Hängt einen Snapshot als eigenes gzip-Member an die Stundendatei an.
+    Unveränderte Snapshots (HTTP 304) werden nur mit Zeitstempel vermerkt.
+    """
+    path = record_path(snapshot.fetched_at, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    record = {"fetched_at": snapshot.fetched_at}
+    if unchanged:
+        record["unchanged"] = True
+    else:
+        record["data"] = snapshot.data
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+def recorded_files(paths):
+    # Dateien und Verzeichnisse zu einer chronologisch sortierten Dateiliste auflösen
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "**", "*.jsonl.gz"), recursive=True))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def read_snapshots(paths, city_id=nextbike_feed.CITY_ID):
+    """
+    Liefert aufgezeichnete Snapshots in zeitlicher Reihenfolge, mit dem Abrufzeitpunkt der Aufnahme.
+    Eine abgebrochene letzte Zeile (Absturz während des Schreibens) wird übersprungen.
+    """
+    previous = None
+    for path in recorded_files(paths):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    try:
+                        record = feed_decoder.loads(line)
+                    except ValueError:
+                        print(f"⚠️ Unvollständige Zeile in {path} übersprungen")
+                        continue
+                    if record.get("unchanged") and previous is not None:
+                        previous = previous.refreshed(record["fetched_at"])
+                    elif "data" in record:
+                        previous = nextbike_feed.Snapshot(record["data"], record["fetched_at"], city_id)
+                    else:
+                        continue
+                    yield previous
+            except EOFError:
+                print(f"⚠️ {path} endet unvollständig")
+
+
+def record(subscription=None, directory=RECORD_DIR):
+    if subscription is None:
+        subscription = nextbike_feed.local_subscription()
+
+    print(f"🎙️ Zeichne Snapshots auf nach {directory}/")
+    last = None
+    while True:
+        snapshot = subscription.get()
+        unchanged = last is not None and snapshot.fingerprints is last.fingerprints
+        write_snapshot(snapshot, directory, unchanged)
+        last = snapshot
+
+
+if __name__ == "__main__":
+    record()
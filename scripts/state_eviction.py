@@ -0,0 +1,42 @@
+class Evictor:
+    """
+    Begrenzt ein Zustands-Dict über die Laufzeit: Einträge, die seit ttl Sekunden nicht mehr
+    als aktiv gemeldet wurden (z.B. Fahrrad oder Platz fehlt im Feed), werden entfernt.
+    Mit max_entries werden bei Überschreitung zusätzlich die am längsten inaktiven Einträge
+    entfernt (LRU nach letzter Aktivität). Aktive Einträge werden nie entfernt.
+
+    Gedacht für einen periodischen sweep (z.B. einmal pro Minute), nicht für jede Abfrage.
+    """
+
+    def __init__(self, name, ttl, max_entries=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.inactive_since = {}  # Schlüssel -> Zeitpunkt, ab dem der Eintrag inaktiv ist
+        self.evicted = 0          # Insgesamt entfernte Einträge
+
+    def sweep(self, entries, is_active, now):
+        """
+        entries: das zu begrenzende Dict (wird direkt verändert)
+        is_active(key, value): True, solange der Eintrag gebraucht wird
+        Rückgabe: Liste der entfernten Schlüssel
+        """
+        inactive = {}
+        for key, value in entries.items():
+            if is_active(key, value):
+                continue
+            inactive[key] = self.inactive_since.get(key, now)
+        # Wieder aktive oder anderweitig gelöschte Schlüssel vergessen
+        self.inactive_since = inactive
+
+        expired = [key for key, since in inactive.items() if now - since > self.ttl]
+        if self.max_entries is not None and len(entries) - len(expired) > self.max_entries:
+            remaining = sorted((item for item in inactive.items() if now - item[1] <= self.ttl), key=lambda item: item[1])
+            excess = len(entries) - len(expired) - self.max_entries
+            expired.extend(key for key, _ in remaining[:excess])
+
+        for key in expired:
+            del entries[key]
+            del inactive[key]
+        self.evicted += len(expired)
+        return expired
@@ -1,13 +1,29 @@
-import requests
-import csv
-import time
-import threading
+import atexit
 from datetime import datetime
 import os
 
-API_URL = "https://api.nextbike.net/maps/nextbike-live.json?city=362"
+import columnar_sink
+import event_sink
+import instrumentation
+import nextbike_feed
+from deadline_queue import DeadlineQueue
+from rolling_aggregates import RollingAggregates
+from state_eviction import Evictor
+
 CSV_FILE = "results_station_reservation/station_reservations.csv"
+PARQUET_DIR = "results_station_reservation/station_reservations_parquet"
+CSV_OUTPUT = True      # Bisherige CSV-Ausgabe
+PARQUET_OUTPUT = True  # Zusätzlich nach Tag partitioniertes Parquet (nur mit pyarrow)
+AGGREGATES_FILE = "results_station_reservation/aggregates.json"  # Laufende Stunden-/Dauer-Aggregate
 POLL_INTERVAL = 5  # Sekunden
+DELAYED_LOG_DELAY = 10  # Sekunden bis zur Bestätigung von "not_booked:bike_taken"
+
+# Speicherbegrenzung (Sekunden): Duplikat-Sperren laufen nach LOGGED_EVENT_TTL ab,
+# Zustände von Stationen, die so lange nicht mehr im Feed sind, nach STATION_STATE_TTL
+EVICTION_INTERVAL = 60
+LOGGED_EVENT_TTL = 3600
+LOGGED_EVENT_MAX = 100000
+STATION_STATE_TTL = 86400
 
 os.makedirs("results_station_reservation", exist_ok=True)
 
@@ -18,55 +34,104 @@ CSV_HEADER = [
     "bikes_available_to_rent", "bike_racks", "free_racks", "special_racks"
 ]
 
-def get_station_data():
-    resp = requests.get(API_URL)
-    resp.raise_for_status()
-    data = resp.json()
-    stations = []
-    for place in data['countries'][0]['cities'][0]['places']:
-        if not place.get("bike", False):
-            stations.append({
-                "name": place.get("name"),
-                "booked_bikes": place.get("booked_bikes", 0),
-                "bikes": place.get("bikes", 0),
-                "bikes_available_to_rent": place.get("bikes_available_to_rent", 0),
-                "bike_racks": place.get("bike_racks", 0),
-                "free_racks": place.get("free_racks", 0),
-                "special_racks": place.get("special_racks", 0),
-                "bike_list": [b["number"] for b in place.get("bike_list", [])]
-            })
-    return stations
-
-def delayed_log(log_row, name, bike_number, bikes_before, bikes_after, last_logged_event):
-    time.sleep(10)
-    stations = get_station_data()
-    for s in stations:
-        if s["name"] == name:
-            # Nur loggen, wenn das Bike wirklich weg ist UND die Anzahl gesunken ist
-            if bike_number not in s["bike_list"] and s["bikes"] < bikes_before:
-                # Duplikate verhindern
-                if last_logged_event.get((name, bike_number)) != log_row:
-                    with open(CSV_FILE, "a", newline="") as f:
-                        writer = csv.writer(f)
-                        writer.writerow(log_row)
-                    last_logged_event[(name, bike_number)] = log_row
-            break
-
-def main():
+# Spaltentypen für die Parquet-Ausgabe (Namen wie im CSV-Header)
+def parquet_columns():
+    pa = columnar_sink.pa
+    return [
+        ("timestamp", pa.timestamp("s")), ("station_name", columnar_sink.category()),
+        ("event_type", columnar_sink.category()), ("duration_seconds", pa.int32()),
+        ("booked_bikes_entry", pa.int16()), ("booked_bikes_exit", pa.int16()),
+        ("available_bikes_before", pa.int16()), ("available_bikes_after", pa.int16()),
+        ("bikes_available_to_rent", pa.int16()), ("bike_racks", pa.int16()),
+        ("free_racks", pa.int16()), ("special_racks", pa.int16())
+    ]
+
+parquet_sink = None
+aggregates = None
+
+def open_parquet_sink():
+    global parquet_sink
+    if not PARQUET_OUTPUT or parquet_sink is not None:
+        return
+    if not columnar_sink.available():
+        print("⚠️ pyarrow nicht installiert - Parquet-Ausgabe deaktiviert")
+        return
+    parquet_sink = columnar_sink.ParquetSink(PARQUET_DIR, parquet_columns(), "timestamp")
+
+# Ein Ereignis in alle aktiven Ausgaben schreiben und die Aggregate fortschreiben
+def log_event(log_row):
+    started = instrumentation.start()
+    if CSV_OUTPUT:
+        # Geschrieben wird im gemeinsamen Schreib-Thread
+        event_sink.shared_sink().write_row(CSV_FILE, log_row)
+    timestamp = datetime.fromisoformat(log_row[0])
+    if parquet_sink is not None:
+        parquet_sink.write([timestamp] + log_row[1:])
+    if aggregates is not None:
+        aggregates.add_reservation_event(timestamp, log_row[2], log_row[3], log_row[6])
+    instrumentation.stop("reservations.persist", started)
+
+def station_record(place):
+    return {
+        "name": place.get("name"),
+        "booked_bikes": place.get("booked_bikes", 0),
+        "bikes": place.get("bikes", 0),
+        "bikes_available_to_rent": place.get("bikes_available_to_rent", 0),
+        "bike_racks": place.get("bike_racks", 0),
+        "free_racks": place.get("free_racks", 0),
+        "special_racks": place.get("special_racks", 0),
+        "bike_list": [b["number"] for b in place.get("bike_list", [])]
+    }
+
+def get_station_data(snapshot, previous=None):
+    # Mit previous: nur Stationen, die sich seit dem letzten verarbeiteten Snapshot geändert haben
+    places = snapshot.changed_places(previous)
+    return [station_record(place) for place in places if not place.get("bike", False)]
+
+def delayed_log(log_row, name, bike_number, bikes_before, bikes_after, last_logged_event, snapshot):
+    # Station im ersten Snapshot nach Ablauf der Wartezeit direkt über den Namensindex finden
+    place = snapshot.station_index.get(name)
+    if place is not None:
+        s = station_record(place)
+        # Nur loggen, wenn das Bike wirklich weg ist UND die Anzahl gesunken ist
+        if bike_number not in s["bike_list"] and s["bikes"] < bikes_before:
+            # Duplikate verhindern
+            if last_logged_event.get((name, bike_number)) != log_row:
+                log_event(log_row)
+                last_logged_event[(name, bike_number)] = log_row
+
+def main(subscription=None):
+    global aggregates
+    if subscription is None:
+        subscription = nextbike_feed.local_subscription(POLL_INTERVAL)
+
     last_state = {}
     last_logged_event = {}
-
-    # Schreibe Header, falls Datei nicht existiert
-    try:
-        with open(CSV_FILE, "x", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(CSV_HEADER)
-    except FileExistsError:
-        pass
+    last_snapshot = None
+    delayed_checks = DeadlineQueue()
+    logged_event_evictor = Evictor("last_logged_event", LOGGED_EVENT_TTL, LOGGED_EVENT_MAX)
+    station_state_evictor = Evictor("last_state", STATION_STATE_TTL)
+    last_eviction = 0
+
+    # Schreibe Header, falls Datei nicht existiert (oder die erste Zeile keinen Header enthält)
+    event_sink.ensure_csv_header(CSV_FILE, CSV_HEADER)
+    open_parquet_sink()
+    if aggregates is None:
+        aggregates = RollingAggregates.load(AGGREGATES_FILE)
+        atexit.register(aggregates.save)
+    instrumentation.start_exporter()
 
     while True:
-        stations = get_station_data()
-        now = datetime.now().isoformat(timespec="seconds")
+        snapshot = subscription.get()
+        started = instrumentation.start()
+
+        # Fällige verzögerte Prüfungen gegen diesen Snapshot auswerten
+        for args in delayed_checks.pop_due(snapshot.fetched_at):
+            delayed_log(*args, last_logged_event, snapshot)
+
+        stations = get_station_data(snapshot, last_snapshot)
+        last_snapshot = snapshot
+        now = datetime.fromtimestamp(snapshot.fetched_at).isoformat(timespec="seconds")
 
         for s in stations:
             name = s["name"]
@@ -123,9 +188,7 @@ def main():
                                 avail, racks, free_racks, special_racks
                             ]
                             if last_logged_event.get((name, tuple(bike_taken))) != log_row:
-                                with open(CSV_FILE, "a", newline="") as f:
-                                    writer = csv.writer(f)
-                                    writer.writerow(log_row)
+                                log_event(log_row)
                                 last_logged_event[(name, tuple(bike_taken))] = log_row
                             booked_taken_bikes.update(bike_taken)
                         elif event_type == "booked:not_taken":
@@ -136,9 +199,7 @@ def main():
                                 avail, racks, free_racks, special_racks
                             ]
                             if last_logged_event.get((name, "not_taken")) != log_row:
-                                with open(CSV_FILE, "a", newline="") as f:
-                                    writer = csv.writer(f)
-                                    writer.writerow(log_row)
+                                log_event(log_row)
                                 last_logged_event[(name, "not_taken")] = log_row
 
             # --- NEU: Bike verschwindet ohne Booking ---
@@ -154,10 +215,10 @@ def main():
                             0, 0, available_bikes_before, available_bikes_after,
                             avail, racks, free_racks, special_racks
                         ]
-                        threading.Thread(
-                            target=delayed_log,
-                            args=(log_row, name, bike_number, available_bikes_before, available_bikes_after, last_logged_event)
-                        ).start()
+                        delayed_checks.push(
+                            snapshot.fetched_at + DELAYED_LOG_DELAY,
+                            (log_row, name, bike_number, available_bikes_before, available_bikes_after)
+                        )
                 # Nach dem Loggen zurücksetzen
                 booked_taken_bikes = set()
 
@@ -174,7 +235,20 @@ def main():
                 "booked_taken_bikes": booked_taken_bikes
             }
 
-        time.sleep(POLL_INTERVAL)
+        # Duplikat-Sperren und Zustände verschwundener Stationen begrenzen
+        if snapshot.fetched_at - last_eviction >= EVICTION_INTERVAL:
+            last_eviction = snapshot.fetched_at
+            evicted = len(logged_event_evictor.sweep(last_logged_event, lambda key, row: False, snapshot.fetched_at))
+            evicted += len(station_state_evictor.sweep(last_state, lambda name, state: name in snapshot.station_index, snapshot.fetched_at))
+            if evicted:
+                print(f"🧹 {evicted} veraltete Einträge entfernt (insgesamt: last_logged_event {logged_event_evictor.evicted}, "
+                      f"last_state {station_state_evictor.evicted})")
+
+        # Gepufferte Parquet-Zeilen auch in ruhigen Phasen spätestens nach dem Flush-Intervall schreiben
+        if parquet_sink is not None:
+            parquet_sink.flush_if_due()
+
+        instrumentation.stop("reservations.detect", started)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,87 @@
+import time
+
+import instrumentation
+
+SKIP = "skip"          # Verpasste Takte auslassen und am nächsten regulären Takt weitermachen
+CATCH_UP = "catch_up"  # Verpasste Takte sofort nacheinander nachholen (höchstens max_catch_up)
+
+
+class Tick:
+    __slots__ = ("index", "scheduled", "lag", "missed")
+
+    def __init__(self, index, scheduled, lag, missed):
+        self.index = index          # Laufende Nummer des Takts seit dem Start
+        self.scheduled = scheduled  # Geplanter Zeitpunkt (Sekunden seit Epoche)
+        self.lag = lag              # Verspätung gegenüber der Frist in Sekunden
+        self.missed = missed        # Bisher insgesamt ausgelassene Takte
+
+
+class Ticker:
+    """
+    Fester Takt auf Basis monotoner Fristen: Takt k ist fällig bei start + k * interval,
+    unabhängig davon, wie lange die Arbeit zwischen zwei Takten gedauert hat.
+    Dauert ein Durchlauf länger als interval (Überlauf), entscheidet policy, ob die
+    verpassten Takte ausgelassen (SKIP) oder nachgeholt werden (CATCH_UP).
+
+    Nutzung:
+        ticker = Ticker(10, name="weather")
+        while True:
+            tick = ticker.wait()
+            ... tick.scheduled (geplanter Zeitpunkt als time.time()) zum Stempeln ...
+    """
+
+    def __init__(self, interval, policy=SKIP, name=None, max_catch_up=3, first_immediately=True):
+        if policy not in (SKIP, CATCH_UP):
+            raise ValueError(f"Unbekannte Policy: {policy}")
+        self.interval = interval
+        self.policy = policy
+        self.name = name  # Präfix für Instrumentierung und Meldungen (None = still)
+        self.max_catch_up = max_catch_up
+        # Wanduhr-Anker einmal festhalten: geplante Zeitstempel driften nicht mit time.time()-Sprüngen
+        self._start = time.monotonic()
+        self._wall_start = time.time()
+        self._index = 0 if first_immediately else 1
+        self.ticks = 0
+        self.missed = 0
+        self.overruns = 0
+
+    def deadline(self, index):
+        return self._start + index * self.interval
+
+    def wait(self):
+        """
+        Blockiert bis zum nächsten fälligen Takt und gibt ihn zurück.
+        """
+        now = time.monotonic()
+        due = self.deadline(self._index)
+        if now < due:
+            time.sleep(due - now)
+            now = time.monotonic()
+        else:
+            behind = int((now - due) // self.interval)
+            if behind:
+                self.overruns += 1
+                if self.policy == SKIP:
+                    skipped = behind
+                else:
+                    # Nachholen nur begrenzt, ältere Takte verfallen
+                    skipped = max(0, behind - self.max_catch_up)
+                if skipped:
+                    self.missed += skipped
+                    self._index += skipped
+                    due = self.deadline(self._index)
+                    if self.name:
+                        print(f"⚠️ {self.name}: {skipped} Takt(e) verpasst")
+
+        tick = Tick(self._index, self._wall_start + self._index * self.interval, now - due, self.missed)
+        if self.name:
+            instrumentation.observe(f"{self.name}.poll_lag", tick.lag)
+        self._index += 1
+        self.ticks += 1
+        return tick
+
+    def reset(self):
+        # Neu verankern (z.B. nach einer Fehlerpause), ohne die Pause als verpasste Takte zu zählen
+        self._start = time.monotonic()
+        self._wall_start = time.time()
+        self._index = 0
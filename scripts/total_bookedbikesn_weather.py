@@ -1,28 +1,57 @@
+import atexit
 import os
 import json
-import requests
 import time
 from datetime import datetime
 
-def save_data_to_json(nextbike_data, weather_data, weather_20_data, filename='results_total_bikes/nextbike_weather_data.json'):
+import instrumentation
+import nextbike_feed
+from atomic_file import atomic_write
+from concurrent_fetch import ConcurrentFetcher
+from rolling_aggregates import RollingAggregates
+from ticker import Ticker
+
+# Speicherorte
+JSON_FILE = 'results_total_bikes/nextbike_weather_data.json'    # Altes Format: ein JSON-Array
+JSONL_FILE = 'results_total_bikes/nextbike_weather_data.jsonl'  # Append-only: ein Eintrag pro Zeile
+AGGREGATES_FILE = 'results_total_bikes/aggregates.json'         # booked_bikes je Wochentag und Viertelstunde
+
+# Abtastung: ein Eintrag alle SAMPLE_INTERVAL Sekunden, gestempelt mit dem geplanten Zeitpunkt
+SAMPLE_INTERVAL = 10  # Sekunden
+
+# Wetterquellen mit eigener Frist (Sekunden), werden gleichzeitig abgerufen
+WEATHER_SOURCES = {
+    "weather": ("https://wttr.in/Berlin?format=j1", 8),
+    "weather_20": ("https://api.open-meteo.com/v1/forecast?latitude=52.52&longitude=13.41&current=temperature_2m,wind_speed_10m,precipitation&timezone=Europe%2FBerlin", 5),
+}
+
+# True: jeder Eintrag wird nur angehängt (O(1)), statt die komplette Datei neu zu schreiben
+APPEND_ONLY = True
+
+aggregates = None  # RollingAggregates, einmal pro Prozess geladen (auch über Neustarts von collect_data)
+
+def build_entry(nextbike_data, weather_data, weather_20_data, timestamp=None):
+    country = nextbike_data.get('countries', [{}])[0]
+    current_weather = weather_data.get('current_condition', [{}])[0]
+    
+    # Wetter 2.0 aktuelle Werte extrahieren
+    weather_20_current = weather_20_data.get('current', {}) if weather_20_data else {}
+
+    return {
+        'timestamp': timestamp or datetime.now().isoformat(),
+        'booked_bikes': country.get('booked_bikes'),
+        'set_point_bikes': country.get('set_point_bikes'), 
+        'available_bikes': country.get('available_bikes'),
+        'current_weather_condition': current_weather,
+        'weather_20_current': weather_20_current
+    }
+
+def save_data_to_json(nextbike_data, weather_data, weather_20_data, filename=JSON_FILE, timestamp=None):
     """
     Speichert Nextbike- und Wetterdaten einfach in JSON
     """
     try:
-        country = nextbike_data.get('countries', [{}])[0]
-        current_weather = weather_data.get('current_condition', [{}])[0]
-        
-        # Wetter 2.0 aktuelle Werte extrahieren
-        weather_20_current = weather_20_data.get('current', {}) if weather_20_data else {}
-
-        entry = {
-            'timestamp': datetime.now().isoformat(),
-            'booked_bikes': country.get('booked_bikes'),
-            'set_point_bikes': country.get('set_point_bikes'), 
-            'available_bikes': country.get('available_bikes'),
-            'current_weather_condition': current_weather,
-            'weather_20_current': weather_20_current
-        }
+        entry = build_entry(nextbike_data, weather_data, weather_20_data, timestamp)
         
         try:
             if os.path.exists(filename):
@@ -38,7 +67,8 @@ def save_data_to_json(nextbike_data, weather_data, weather_20_data, filename='re
         
         try:
             os.makedirs(os.path.dirname(filename), exist_ok=True)
-            with open(filename, 'w') as f:
+            # Atomar ersetzen: Leser und Sicherungen sehen nie eine halb geschriebene Datei
+            with atomic_write(filename) as f:
                 json.dump(data, f, indent=2)
         except Exception as e:
             print(f"❌ Fehler beim Speichern: {e}")
@@ -51,60 +81,110 @@ def save_data_to_json(nextbike_data, weather_data, weather_20_data, filename='re
         print(f"❌ Fehler in save_data_to_json: {e}")
         return False
 
-def collect_data():
+def append_data_to_jsonl(nextbike_data, weather_data, weather_20_data, filename=JSONL_FILE, timestamp=None):
+    """
+    Hängt einen Eintrag als einzelne JSON-Zeile an (JSON Lines), ohne die bisherige Historie zu lesen
+    """
+    try:
+        entry = build_entry(nextbike_data, weather_data, weather_20_data, timestamp)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'a') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        
+        print(f"✅ Gespeichert: {entry.get('available_bikes')} verfügbare Bikes, {entry.get('booked_bikes')} gebucht")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Fehler in append_data_to_jsonl: {e}")
+        return False
+
+def load_weather_data(json_file=JSON_FILE, jsonl_file=JSONL_FILE):
+    """
+    Liest alle Einträge als Liste von Dicts (wie das frühere JSON-Array),
+    zuerst aus dem alten JSON-Array, danach aus der JSON-Lines-Datei.
+    Eine abgebrochene letzte Zeile (z.B. nach einem Absturz) wird übersprungen.
+    """
+    data = []
+    if json_file and os.path.exists(json_file):
+        with open(json_file, 'r') as f:
+            data.extend(json.load(f))
+    if jsonl_file and os.path.exists(jsonl_file):
+        with open(jsonl_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    data.append(json.loads(line))
+                except ValueError:
+                    print(f"⚠️ Unvollständige Zeile in {jsonl_file} übersprungen")
+    return data
+
+def collect_data(subscription=None):
     """
     Sammelt alle 10 Sekunden Nextbike- und Wetterdaten
     """
-    nextbike_url = "https://api.nextbike.net/maps/nextbike-live.json?city=362"
-    weather_url = "https://wttr.in/Berlin?format=j1"
-    weather_20 = "https://api.open-meteo.com/v1/forecast?latitude=52.52&longitude=13.41&current=temperature_2m,wind_speed_10m,precipitation&timezone=Europe%2FBerlin"
+    global aggregates
+    if subscription is None:
+        subscription = nextbike_feed.local_subscription(SAMPLE_INTERVAL)
+
+    fetcher = ConcurrentFetcher(WEATHER_SOURCES)
+    if aggregates is None:
+        aggregates = RollingAggregates.load(AGGREGATES_FILE)
+        atexit.register(aggregates.save)
+    instrumentation.start_exporter()
 
     print("🚀 Starte Datensammlung...")
     print("Drücke Ctrl+C zum Beenden")
     
+    # Fester Takt; verpasste Takte werden übersprungen statt aufgeholt
+    ticker = Ticker(SAMPLE_INTERVAL, name="weather")
     while True:
         nextbike_data = {}
-        weather_data = {}
-        weather_20_data = {}
         try:
+            # Eintrag mit dem geplanten Takt stempeln, nicht mit dem Ende der Abrufe
+            tick = ticker.wait().scheduled
+            timestamp = datetime.fromtimestamp(tick).isoformat()
+
+            print("🌤️ Rufe Wetterdaten ab...")
+            pending = fetcher.start()
+
             try:
-                print("📡 Rufe Nextbike-Daten ab...")
-                nextbike_response = requests.get(nextbike_url, timeout=10)
-                nextbike_data = nextbike_response.json()
+                print("📡 Hole Nextbike-Daten vom Snapshot-Bus...")
+                with instrumentation.timed("weather.snapshot_wait"):
+                    nextbike_data = subscription.get(timeout=nextbike_feed.REQUEST_TIMEOUT).data
             except Exception as e:
                 print(f"🌐 Fehler beim Abrufen der Nextbike-Daten: {e}")
-            
-            try:
-                print("🌤️ Rufe Wetterdaten ab...")
-                weather_response = requests.get(weather_url, timeout=10)
-                weather_data = weather_response.json()
-            except Exception as e:
-                print(f"🌐 Fehler beim Abrufen der Wetterdaten: {e}")
 
-            try:
-                print("🌦️ Rufe Wetter 2.0 Daten ab...")
-                weather_20_response = requests.get(weather_20, timeout=10)
-                weather_20_data = weather_20_response.json()
-            except Exception as e:
-                print(f"🌐 Fehler beim Abrufen der Wetter 2.0 Daten: {e}")
+            with instrumentation.timed("weather.fetch"):
+                weather = fetcher.collect(pending)
             
+            persist_started = instrumentation.start()
             try:
-                save_data_to_json(nextbike_data, weather_data, weather_20_data)
+                if APPEND_ONLY:
+                    append_data_to_jsonl(nextbike_data, weather["weather"], weather["weather_20"], timestamp=timestamp)
+                else:
+                    save_data_to_json(nextbike_data, weather["weather"], weather["weather_20"], timestamp=timestamp)
             except Exception as e:
                 print(f"❌ Fehler beim Speichern der Daten: {e}")
+
+            if nextbike_data:
+                aggregates.add_booked_bikes(datetime.fromtimestamp(tick), nextbike_data.get('countries', [{}])[0].get('booked_bikes'))
+            instrumentation.stop("weather.persist", persist_started)
             
-            print(f"⏱️ Warte 10 Sekunden...")
+            print(f"⏱️ Warte bis zum nächsten Takt...")
             print("-" * 50)
-            time.sleep(10)
             
         except KeyboardInterrupt:
             print("\n🛑 Datensammlung beendet.")
-            print(f"📁 Daten gespeichert in: nextbike_weather_data.json")
+            print(f"📁 Daten gespeichert in: {JSONL_FILE if APPEND_ONLY else JSON_FILE}")
+            fetcher.close()
             break
         except Exception as e:
             print(f"❌ Unerwarteter Fehler in collect_data: {e}")
             print("⏱️ Warte 5 Sekunden und mache weiter...")
             time.sleep(5)
+            ticker.reset()
 
 if __name__ == "__main__":
     collect_data()
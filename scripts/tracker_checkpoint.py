@@ -0,0 +1,119 @@
+import glob
+import os
+import pickle
+import time
+
+from atomic_file import atomic_write
+
+# Konfiguration
+CHECKPOINT_DIR = "results_trips/checkpoint"
+SNAPSHOT_INTERVAL = 300  # Sekunden zwischen zwei vollständigen Binär-Snapshots
+
+
+class TrackerCheckpoint:
+    """
+    Sichert den Tracker-Zustand als kompakten Binär-Snapshot (pickle) in festem Intervall
+    und hängt dazwischen pro Abfrage nur die geänderten Einträge als Delta an.
+
+    Dateien pro Generation g:
+        state-g.pkl   vollständiger Zustand
+        deltas-g.log  Folge von pickle-Frames mit Änderungen seit state-g.pkl
+    Eine neue Generation wird erst nach dem atomaren Schreiben ihres Snapshots aktiv,
+    ältere Dateien werden danach gelöscht.
+    """
+
+    def __init__(self, directory=CHECKPOINT_DIR, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.generation = 0
+        self.last_snapshot_time = None
+        self._dirty = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, kind, generation):
+        extension = "pkl" if kind == "state" else "log"
+        return os.path.join(self.directory, f"{kind}-{generation}.{extension}")
+
+    def touch(self, name, key):
+        # Eintrag key im Dict name wurde geändert, angelegt oder gelöscht
+        self._dirty.setdefault(name, set()).add(key)
+
+    def save(self, state, now=None):
+        """
+        state: Dict name -> Dict (getrackte Zustände) oder Set.
+        Schreibt je nach Intervall einen vollständigen Snapshot oder nur ein Delta.
+        """
+        now = now if now is not None else time.time()
+        if self.last_snapshot_time is None or now - self.last_snapshot_time >= self.snapshot_interval:
+            self.write_snapshot(state, now)
+        else:
+            self.append_delta(state, now)
+
+    def write_snapshot(self, state, now):
+        generation = self.generation + 1
+        path = self._path("state", generation)
+        with atomic_write(path, "wb") as f:
+            pickle.dump({"time": now, "generation": generation, "state": state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # Alte Generationen erst nach erfolgreichem Snapshot entfernen
+        for old in glob.glob(os.path.join(self.directory, "state-*.pkl")) + glob.glob(os.path.join(self.directory, "deltas-*.log")):
+            if old != path:
+                os.remove(old)
+
+        self.generation = generation
+        self.last_snapshot_time = now
+        self._dirty = {}
+
+    def append_delta(self, state, now):
+        delta = {"time": now, "set": {}, "del": {}, "sets": {}}
+        for name, keys in self._dirty.items():
+            values = state[name]
+            for key in keys:
+                if key in values:
+                    delta["set"].setdefault(name, {})[key] = values[key]
+                else:
+                    delta["del"].setdefault(name, []).append(key)
+        # Kleine Sets werden immer vollständig mitgeschrieben
+        for name, values in state.items():
+            if isinstance(values, set):
+                delta["sets"][name] = values
+
+        with open(self._path("deltas", self.generation), "ab") as f:
+            pickle.dump(delta, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._dirty = {}
+
+    def load(self):
+        """
+        Stellt den letzten Zustand wieder her: neuester Snapshot plus alle Deltas dieser Generation.
+        Rückgabe: (state, Zeitpunkt) oder (None, None), wenn kein Checkpoint existiert.
+        """
+        snapshots = glob.glob(os.path.join(self.directory, "state-*.pkl"))
+        if not snapshots:
+            return None, None
+        path = max(snapshots, key=lambda p: int(os.path.basename(p)[len("state-"):-len(".pkl")]))
+        with open(path, "rb") as f:
+            checkpoint = pickle.load(f)
+        state = checkpoint["state"]
+        restored_time = checkpoint["time"]
+
+        delta_path = self._path("deltas", checkpoint["generation"])
+        if os.path.exists(delta_path):
+            with open(delta_path, "rb") as f:
+                while True:
+                    try:
+                        delta = pickle.load(f)
+                    except EOFError:
+                        break
+                    except Exception:
+                        # Abgebrochener letzter Frame nach einem Absturz
+                        break
+                    for name, values in delta["set"].items():
+                        state[name].update(values)
+                    for name, keys in delta["del"].items():
+                        for key in keys:
+                            state[name].pop(key, None)
+                    state.update(delta["sets"])
+                    restored_time = delta["time"]
+
+        self.generation = checkpoint["generation"]
+        return state, restored_time
@@ -0,0 +1,192 @@
+"""
+Gemeinsame, vektorisierte Geo-Berechnungen für die Trip-Auswertung.
+
+Statt in jedem Notebook haversine_np neu zu definieren, pro Zeile geodesic aufzurufen
+und den Stations-KDTree neu aufzubauen:
+
+    import sys; sys.path.insert(0, "../../scripts")
+    import trip_geometry as tg
+
+    trips = tg.load_trips("DATA/TripAnalysis/nextbike_trips.csv")
+    stations = tg.load_stations()                 # Live-API, oder Pfad zu einem gespeicherten Snapshot
+    trips = tg.add_trip_distance(trips)           # Spalte Trip-Distance-m
+    trips = tg.snap_trips(trips, stations)        # nächste Station für Ausleihe und Rückgabe
+
+Alle Distanzen in Metern, Koordinaten wie im Trip-CSV als (lat, lng).
+"""
+import hashlib
+import json
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy ist optional, ohne wird blockweise per Brute-Force gesucht
+    cKDTree = None
+
+EARTH_RADIUS = 6371000  # Meter
+SNAP_CANDIDATES = 4     # Kandidaten aus dem KD-Tree, die exakt per Haversine nachgeprüft werden
+BRUTE_FORCE_BLOCK = 2_000_000  # max. Punkt-Stations-Paare pro Block ohne scipy
+
+TRIP_COORDINATE_COLUMNS = ['Rental-Lat', 'Rental-Lng', 'Return-Lat', 'Return-Lng']
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    # Großkreisdistanz in Metern, elementweise über beliebig geformte Arrays (Broadcasting)
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def load_trips(path, min_duration=2):
+    """
+    Trip-CSV laden und so bereinigen wie in den Notebooks:
+    keine "unbekannt"-Zeilen, Dauer > min_duration, Start != Ziel.
+    """
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    df = df.rename(columns={c: c.strip() for c in df.columns})
+    for column in TRIP_COORDINATE_COLUMNS + ['Duration-Minutes']:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+
+    # Nur Textspalten durchsuchen, spaltenweise statt zeilenweise per apply
+    unknown = np.zeros(len(df), dtype=bool)
+    for column in df.select_dtypes(include='object').columns:
+        unknown |= df[column].str.contains('unbekannt', case=False, na=False).to_numpy()
+
+    same_place = (df['Rental-Lat'] == df['Return-Lat']) & (df['Rental-Lng'] == df['Return-Lng'])
+    keep = ~unknown & (df['Duration-Minutes'] > min_duration) & ~same_place
+    return df.loc[keep].reset_index(drop=True)
+
+
+def add_trip_distance(df, column='Trip-Distance-m'):
+    # Luftlinie zwischen Ausleihe und Rückgabe für alle Trips auf einmal
+    df[column] = haversine(df['Rental-Lat'].to_numpy(), df['Rental-Lng'].to_numpy(),
+                           df['Return-Lat'].to_numpy(), df['Return-Lng'].to_numpy())
+    return df
+
+
+def stations_from_snapshot(data, city_id=None):
+    # Stationen (bike == False) aus Live-API-Daten; Rückgabe: (Namen, Array [[lat, lng], ...])
+    from nextbike_feed import CITY_ID, Snapshot
+
+    snapshot = Snapshot(data, city_id=city_id or CITY_ID)
+    names = []
+    coords = []
+    for name, place in snapshot.station_index.items():
+        if place.get('lat') is not None and place.get('lng') is not None:
+            names.append(name)
+            coords.append((place['lat'], place['lng']))
+    return names, np.array(coords, dtype=np.float64).reshape(-1, 2)
+
+
+def load_stations(source=None, city_id=None):
+    """
+    Stationen laden aus einem gespeicherten Snapshot (JSON-Datei), einer URL
+    oder ohne Angabe direkt aus der Live-API.
+    """
+    if source is None or source.startswith("http"):
+        import requests
+        from nextbike_feed import API_URL
+
+        data = requests.get(source or API_URL, timeout=30).json()
+    else:
+        with open(source, "r") as f:
+            data = json.load(f)
+    return stations_from_snapshot(data, city_id)
+
+
+class StationIndex:
+    """
+    Nächste-Station-Suche für viele Punkte auf einmal.
+
+    Die Stationen werden in ebene Meter-Koordinaten projiziert (lokal um den Mittelpunkt),
+    der KD-Tree liefert pro Punkt einige Kandidaten, die exakt per Haversine nachgeprüft werden.
+    Ohne scipy wird blockweise über alle Stationen gerechnet.
+    """
+
+    def __init__(self, names, coords):
+        self.names = np.asarray(names, dtype=object)
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        self.origin_lat = float(np.mean(self.coords[:, 0])) if len(self.coords) else 0.0
+        self.tree = cKDTree(self._project(self.coords)) if cKDTree is not None and len(self.coords) else None
+
+    def _project(self, coords):
+        scale = np.radians(1) * EARTH_RADIUS
+        return np.column_stack((coords[:, 1] * scale * np.cos(np.radians(self.origin_lat)),
+                                coords[:, 0] * scale))
+
+    def nearest(self, lat, lng):
+        """
+        lat, lng: Arrays gleicher Länge.
+        Rückgabe: (Index der nächsten Station, Distanz in Metern); -1 / NaN für fehlende Koordinaten.
+        """
+        points = np.column_stack((np.asarray(lat, dtype=np.float64), np.asarray(lng, dtype=np.float64)))
+        indexes = np.full(len(points), -1, dtype=np.int64)
+        distances = np.full(len(points), np.nan)
+        valid = ~np.isnan(points).any(axis=1)
+        if not len(self.coords) or not valid.any():
+            return indexes, distances
+
+        query = points[valid]
+        if self.tree is not None:
+            k = min(SNAP_CANDIDATES, len(self.coords))
+            _, candidates = self.tree.query(self._project(query), k=k)
+            candidates = candidates.reshape(len(query), k)
+            found, best = self._closest(query, candidates)
+        else:
+            found = np.empty(len(query), dtype=np.int64)
+            best = np.empty(len(query))
+            block = max(1, BRUTE_FORCE_BLOCK // len(self.coords))
+            all_candidates = np.arange(len(self.coords))
+            for start in range(0, len(query), block):
+                chunk = query[start:start + block]
+                found[start:start + block], best[start:start + block] = self._closest(
+                    chunk, np.broadcast_to(all_candidates, (len(chunk), len(self.coords))))
+
+        indexes[valid] = found
+        distances[valid] = best
+        return indexes, distances
+
+    def _closest(self, points, candidates):
+        # Exakte Haversine-Distanz zu allen Kandidaten, pro Zeile das Minimum
+        candidate_coords = self.coords[candidates]
+        dists = haversine(points[:, :1], points[:, 1:], candidate_coords[..., 0], candidate_coords[..., 1])
+        column = np.argmin(dists, axis=1)
+        rows = np.arange(len(points))
+        return candidates[rows, column], dists[rows, column]
+
+
+_index_cache = {}
+
+def station_index(names, coords):
+    # Gleiche Stationsliste -> derselbe Index, auch über mehrere Notebook-Zellen oder Aufrufe hinweg
+    coords = np.ascontiguousarray(coords, dtype=np.float64)
+    key = hashlib.sha1(coords.tobytes() + "\0".join(map(str, names)).encode("utf-8")).hexdigest()
+    if key not in _index_cache:
+        _index_cache[key] = StationIndex(names, coords)
+    return _index_cache[key]
+
+
+def snap_trips(df, stations, ends=("Rental", "Return")):
+    """
+    Ordnet Ausleih- und Rückgabepunkt jeweils der nächsten Station zu.
+    stations: (Namen, Koordinaten) wie von load_stations oder ein StationIndex.
+    Neue Spalten: <End>-Nearest-Station, <End>-Station-Distance-m
+    """
+    index = stations if isinstance(stations, StationIndex) else station_index(*stations)
+    for end in ends:
+        found, distances = index.nearest(df[f'{end}-Lat'].to_numpy(), df[f'{end}-Lng'].to_numpy())
+        names = np.full(len(found), None, dtype=object)
+        names[found >= 0] = index.names[found[found >= 0]]
+        df[f'{end}-Nearest-Station'] = names
+        df[f'{end}-Station-Distance-m'] = distances
+    return df
+
+
+def flow_counts(df, origin='Rental-Nearest-Station', destination='Return-Nearest-Station', min_count=1):
+    # Anzahl Trips pro (Start, Ziel)-Paar, absteigend sortiert; fehlende Zuordnungen fallen weg
+    flows = df.groupby([origin, destination]).size().reset_index(name='count')
+    flows = flows[flows['count'] >= min_count]
+    return flows.sort_values('count', ascending=False).reset_index(drop=True)
@@ -0,0 +1,140 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import backup_store
+from backup_store import BackupStore
+
+CHUNK = 16  # Kleine Blöcke, damit wenige Bytes mehrere Blöcke ergeben
+
+
+class BackupStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = mock.patch.object(backup_store, "CHUNK_SIZE", CHUNK)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = BackupStore(os.path.join(self.tmp.name, "store"), compression=None)
+        self.data_dir = os.path.join(self.tmp.name, "results")
+        os.makedirs(self.data_dir)
+
+    def write(self, name, content, mode="w"):
+        path = os.path.join(self.data_dir, name)
+        with open(path, mode, newline="") as f:
+            f.write(content)
+        return path
+
+    def restored(self, entry):
+        target = os.path.join(self.tmp.name, "restored", "file")
+        self.store.restore_file(entry, target)
+        with open(target, "r", newline="") as f:
+            return f.read()
+
+    # --- store_file ---
+
+    def test_unchanged_file_is_not_read(self):
+        path = self.write("a.json", '{"x": 1}')
+        entry, _, _ = self.store.store_file(path)
+        again, read, written = self.store.store_file(path, entry)
+        self.assertEqual((read, written), (0, 0))
+        self.assertEqual(again["chunks"], entry["chunks"])
+
+    def test_append_only_reuses_full_chunks(self):
+        lines = "".join(f"row-{i:05d}\n" for i in range(5))  # 50 Bytes: 3 volle Blöcke + Rest
+        path = self.write("trips.csv", lines)
+        first, read, _ = self.store.store_file(path)
+        self.assertEqual(read, 50)
+        self.assertEqual(len(first["chunks"]), 4)
+
+        appended = "".join(f"row-{i:05d}\n" for i in range(5, 8))
+        self.write("trips.csv", appended, mode="a")
+        second, read, _ = self.store.store_file(path, first)
+        # Gelesen: Stichprobe des letzten vollen Blocks plus alles ab Blockgrenze 48
+        self.assertEqual(read, CHUNK + (80 - 3 * CHUNK))
+        self.assertEqual(second["chunks"][:3], first["chunks"][:3])
+        self.assertEqual(self.restored(second), lines + appended)
+
+    def test_spot_check_mismatch_reads_everything(self):
+        lines = "".join(f"row-{i:05d}\n" for i in range(5))
+        path = self.write("trips.csv", lines)
+        first, _, _ = self.store.store_file(path)
+
+        # Datei wurde nicht nur angehängt, sondern im Bereich des letzten vollen Blocks verändert
+        changed = lines[:40] + "X" + lines[41:] + "row-00005\n"
+        self.write("trips.csv", changed)
+        second, read, _ = self.store.store_file(path, first)
+        self.assertEqual(read, CHUNK + len(changed))
+        self.assertNotEqual(second["chunks"][2], first["chunks"][2])
+        self.assertEqual(self.restored(second), changed)
+
+    def test_incomplete_last_line_is_left_for_next_backup(self):
+        path = self.write("events.csv", "a,b\nc,d\ne,")
+        entry, _, _ = self.store.store_file(path)
+        self.assertEqual(entry["size"], 8)
+        self.assertEqual(self.restored(entry), "a,b\nc,d\n")
+
+    # --- restore ---
+
+    def test_backup_restore_round_trip(self):
+        self.write("trips.csv", "".join(f"{i},{i * i}\n" for i in range(40)))
+        self.write("state.json", '{"bikes": [1, 2, 3]}' * 5)
+        os.makedirs(os.path.join(self.data_dir, "sub"))
+        self.write(os.path.join("sub", "empty.txt"), "")
+        name, stats = self.store.backup([self.data_dir])
+        self.assertEqual(stats["files"], 3)
+
+        target = os.path.join(self.tmp.name, "restore")
+        self.assertEqual(self.store.restore(name, target), 3)
+        for relative in ("trips.csv", "state.json", os.path.join("sub", "empty.txt")):
+            with open(os.path.join(self.data_dir, relative), "rb") as a, \
+                    open(os.path.join(target, "results", relative), "rb") as b:
+                self.assertEqual(a.read(), b.read())
+
+    def test_same_second_backups_do_not_overwrite(self):
+        self.write("a.csv", "1\n")
+        first, _ = self.store.backup([self.data_dir], name="2025-07-01_12-00-00")
+        self.write("a.csv", "2\n", mode="a")
+        second, _ = self.store.backup([self.data_dir], name="2025-07-01_12-00-00")
+        self.assertEqual(first, "2025-07-01_12-00-00")
+        self.assertEqual(second, "2025-07-01_12-00-00_01")
+        self.assertEqual(self.store.snapshots(), [first, second])
+        self.assertEqual(self.store.load_manifest(first)["files"]["results/a.csv"]["size"], 2)
+        self.assertEqual(self.store.load_manifest(second)["files"]["results/a.csv"]["size"], 4)
+
+    # --- prune ---
+
+    def test_prune_keep_last_and_daily(self):
+        names = [
+            "2025-06-01_10-00-00",              # außerhalb von keep_daily
+            "2025-06-28_08-00", "2025-06-28_20-00",  # ältere, minutengenaue Namen
+            "2025-06-29_09-00-00", "2025-06-29_18-00-00",
+            "2025-06-30_07-00-00", "2025-06-30_12-00-00", "2025-06-30_12-00-00_01",
+        ]
+        for i, name in enumerate(names):
+            self.write("log.txt", f"{name}\n" * (i + 1))
+            self.store.backup([self.data_dir], name=name)
+        self.store.backup([self.data_dir], name="manual")  # fremd benannt: bleibt immer
+
+        removed, deleted = self.store.prune(keep_last=2, keep_daily=3, now=datetime(2025, 7, 1, 0, 0))
+        self.assertEqual(self.store.snapshots(), [
+            "2025-06-28_20-00", "2025-06-29_18-00-00",
+            "2025-06-30_12-00-00", "2025-06-30_12-00-00_01", "manual",
+        ])
+        self.assertEqual(removed, ["2025-06-01_10-00-00", "2025-06-28_08-00", "2025-06-29_09-00-00", "2025-06-30_07-00-00"])
+        self.assertGreater(deleted, 0)
+
+        # Übrige Sicherungen sind nach dem Löschen unreferenzierter Blöcke vollständig
+        for name in self.store.snapshots():
+            for entry in self.store.load_manifest(name)["files"].values():
+                for digest in entry["chunks"]:
+                    self.assertIsNotNone(self.store._find_chunk(digest))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import glob
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import columnar_sink
+
+
+@unittest.skipUnless(columnar_sink.available(), "pyarrow nicht installiert")
+class ParquetSinkTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.clock = [1000.0]
+        patcher = mock.patch.object(columnar_sink.time, "monotonic", lambda: self.clock[0])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # atexit-Flush des Sinks im Test nicht registrieren
+        atexit_patcher = mock.patch.object(columnar_sink.atexit, "register")
+        atexit_patcher.start()
+        self.addCleanup(atexit_patcher.stop)
+        pa = columnar_sink.pa
+        self.sink = columnar_sink.ParquetSink(
+            self.tmp.name, [("timestamp", pa.timestamp("s")), ("type", columnar_sink.category()), ("count", pa.int64())],
+            "timestamp", batch_size=100, flush_interval=60)
+
+    def parts(self):
+        return glob.glob(os.path.join(self.tmp.name, "date=*", "*.parquet"))
+
+    def test_quiet_stream_flushes_after_interval(self):
+        for i in range(3):
+            self.sink.write([datetime(2025, 7, 1, 12, 0, i), "booked", i])
+        self.sink.flush_if_due()
+        self.assertEqual(self.parts(), [])
+
+        # Keine neuen Zeilen, aber das Intervall ist abgelaufen
+        self.clock[0] += 61
+        self.sink.flush_if_due()
+        parts = self.parts()
+        self.assertEqual(len(parts), 1)
+        self.assertIn("date=2025-07-01", parts[0])
+        self.assertEqual(columnar_sink.pq.read_table(parts[0]).column("count").to_pylist(), [0, 1, 2])
+
+    def test_nothing_written_without_rows(self):
+        self.clock[0] += 120
+        self.sink.flush_if_due()
+        self.assertEqual(self.parts(), [])
+
+    def test_batch_size_flushes_immediately(self):
+        for i in range(100):
+            self.sink.write([datetime(2025, 7, 1, 12, 0, 0), "booked", i])
+        self.assertEqual(len(self.parts()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from concurrent_fetch import ConcurrentFetcher, pooled_session
+
+SLOW_DELAY = 1.5  # Antwortzeit der langsamen Quelle (Sekunden)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/slow":
+            time.sleep(SLOW_DELAY)
+        if self.path == "/fail":
+            self.send_response(500)
+            self.end_headers()
+            return
+        body = json.dumps({"source": self.path.strip("/")}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ConcurrentFetcherTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        # Langsame Quelle zuerst, damit collect() zuerst auf sie wartet
+        self.fetcher = ConcurrentFetcher({
+            "slow": (f"{self.base}/slow", 0.5),
+            "fast": (f"{self.base}/fast", 2.0),
+            "fail": (f"{self.base}/fail", 2.0),
+        })
+
+    def tearDown(self):
+        self.fetcher.close()
+
+    def test_deadlines_and_errors_per_source(self):
+        output = io.StringIO()
+        started = time.monotonic()
+        with contextlib.redirect_stdout(output):
+            pending = self.fetcher.start()
+            # Die schnelle Quelle ist fertig, obwohl die langsame noch läuft
+            self.assertEqual(pending["fast"][0].result(timeout=0.4), {"source": "fast"})
+            self.assertFalse(pending["slow"][0].done())
+            results = self.fetcher.collect(pending)
+        elapsed = time.monotonic() - started
+
+        # Frist der langsamen Quelle (0.5 s) gilt, nicht ihre Antwortzeit
+        self.assertLess(elapsed, SLOW_DELAY - 0.5)
+        self.assertEqual(results, {"slow": {}, "fast": {"source": "fast"}, "fail": {}})
+
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(any(line.startswith("🌐 Fehler beim Abrufen von slow:") for line in lines))
+        self.assertTrue(any(line.startswith("🌐 Fehler beim Abrufen von fail:") and "500" in line for line in lines))
+
+    def test_busy_source_is_skipped(self):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.fetcher.collect(self.fetcher.start())
+            # Der erste Abruf der langsamen Quelle läuft noch: übersprungen statt aufgestaut
+            pending = self.fetcher.start()
+            self.assertIsNone(pending["slow"][0])
+            results = self.fetcher.collect(pending)
+        self.assertEqual(results["slow"], {})
+        self.assertEqual(results["fast"], {"source": "fast"})
+        self.assertIn("⏳ slow: vorheriger Abruf läuft noch, übersprungen", output.getvalue())
+
+
+class PooledSessionTest(unittest.TestCase):
+    def test_adapters_share_pool_size(self):
+        session = pooled_session(3)
+        try:
+            for prefix in ("http://", "https://"):
+                self.assertEqual(session.get_adapter(prefix)._pool_maxsize, 3)
+        finally:
+            session.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from deadline_queue import DeadlineQueue
+
+
+class DeadlineQueueTest(unittest.TestCase):
+    def test_pop_due_in_deadline_order(self):
+        q = DeadlineQueue()
+        q.push(30, "c")
+        q.push(10, "a")
+        q.push(20, "b")
+        q.push(10, "a2")  # Gleiche Frist: Einfügereihenfolge bleibt erhalten
+        self.assertEqual(q.next_deadline(), 10)
+        self.assertEqual(q.pop_due(5), [])
+        self.assertEqual(q.pop_due(20), ["a", "a2", "b"])
+        self.assertEqual(len(q), 1)
+        self.assertEqual(q.next_deadline(), 30)
+        self.assertEqual(q.pop_due(100), ["c"])
+        self.assertIsNone(q.next_deadline())
+
+    def test_cancel(self):
+        q = DeadlineQueue()
+        first = q.push(10, "a")
+        q.push(20, "b")
+        third = q.push(30, "c")
+        q.cancel(first)
+        q.cancel(third)
+        q.cancel(third)  # Doppelt absagen ist harmlos
+        self.assertEqual(len(q), 1)
+        self.assertEqual(q.next_deadline(), 20)
+        self.assertEqual(q.pop_due(100), ["b"])
+        self.assertEqual(len(q), 0)
+        self.assertIsNone(q.next_deadline())
+
+    def test_cancel_after_pop_is_ignored(self):
+        q = DeadlineQueue()
+        handle = q.push(10, "a")
+        self.assertEqual(q.pop_due(10), ["a"])
+        q.cancel(handle)
+        q.push(20, "b")
+        self.assertEqual(len(q), 1)
+        self.assertEqual(q.pop_due(20), ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
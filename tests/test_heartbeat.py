@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import heartbeat
+import nextbike_feed
+
+
+class StaleReasonTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        patcher = mock.patch.object(heartbeat, "HEARTBEAT_DIR", self.tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, **fields):
+        heartbeat.write_heartbeat("bus", timeout=60, consumer_timeout=300, **fields)
+        return heartbeat.read_heartbeat("bus")["time"]
+
+    def test_fresh_heartbeat(self):
+        written = self.write(consumers_idle={"trips": 0})
+        self.assertIsNone(heartbeat.stale_reason("bus", os.getpid(), now=written + 10))
+
+    def test_missing_heartbeat_after_timeout(self):
+        written = self.write(consumers_idle={})
+        self.assertIn("kein Heartbeat", heartbeat.stale_reason("bus", now=written + 61))
+
+    def test_other_pid_is_ignored(self):
+        written = self.write(consumers_idle={})
+        self.assertIsNone(heartbeat.stale_reason("bus", pid=-1, now=written + 1000))
+
+    def test_idle_consumer_is_stalled(self):
+        written = self.write(consumers_idle={"trips": 400, "weather": 1})
+        self.assertEqual(heartbeat.stale_reason("bus", now=written), "Konsumenten hängen: trips")
+
+    def test_consumer_in_backoff_is_not_stalled(self):
+        # Absturz mit Backoff länger als consumer_timeout: der Bus-Prozess darf nicht beendet werden
+        written = self.write(consumers_idle={"trips": 400, "weather": 1}, consumers_backing_off=["trips"])
+        self.assertIsNone(heartbeat.stale_reason("bus", now=written))
+
+    def test_bus_reports_backing_off_consumer(self):
+        bus = nextbike_feed.SnapshotBus(heartbeat="bus")
+        trips = bus.subscribe("trips")
+        bus.subscribe("weather")
+        trips.backing_off = True
+        bus.write_heartbeat(0.1, True)
+        self.assertEqual(heartbeat.read_heartbeat("bus")["consumers_backing_off"], ["trips"])
+
+
+class RunForeverBackoffTest(unittest.TestCase):
+    def test_subscription_backing_off_during_restart_delay(self):
+        bus = nextbike_feed.SnapshotBus()
+        subscription = bus.subscribe("trips")
+        seen = []
+
+        def crash(sub):
+            raise RuntimeError("kaputt")
+
+        def sleep(seconds):
+            seen.append((seconds, subscription.backing_off))
+            if len(seen) == 2:
+                raise KeyboardInterrupt  # Schleife nach zwei Neustarts beenden
+
+        with mock.patch.object(nextbike_feed.time, "sleep", sleep), mock.patch("builtins.print"):
+            with self.assertRaises(KeyboardInterrupt):
+                nextbike_feed.run_forever("trips", crash, subscription)
+        delay = nextbike_feed.RESTART_DELAY
+        self.assertEqual(seen, [(delay, True), (delay * 2, True)])
+        self.assertFalse(subscription.backing_off)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from state_eviction import Evictor
+
+
+class EvictorTest(unittest.TestCase):
+    def test_ttl_counts_from_first_inactive_sweep(self):
+        entries = {"a": 1, "b": 2}
+        active = {"a"}
+        evictor = Evictor("test", ttl=100)
+        self.assertEqual(evictor.sweep(entries, lambda key, _: key in active, now=0), [])
+        self.assertEqual(evictor.sweep(entries, lambda key, _: key in active, now=100), [])
+        self.assertEqual(evictor.sweep(entries, lambda key, _: key in active, now=101), ["b"])
+        self.assertEqual(entries, {"a": 1})
+        self.assertEqual(evictor.evicted, 1)
+
+    def test_reactivated_entry_restarts_ttl(self):
+        entries = {"a": 1}
+        evictor = Evictor("test", ttl=100)
+        evictor.sweep(entries, lambda key, _: False, now=0)
+        evictor.sweep(entries, lambda key, _: True, now=50)  # wieder aktiv
+        self.assertEqual(evictor.sweep(entries, lambda key, _: False, now=120), [])
+        self.assertEqual(evictor.sweep(entries, lambda key, _: False, now=221), ["a"])
+
+    def test_max_entries_evicts_longest_inactive_first(self):
+        entries = {"active": 0, "old": 1, "middle": 2, "new": 3}
+        evictor = Evictor("test", ttl=1000, max_entries=2)
+        evictor.sweep({"old": 1}, lambda key, _: False, now=0)
+        # Zwischen den Sweeps: Inaktivität je Schlüssel ab unterschiedlichen Zeitpunkten
+        evictor.inactive_since = {"old": 0, "middle": 10}
+        removed = evictor.sweep(entries, lambda key, _: key == "active", now=20)
+        self.assertEqual(removed, ["old", "middle"])
+        self.assertEqual(set(entries), {"active", "new"})
+
+    def test_active_entries_are_never_evicted(self):
+        entries = {key: key for key in range(5)}
+        evictor = Evictor("test", ttl=0, max_entries=1)
+        self.assertEqual(evictor.sweep(entries, lambda key, _: True, now=100), [])
+        self.assertEqual(len(entries), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
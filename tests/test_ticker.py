@@ -0,0 +1,77 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import ticker
+from ticker import CATCH_UP, SKIP, Ticker
+
+
+class FakeClock:
+    # Ersetzt time.monotonic/time.time/time.sleep: sleep rückt die Uhr nur vor
+    def __init__(self, start=1000.0):
+        self.now = start
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TickerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(ticker, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fixed_rate_without_drift(self):
+        t = Ticker(10)
+        scheduled = []
+        for _ in range(4):
+            tick = t.wait()
+            scheduled.append(tick.scheduled)
+            self.clock.now += 3  # Arbeit kürzer als das Intervall
+        self.assertEqual(scheduled, [1000, 1010, 1020, 1030])
+        self.assertEqual(t.missed, 0)
+
+    def test_skip_drops_missed_ticks(self):
+        t = Ticker(10, policy=SKIP)
+        t.wait()
+        self.clock.now += 35  # Überlauf: Takte 1, 2 und 3 sind fällig
+        tick = t.wait()
+        self.assertEqual(tick.index, 3)
+        self.assertEqual(tick.missed, 2)
+        self.assertAlmostEqual(tick.lag, 5)
+        self.assertEqual(t.overruns, 1)
+        # Danach wieder im regulären Takt
+        self.assertEqual(t.wait().scheduled, 1040)
+
+    def test_catch_up_replays_missed_ticks(self):
+        t = Ticker(10, policy=CATCH_UP, max_catch_up=3)
+        t.wait()
+        self.clock.now += 35
+        ticks = [t.wait() for _ in range(3)]
+        # Verpasste Takte kommen sofort nacheinander, ohne zu warten
+        self.assertEqual([tick.index for tick in ticks], [1, 2, 3])
+        self.assertEqual(self.clock.now, 1035)
+        self.assertEqual([round(tick.lag) for tick in ticks], [25, 15, 5])
+        self.assertEqual(t.missed, 0)
+
+    def test_catch_up_is_limited(self):
+        t = Ticker(10, policy=CATCH_UP, max_catch_up=2)
+        t.wait()
+        self.clock.now += 55  # Takte 1-5 überfällig: der jüngste plus 2 ältere werden nachgeholt
+        ticks = [t.wait() for _ in range(3)]
+        self.assertEqual([tick.index for tick in ticks], [3, 4, 5])
+        self.assertEqual(t.missed, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from tracker_checkpoint import TrackerCheckpoint
+
+
+class TrackerCheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.directory = os.path.join(self.tmp.name, "checkpoint")
+
+    def write_history(self):
+        checkpoint = TrackerCheckpoint(self.directory, snapshot_interval=300)
+        state = {"in_transit": {"1": "a"}, "removed": {"x"}}
+        checkpoint.save(state, now=0)  # vollständiger Snapshot
+
+        state["in_transit"]["2"] = "b"
+        checkpoint.touch("in_transit", "2")
+        checkpoint.save(state, now=5)  # Delta 1
+
+        del state["in_transit"]["1"]
+        checkpoint.touch("in_transit", "1")
+        state["removed"] = {"y"}
+        checkpoint.save(state, now=10)  # Delta 2
+        return checkpoint
+
+    def test_snapshot_plus_deltas(self):
+        self.write_history()
+        state, saved_at = TrackerCheckpoint(self.directory).load()
+        self.assertEqual(state, {"in_transit": {"2": "b"}, "removed": {"y"}})
+        self.assertEqual(saved_at, 10)
+
+    def test_truncated_last_delta_frame(self):
+        checkpoint = self.write_history()
+        path = checkpoint._path("deltas", checkpoint.generation)
+        # Absturz mitten im Schreiben des letzten Frames simulieren
+        with open(path, "rb+") as f:
+            f.truncate(os.path.getsize(path) - 7)
+
+        state, saved_at = TrackerCheckpoint(self.directory).load()
+        # Stand nach Delta 1: der abgebrochene Frame wird verworfen, alles davor bleibt
+        self.assertEqual(state, {"in_transit": {"1": "a", "2": "b"}, "removed": {"x"}})
+        self.assertEqual(saved_at, 5)
+
+    def test_new_generation_replaces_old_files(self):
+        checkpoint = self.write_history()
+        checkpoint.save({"in_transit": {}, "removed": set()}, now=400)
+        self.assertEqual(sorted(os.listdir(self.directory)), ["state-2.pkl"])
+        state, saved_at = TrackerCheckpoint(self.directory).load()
+        self.assertEqual(state, {"in_transit": {}, "removed": set()})
+        self.assertEqual(saved_at, 400)
+
+    def test_no_checkpoint(self):
+        self.assertEqual(TrackerCheckpoint(self.directory).load(), (None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()